@@ -0,0 +1,200 @@
+# agents/allocation_solver.py
+import time
+from typing import Dict
+
+import numpy as np
+
+from agents.readings import as_frame
+
+# Per-node load columns a workload carries with it when it moves
+RESOURCES = ["compute_load", "storage_utilization", "bandwidth"]
+
+# Open nodes checked together when placing a workload
+PLACE_BLOCK = 256
+
+# Smallest share of a remaining workload worth a move of its own
+MIN_SHARE = 1e-3
+
+
+class AllocationSolver:
+    """Rebalancing plans for a fleet of nodes under utilization caps.
+
+    Every node's load is a vector (compute %, storage %, bandwidth) and
+    moving a fraction of a node's workload moves that fraction of each.
+    ``cost`` is the node's price per unit of compute, so the fleet's cost is
+    sum(compute x cost) and cheaper headroom is filled first.
+
+    ``solve`` first sheds just enough from every node over a cap, then
+    (with ``consolidate``) drains underutilized nodes into cheaper ones,
+    packing greedily into the cheapest node with room and splitting a
+    workload when no single node fits it. Instances of up to
+    ``exact_max_nodes`` nodes are solved exactly as a linear program when
+    scipy is available.
+    """
+
+    def __init__(self, compute_cap=80.0, storage_cap=90.0, bandwidth_cap=None,
+                 underutilized_below=30.0, consolidate=True, exact_max_nodes=40):
+        self.caps = np.array([compute_cap, storage_cap, np.inf if bandwidth_cap is None else bandwidth_cap])
+        self.underutilized_below = underutilized_below
+        self.consolidate = consolidate
+        self.exact_max_nodes = exact_max_nodes
+
+    def solve(self, nodes, node_ids=None, exact=None) -> Dict:
+        """Plan moves for ``nodes`` (one row per node); returns the moves, costs and solve time."""
+        start = time.perf_counter()
+        frame = as_frame(nodes, RESOURCES + ["cost"])
+        n = len(frame)
+        # An empty frame may not even have the columns
+        load = frame[RESOURCES].to_numpy(dtype=np.float64) if n else np.zeros((0, len(RESOURCES)))
+        cost = frame["cost"].to_numpy(dtype=np.float64) if n else np.zeros(0)
+        ids = list(node_ids) if node_ids is not None else [f"node-{i}" for i in frame.index]
+
+        if exact is None:
+            exact = n <= self.exact_max_nodes
+        method, moves, after = "greedy", None, None
+        if not n:
+            # Nothing to rebalance, and linprog rejects an empty problem
+            method, moves, after = "empty", [], load
+        elif exact:
+            solved = self._solve_exact(load, cost)
+            if solved is not None:
+                method, (moves, after) = "exact", solved
+        if moves is None:
+            moves, after = self._solve_greedy(load, cost)
+
+        return {
+            "method": method,
+            "nodes": len(frame),
+            "moves": [
+                {"source": ids[i], "target": ids[j], "fraction": round(fraction, 4),
+                 "compute_moved": round(fraction * load[i, 0], 3)}
+                for i, j, fraction in moves
+            ],
+            "drained": [ids[i] for i in np.flatnonzero((load[:, 0] > 0) & (after[:, 0] <= 1e-9))],
+            "cost_before": float(load[:, 0] @ cost),
+            "cost_after": float(after[:, 0] @ cost),
+            "over_cap_before": int((load > self.caps).any(axis=1).sum()),
+            "over_cap_after": int((after > self.caps + 1e-6).any(axis=1).sum()),
+            "solve_seconds": time.perf_counter() - start,
+        }
+
+    def _solve_greedy(self, load, cost):
+        after = load.copy()
+        moves = []
+        # Nodes that can still take load, cheapest first; full ones are dropped as the solve goes
+        open_nodes = np.argsort(cost, kind="stable")
+
+        # Mandatory: shed the smallest fraction that brings each node under every cap
+        with np.errstate(divide="ignore", invalid="ignore"):
+            keep = np.nanmin(np.where(load > 0, self.caps / load, np.inf), axis=1)
+        shed = np.clip(1.0 - keep, 0.0, 1.0)
+        over = np.flatnonzero(shed > 0)
+        # Biggest overloads first, as in first-fit decreasing
+        sources = [(i, False) for i in over[np.argsort(-shed[over] * load[over, 0], kind="stable")]]
+
+        if self.consolidate:
+            # Optional: empty underutilized nodes into cheaper headroom, priciest first
+            idle = np.flatnonzero((load[:, 0] > 0) & (load[:, 0] < self.underutilized_below) & (shed == 0))
+            sources += [(i, True) for i in idle[np.argsort(-cost[idle], kind="stable")]]
+
+        for step, (i, cheaper_only) in enumerate(sources):
+            if step % PLACE_BLOCK == 0:
+                open_nodes = open_nodes[(after[open_nodes] < self.caps - 1e-6).all(axis=1)]
+            if cheaper_only and after[i, 0] >= self.underutilized_below:
+                # It took on shed load and is no longer worth emptying
+                continue
+            workload = after[i].copy() if cheaper_only else shed[i] * load[i]
+            self._place(i, workload, load, after, cost, open_nodes, moves, cheaper_only)
+        return moves, after
+
+    def _place(self, source, workload, load, after, cost, open_nodes, moves, cheaper_only) -> bool:
+        """Move ``workload`` off ``source`` into the cheapest nodes with room; False if some is left.
+
+        Moving a share of a workload moves that share of every resource, so a
+        node's room is one number: the share it can take. Filling receivers in
+        cost order is then a cumulative sum, taken over just enough blocks of
+        the cheapest open nodes to hold the workload. With ``cheaper_only`` the
+        workload is a consolidation, which only happens if it moves entirely.
+        """
+        receivers, room, total = [], [], 0.0
+        for block in range(0, len(open_nodes), PLACE_BLOCK):
+            candidates = open_nodes[block:block + PLACE_BLOCK]
+            candidates = candidates[candidates != source]
+            if cheaper_only:
+                # Only cheaper nodes, and not ones that are themselves about to be drained
+                candidates = candidates[(cost[candidates] < cost[source])
+                                        & (after[candidates, 0] >= self.underutilized_below)]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fits = np.nanmin(np.where(workload > 0, (self.caps - after[candidates]) / workload, np.inf), axis=1)
+            # Slivers of headroom would only add moves nobody wants to carry out
+            fits = np.where(fits > MIN_SHARE, np.minimum(fits, 1.0), 0.0)
+            receivers.append(candidates)
+            room.append(fits)
+            total += fits.sum()
+            if total >= 1.0 or (cheaper_only and cost[open_nodes[min(block + PLACE_BLOCK, len(open_nodes)) - 1]]
+                                >= cost[source]):
+                break
+        if not receivers:
+            return False
+        receivers, fits = np.concatenate(receivers), np.concatenate(room)
+
+        take = np.clip(np.minimum(fits, 1.0 - (np.cumsum(fits) - fits)), 0.0, None)
+        placed = take.sum() >= 1.0 - 1e-9
+        if cheaper_only and not placed:
+            return False
+
+        chosen = np.flatnonzero(take > 0)
+        after[receivers[chosen]] += take[chosen, None] * workload
+        after[source] -= take.sum() * workload
+        # Fractions are of the node's original workload, not of what was left to move
+        scale = workload[0] / (load[source, 0] or 1.0)
+        moves.extend((source, target, share * scale)
+                     for target, share in zip(receivers[chosen].tolist(), take[chosen].tolist()))
+        return placed
+
+    def _solve_exact(self, load, cost):
+        """Min-cost fractional reassignment as an LP; None if scipy is missing or it fails."""
+        try:
+            from scipy.optimize import linprog
+        except ImportError:
+            return None
+        n = len(load)
+        # x[i, j]: fraction of node i's workload hosted on node j
+        objective = (load[:, 0][:, None] * cost[None, :]).ravel()
+        # Tiny penalty on moving so ties keep workloads where they are
+        objective += 1e-6 * (1 - np.eye(n)).ravel() * load[:, 0].repeat(n)
+        rows_eq = np.kron(np.eye(n), np.ones(n))
+        capacity_rows, capacity_bounds = [], []
+        for r, cap in enumerate(self.caps):
+            if np.isfinite(cap):
+                # Row j holds load[i, r] at x[i, j]: the total node j ends up hosting
+                capacity_rows.append(np.einsum("i,jk->jik", load[:, r], np.eye(n)).reshape(n, n * n))
+                capacity_bounds.append(np.full(n, cap))
+        result = linprog(
+            objective,
+            A_ub=np.vstack(capacity_rows), b_ub=np.concatenate(capacity_bounds),
+            A_eq=rows_eq, b_eq=np.ones(n), bounds=(0, 1), method="highs",
+        )
+        if not result.success:
+            return None
+        x = result.x.reshape(n, n)
+        after = x.T @ load
+        moves = [(i, j, float(x[i, j])) for i in range(n) for j in range(n) if i != j and x[i, j] > 1e-6]
+        return moves, after
+
+
+def describe_plan(plan: Dict, limit: int = 10) -> str:
+    """Plain-text summary of a plan, short enough to hand to the LLM."""
+    lines = [
+        f"{plan['method']} plan for {plan['nodes']} nodes, solved in {plan['solve_seconds'] * 1000:.1f} ms",
+        f"Cost: {plan['cost_before']:.2f} -> {plan['cost_after']:.2f}; "
+        f"nodes over a cap: {plan['over_cap_before']} -> {plan['over_cap_after']}",
+    ]
+    if plan["drained"]:
+        lines.append(f"Nodes drained and free to scale down: {', '.join(plan['drained'][:limit])}")
+    for move in sorted(plan["moves"], key=lambda move: -move["compute_moved"])[:limit]:
+        lines.append(f"Move {move['fraction']:.0%} of {move['source']} ({move['compute_moved']:.1f}% compute) "
+                     f"to {move['target']}")
+    if len(plan["moves"]) > limit:
+        lines.append(f"... and {len(plan['moves']) - limit} smaller moves")
+    return "\n".join(lines)
@@ -0,0 +1,236 @@
+# agents/batch_analysis.py
+import asyncio
+import json
+import math
+from typing import Dict, Iterable, List, Sequence
+
+from agents.prompt_builder import estimate_tokens
+from agents.runtime import AgentRuntime, get_runtime
+
+# Fixed text between a domain's task and its numbered readings; {decisions} is the domain's vocabulary
+BATCH_FORMAT = (
+    "The readings below are numbered. Judge each one on its own values. Answer with a JSON object "
+    '{{"decisions": [...]}} holding exactly one entry per reading: {{"id": <reading number>, '
+    '"decision": <one of {decisions}>, "reason": <one short sentence, at most 20 words>}}.'
+)
+
+# Margin over the mean measured answer entry, so longer-than-usual reasons are not cut off
+ANSWER_HEADROOM = 1.5
+
+
+def decision_schema(decisions: Sequence[str] = ()) -> dict:
+    """JSON schema of a batch answer; the decision is limited to ``decisions`` when given."""
+    decision = {"type": "string", "enum": list(decisions)} if decisions else {"type": "string"}
+    entry = {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, "decision": decision, "reason": {"type": "string"}},
+        "required": ["id", "decision", "reason"],
+        "additionalProperties": False,
+    }
+    return {
+        "type": "object",
+        "properties": {"decisions": {"type": "array", "items": entry}},
+        "required": ["decisions"],
+        "additionalProperties": False,
+    }
+
+
+def parse_decisions(text: str, ids: Iterable[int], decisions: Sequence[str] = ()) -> Dict[int, dict]:
+    """The valid entries of a batch answer by reading id.
+
+    Entries that do not match the schema, name an id that was not asked
+    about or repeat one are dropped, so those readings are retried.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        # Some models fence their JSON even when asked for a schema
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return {}
+    entries = payload.get("decisions") if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        return {}
+
+    ids = set(ids)
+    valid = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        reading_id, decision, reason = entry.get("id"), entry.get("decision"), entry.get("reason", "")
+        if isinstance(reading_id, bool) or not isinstance(reading_id, int) or reading_id not in ids:
+            continue
+        if not isinstance(decision, str) or (decisions and decision not in decisions):
+            continue
+        if reading_id not in valid:
+            valid[reading_id] = {"decision": decision, "reason": reason if isinstance(reason, str) else ""}
+    return valid
+
+
+class BatchAnalyzer:
+    """Analyzes many readings from one domain in as few completions as a token budget allows.
+
+    Each reading is folded into its plugin's state (``prompt_context``) and
+    rendered with the domain's PromptTemplate, then readings are packed into
+    calls of at most ``max_readings`` and ``max_tokens`` (instructions,
+    prompt and the expected answer together). The model answers with JSON
+    checked against ``decision_schema``. Readings whose entry is missing or
+    invalid, and whole batches that fail or come back truncated, are retried
+    in batches half the size, up to ``max_attempts`` in all; whatever still
+    has no answer gets the plugin's rule decision instead.
+
+    ``answer_tokens`` is the first guess at one entry's size; once batch
+    answers have come back, calls are budgeted from their measured size.
+
+    With a response cache on the runtime, readings answered before are not
+    sent again.
+    """
+
+    def __init__(self, runtime: AgentRuntime = None, max_tokens=4000, max_readings=50,
+                 answer_tokens=40, max_attempts=3, concurrency=4):
+        self.runtime = runtime or get_runtime()
+        self.max_tokens = max_tokens
+        self.max_readings = max_readings
+        # Expected size of one reading's entry in the answer
+        self.answer_tokens = answer_tokens
+        self.max_attempts = max_attempts
+        # Batch calls in flight at once
+        self.concurrency = concurrency
+
+        self.readings = 0
+        self.cached = 0
+        self.calls = 0
+        self.answered = 0
+        self.retried = 0
+        self.fallbacks = 0
+        # Completion tokens of parsed batch answers and the entries in them
+        self.completion_tokens = 0
+        self.entries = 0
+
+    def entry_tokens(self) -> int:
+        """Tokens to budget per answer entry: measured once answers came back, ``answer_tokens`` until then."""
+        if not self.entries:
+            return self.answer_tokens
+        return max(self.answer_tokens, math.ceil(self.completion_tokens / self.entries * ANSWER_HEADROOM))
+
+    def _header(self, prompt) -> str:
+        decisions = ", ".join(f'"{decision}"' for decision in prompt.decisions) or "a short action"
+        return prompt.prefix + BATCH_FORMAT.format(decisions=decisions) + "\n\n"
+
+    async def analyze(self, domain: str, readings: Sequence[dict]) -> List[dict]:
+        """One {"decision", "reason", "path"} per reading, in order; path is "llm", "cache" or "rule"."""
+        plugin = self.runtime.get_plugin(domain)
+        agent = self.runtime.get_agent(domain)
+        prompt = self.runtime.get_prompt(domain)
+        if prompt is None:
+            raise ValueError(f"Domain {domain} has no PromptTemplate to batch its readings with")
+        header = self._header(prompt)
+        cache = self.runtime.cache
+        key_fields = self.runtime.get_cache_fields(domain)
+
+        results = [None] * len(readings)
+        texts, keys = [], []
+        for index, reading in enumerate(readings):
+            context, derived = plugin.prompt_context(reading)
+            texts.append(prompt.values(reading, context))
+            # Keyed on the batch prefix, so batch answers and per-reading narratives never mix
+            key = cache.make_key(agent.instructions + "\n" + header, {**reading, **derived}, key_fields) if cache else None
+            keys.append(key)
+            cached = cache.get(key) if key is not None else None
+            if cached is not None:
+                results[index] = {**json.loads(cached), "path": "cache"}
+                self.cached += 1
+        self.readings += len(readings)
+
+        fixed_tokens = estimate_tokens(agent.instructions) + estimate_tokens(header)
+        costs = [estimate_tokens(text) + 4 + self.entry_tokens() for text in texts]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def complete(batch):
+            async with semaphore:
+                return batch, await self._complete(agent, prompt, header, [texts[index] for index in batch])
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        limit = self.max_readings
+        for attempt in range(self.max_attempts):
+            if not pending:
+                break
+            if attempt:
+                self.retried += len(pending)
+            batches = self._pack(pending, costs, fixed_tokens, limit)
+            for batch, answers in await asyncio.gather(*(complete(batch) for batch in batches)):
+                for number, answer in answers.items():
+                    index = batch[number - 1]
+                    results[index] = {**answer, "path": "llm"}
+                    if keys[index] is not None:
+                        cache.put(keys[index], json.dumps(answer), 0.0)
+                    self.answered += 1
+            pending = [index for index in pending if results[index] is None]
+            limit = max(1, max(len(batch) for batch in batches) // 2)
+
+        for index in pending:
+            _, analysis = plugin.assess_reading(readings[index])
+            results[index] = {"decision": analysis, "reason": "", "path": "rule"}
+            self.fallbacks += 1
+        return results
+
+    def _pack(self, pending, costs, fixed_tokens, limit) -> List[List[int]]:
+        # Greedy in stream order; a reading over budget on its own still goes, alone
+        batches, current, used = [], [], fixed_tokens
+        for index in pending:
+            if current and (len(current) >= limit or used + costs[index] > self.max_tokens):
+                batches.append(current)
+                current, used = [], fixed_tokens
+            current.append(index)
+            used += costs[index]
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _complete(self, agent, prompt, header, texts) -> Dict[int, dict]:
+        from semantic_kernel.contents import ChatHistory
+
+        user_input = header + "\n\n".join(f"Reading {number}:\n{text}" for number, text in enumerate(texts, 1))
+        history = ChatHistory(system_message=agent.instructions)
+        history.add_user_message(user_input)
+        service = self.runtime.service
+        settings = service.get_prompt_execution_settings_class()(
+            max_tokens=self.entry_tokens() * len(texts) + 20,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "decisions", "strict": True, "schema": decision_schema(prompt.decisions)},
+            },
+        )
+        self.calls += 1
+        try:
+            response = await service.get_chat_message_content(chat_history=history, settings=settings)
+        except Exception as e:
+            print(f"\n[Batch] {agent.name} call for {len(texts)} readings failed: {e}")
+            return {}
+        text = str(response or "")
+        completion_tokens = estimate_tokens(text)
+        self.runtime.tokens.record(
+            agent.name,
+            estimate_tokens(agent.instructions) + estimate_tokens(user_input),
+            completion_tokens,
+            prefix_tokens=estimate_tokens(agent.instructions + "\n" + header),
+        )
+        answers = parse_decisions(text, range(1, len(texts) + 1), prompt.decisions)
+        if answers:
+            self.completion_tokens += completion_tokens
+            self.entries += len(answers)
+        return answers
+
+    def report(self) -> Dict:
+        """Readings handled, calls made and how many readings each call answered."""
+        return {
+            "readings": self.readings,
+            "cached": self.cached,
+            "calls": self.calls,
+            "answered": self.answered,
+            "retried": self.retried,
+            "fallbacks": self.fallbacks,
+            "readings_per_call": round(self.answered / self.calls, 1) if self.calls else 0.0,
+            "entry_tokens": self.entry_tokens(),
+        }
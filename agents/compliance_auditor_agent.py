@@ -1,108 +1,234 @@
-# agents/compliance_auditor_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class ComplianceMonitorPlugin:
-    """Plugin for compliance monitoring and auditing."""
-
-    def __init__(self):
-        self.data = pd.read_csv("mock_data/compliance_data.csv")
-
-    @kernel_function(description="Get the next compliance reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next compliance reading with timestamp."]:
-        return self.data.iloc[0].to_dict()
-
-    @kernel_function(description="Analyzes compliance metrics and provides status.")
-    def analyze_compliance(self, energy_kwh: float,
-                         carbon_emission: float,
-                         renewable_percent: float,
-                         policy_target: float,
-                         anomaly: str) -> Annotated[str, "Returns compliance analysis and recommendations."]:
-        if anomaly !="nan":
-            return f"Violation Detected: {anomaly}"
-        elif renewable_percent < policy_target:
-            return f"Flag for Review: Renewable energy usage ({renewable_percent}%) below target ({policy_target}%)"
-        
-        return f"Compliant: All metrics are within acceptable limits."
-
-async def monitor_compliance():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
- # Create plugin instance
-    compliance_plugin = ComplianceMonitorPlugin()
- # Create the energy monitor agent
-    compliance_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[compliance_plugin],
-        name="ComplianceAuditor",
-        instructions= """You are an AI agent specialized in compliance monitoring and auditing. 
-        Your role is to evaluate compliance with energy regulations and sustainability goals. 
-        Based on metrics, output: 'Compliant', 'Flag for Review', or 'Violation Detected'. 
-        Use the available plugins to analyze compliance data and provide actionable insights.""",
-    )
-
-    thread = None
-    try:
-        #while True:
-            # Get the next reading from mock data
-            reading = compliance_plugin.get_next_reading()
-
-            # Format the input for the agent
-            user_input = (
-                f"Analyze compliance metrics:\n"
-                f"Energy Consumption: {reading['energy_kwh']} kWh\n"
-                f"Carbon Emission: {reading['carbon_emission']} tons CO2\n"
-                f"Renewable Energy: {reading['renewable_percent']}%\n"
-                f"Policy Target: {reading['policy_target']}%\n"
-                f"Anomaly: {reading['anomaly']}"
-            )
-
-            print(f"\n[Compliance Auditor] Processing: {user_input}")
-
-            # Get agent's analysis
-            response_text = ""
-            async for response in compliance_agent.invoke_stream(
-                message = user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            # Simulate real-time delay
-            #await asyncio.sleep(0.5)
-
-            if not response_text:
-                response_text = "No response generated from compliance analysis."
-
-            return response_text
-    
-    except KeyboardInterrupt:
-        print("\n[Compliance Auditor] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()
-
-if __name__ == "__main__":
+# agents/compliance_auditor_agent.py
+import os
+import time
+import numpy as np
+import pandas as pd
+import asyncio
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Annotated, Dict, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.compliance_rollups import ComplianceRollups
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame, epoch_seconds, text_or_nan, text_or_nan_column
+from agents.runtime import get_runtime
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for compliance readings
+DATA_PATH = "mock_data/compliance_data.csv"
+READING_DTYPES = {
+    "energy_kwh": "float64",
+    "carbon_emission": "float64",
+    "renewable_percent": "float64",
+    "policy_target": "float64",
+    "anomaly": "object",
+}
+
+# Readings remembered as rolled up, so the rules and the prompt add each one only once
+SCORED_MEMORY = 10_000
+
+class ComplianceMonitorPlugin:
+    """Plugin for compliance monitoring and auditing."""
+
+    def __init__(self, borderline_margin=2.0, stream: ReadingStream = None, rollups: ComplianceRollups = None):
+        # Renewable share this close to the policy target is escalated to the LLM
+        self.borderline_margin = borderline_margin
+        # Hourly to yearly aggregates of every reading seen, for period audits
+        self.rollups = rollups or ComplianceRollups()
+        # id(reading) -> (reading, epoch seconds it was rolled up at); the reading is held so its id is not reused
+        self._rolled = OrderedDict()
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next compliance reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next compliance reading with timestamp."]:
+        return self.stream.next_reading()
+
+    @kernel_function(description="Analyzes compliance metrics and provides status.")
+    def analyze_compliance(self, energy_kwh: float,
+                         carbon_emission: float,
+                         renewable_percent: float,
+                         policy_target: float,
+                         anomaly: str) -> Annotated[str, "Returns compliance analysis and recommendations."]:
+        if anomaly !="nan":
+            return f"Violation Detected: {anomaly}"
+        elif renewable_percent < policy_target:
+            return f"Flag for Review: Renewable energy usage ({renewable_percent}%) below target ({policy_target}%)"
+        
+        return f"Compliant: All metrics are within acceptable limits."
+
+    @kernel_function(description="Get compliance totals and status for a period, e.g. 2025-01-01 to 2025-04-01.")
+    def get_period_compliance(self, start: str, end: str) -> Annotated[Dict, "Returns the period's totals, renewable share against target and status."]:
+        return self.rollups.period_status(start, end)
+
+    @kernel_function(description="Get quarter-to-date compliance totals and status.")
+    def get_quarter_to_date_compliance(self) -> Annotated[Dict, "Returns quarter-to-date totals and status."]:
+        return self.rollups.quarter_to_date()
+
+    @kernel_function(description="Get year-to-date compliance totals and status.")
+    def get_year_to_date_compliance(self) -> Annotated[Dict, "Returns year-to-date totals and status."]:
+        return self.rollups.year_to_date()
+
+    @staticmethod
+    def reading_times(frame: pd.DataFrame) -> np.ndarray:
+        """Each reading's own timestamp in epoch seconds; readings without one count as arriving now."""
+        now = time.time()
+        if "timestamp" not in frame:
+            return np.full(len(frame), now)
+        seconds = epoch_seconds(frame["timestamp"])
+        return np.where(np.isnan(seconds), now, seconds)
+
+    def _remember(self, reading, seconds: float):
+        self._rolled[id(reading)] = (reading, seconds)
+        if len(self._rolled) > SCORED_MEMORY:
+            self._rolled.popitem(last=False)
+
+    def roll_up(self, reading: dict) -> float:
+        """Add a reading to the rollups at its own time, once; returns that time in epoch seconds."""
+        seen = self._rolled.get(id(reading))
+        if seen is not None and seen[0] is reading:
+            return seen[1]
+        seconds = epoch_seconds([reading.get("timestamp")])[0]
+        seconds = time.time() if np.isnan(seconds) else float(seconds)
+        self.rollups.add(reading, seconds)
+        self._remember(reading, seconds)
+        return seconds
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.analyze_compliance(
+            reading["energy_kwh"],
+            reading["carbon_emission"],
+            reading["renewable_percent"],
+            reading["policy_target"],
+            text_or_nan(reading["anomaly"]),
+        )
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules, rolling it up for period audits: returns (severity, analysis)."""
+        self.roll_up(reading)
+        if text_or_nan(reading["anomaly"]) != "nan":
+            severity = "critical"
+        elif reading["renewable_percent"] < reading["policy_target"]:
+            severity = "warning"
+        else:
+            severity = "normal"
+        return severity, self.analyze_reading(reading)
+
+    def is_borderline(self, reading: dict) -> bool:
+        if text_or_nan(reading["anomaly"]) != "nan":
+            return False
+        return abs(reading["renewable_percent"] - reading["policy_target"]) <= self.borderline_margin
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """Roll a reading up; returns its extra prompt lines and the derived fields that key the response cache."""
+        seconds = self.roll_up(reading)
+        # The quarter the reading belongs to, which for a backfill is not the current one
+        quarter = self.rollups.quarter_to_date(pd.Timestamp(seconds, unit="s"))
+        context = {
+            "Quarter to date": (
+                f"{quarter['renewable_share']:.1f}% renewable against a {quarter['target_share']:.1f}% target "
+                f"over {quarter['readings']:.0f} readings, {quarter['breaches']:.0f} below target, "
+                f"{quarter['violations']:.0f} violations ({quarter['status']})"
+            ),
+        }
+        return context, {"quarter_status": quarter["status"]}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["energy_kwh", "carbon_emission", "renewable_percent", "policy_target", "anomaly"])
+        times = self.reading_times(frame)
+        self.rollups.add_batch(frame, times)
+        if isinstance(readings, (list, tuple)) and readings and isinstance(readings[0], Mapping):
+            for reading, seconds in zip(readings, times.tolist()):
+                self._remember(reading, seconds)
+        renewable, target = frame["renewable_percent"], frame["policy_target"]
+        anomaly = text_or_nan_column(frame["anomaly"])
+        violated = anomaly != "nan"
+        below_target = renewable < target
+        decision = np.select(
+            [violated, below_target],
+            [
+                "Violation Detected: " + anomaly,
+                "Flag for Review: Renewable energy usage (" + renewable.astype(str)
+                + "%) below target (" + target.astype(str) + "%)",
+            ],
+            default="Compliant: All metrics are within acceptable limits.",
+        )
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.select([violated, below_target], ["critical", "warning"], default="normal"),
+            "borderline": ~violated & ((renewable - target).abs() <= self.borderline_margin),
+        }, index=frame.index)
+
+# Compliance auditor agent definition, built once by the shared runtime
+AGENT_NAME = "ComplianceAuditor"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in compliance monitoring and auditing. 
+        Your role is to evaluate compliance with energy regulations and sustainability goals. 
+        Based on metrics, output: 'Compliant', 'Flag for Review', or 'Violation Detected'. 
+        Use the available plugins to analyze compliance data and provide actionable insights."""
+
+# Per-reading prompt: fixed task text first, then the reading's values
+PROMPT = PromptTemplate(
+    task="Analyze compliance metrics.",
+    fields={
+        "energy_kwh": "Energy consumption (kWh)",
+        "carbon_emission": "Carbon emission (tons CO2)",
+        "renewable_percent": "Renewable energy (%)",
+        "policy_target": "Policy target (%)",
+        "anomaly": "Anomaly",
+    },
+    decisions=("Compliant", "Flag for Review", "Violation Detected"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = (
+    "energy_kwh", "carbon_emission", "renewable_percent", "policy_target", "anomaly", "quarter_status",
+)
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("energy_kwh", "carbon_emission", "renewable_percent", "policy_target", "anomaly")
+
+async def monitor_compliance(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    compliance_plugin = runtime.get_plugin("compliance")
+
+    try:
+        #while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = compliance_plugin.get_next_reading()
+
+            # Fold the reading into the period rollups and audit the quarter so far
+            context, derived = compliance_plugin.prompt_context(reading)
+
+            # Format the input for the agent
+            user_input = PROMPT.render(reading, context)
+
+            print(f"\n[Compliance Auditor] Processing: {user_input}")
+
+            # Get agent's analysis
+            response_text = await runtime.invoke("compliance", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            # Simulate real-time delay
+            #await asyncio.sleep(0.5)
+
+            if not response_text:
+                response_text = "No response generated from compliance analysis."
+
+            return response_text
+    
+    except KeyboardInterrupt:
+        print("\n[Compliance Auditor] Shutting down...")
+
+if __name__ == "__main__":
     asyncio.run(monitor_compliance())
\ No newline at end of file
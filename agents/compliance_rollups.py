@@ -0,0 +1,148 @@
+# agents/compliance_rollups.py
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agents.readings import as_frame, missing_mask
+
+# Bucket sizes, largest first; keys are numpy datetime64 offsets from the epoch in that unit
+GRANULARITIES = {"year": "Y", "month": "M", "day": "D", "hour": "h"}
+
+# Running totals kept per bucket
+FIELDS = ("readings", "energy_kwh", "carbon_emission", "renewable_kwh", "target_kwh", "breaches", "violations")
+
+
+def _utc(moment=None) -> pd.Timestamp:
+    """A naive UTC timestamp (now by default), matching the epoch-second bucket keys."""
+    stamp = pd.Timestamp.now(tz="UTC") if moment is None else pd.Timestamp(moment)
+    return stamp.tz_convert("UTC").tz_localize(None) if stamp.tzinfo else stamp
+
+
+class ComplianceRollups:
+    """Hourly, daily, monthly and yearly compliance aggregates, updated as readings arrive.
+
+    Each bucket holds sums rather than raw readings: energy, carbon, the
+    renewable and target shares weighted by energy, the number of readings
+    below target and the number with an anomaly. Any period is answered by
+    covering it with the fewest whole buckets (whole years, then months,
+    days and hours at the edges), so a year-to-date audit reads a few dozen
+    rows however many readings went into them. With ``path`` set, buckets
+    are persisted to SQLite and reloaded on start.
+    """
+
+    def __init__(self, path=None):
+        self._buckets: Dict[Tuple[str, int], np.ndarray] = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rollups (granularity TEXT, bucket INTEGER, "
+                + ", ".join(f"{field} REAL" for field in FIELDS)
+                + ", PRIMARY KEY (granularity, bucket))"
+            )
+            self._db.commit()
+            for row in self._db.execute("SELECT * FROM rollups"):
+                self._buckets[(row[0], row[1])] = np.array(row[2:], dtype=np.float64)
+
+    def add(self, reading: dict, timestamp: float = None):
+        self.add_batch(pd.DataFrame([reading]), None if timestamp is None else [timestamp])
+
+    def add_batch(self, readings, timestamps=None):
+        """Fold readings (with epoch-second ``timestamps``, default now) into every granularity."""
+        frame = as_frame(readings, ["energy_kwh", "carbon_emission", "renewable_percent", "policy_target", "anomaly"])
+        if timestamps is None:
+            timestamps = np.full(len(frame), time.time())
+        moments = (np.asarray(timestamps, dtype=np.float64) * 1e6).astype("datetime64[us]")
+
+        energy = frame["energy_kwh"].to_numpy(dtype=np.float64)
+        renewable = frame["renewable_percent"].to_numpy(dtype=np.float64)
+        target = frame["policy_target"].to_numpy(dtype=np.float64)
+        values = np.column_stack([
+            np.ones(len(frame)),
+            energy,
+            frame["carbon_emission"].to_numpy(dtype=np.float64),
+            energy * renewable / 100,
+            energy * target / 100,
+            renewable < target,
+            ~missing_mask(frame["anomaly"]).to_numpy(),
+        ])
+
+        changed = []
+        for granularity, unit in GRANULARITIES.items():
+            keys = moments.astype(f"datetime64[{unit}]").astype(np.int64)
+            unique, inverse = np.unique(keys, return_inverse=True)
+            sums = np.zeros((len(unique), len(FIELDS)))
+            np.add.at(sums, inverse, values)
+            for key, total in zip(unique.tolist(), sums):
+                bucket = (granularity, key)
+                self._buckets[bucket] = self._buckets.get(bucket, 0) + total
+                changed.append(bucket)
+
+        if self._db is not None:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO rollups VALUES (?, ?, {', '.join('?' * len(FIELDS))})",
+                [(granularity, key, *self._buckets[(granularity, key)].tolist()) for granularity, key in changed],
+            )
+            self._db.commit()
+
+    def cover(self, start, end) -> List[Tuple[str, int]]:
+        """The fewest whole buckets that tile [start, end), both rounded down to the hour."""
+        cursor = np.datetime64(_utc(start), "h")
+        end = np.datetime64(_utc(end), "h")
+        buckets = []
+        while cursor < end:
+            for granularity, unit in GRANULARITIES.items():
+                bucket = cursor.astype(f"datetime64[{unit}]")
+                following = (bucket + 1).astype("datetime64[h]")
+                if bucket.astype("datetime64[h]") == cursor and following <= end:
+                    buckets.append((granularity, int(bucket.astype(np.int64))))
+                    cursor = following
+                    break
+        return buckets
+
+    def totals(self, start, end) -> Dict[str, float]:
+        total = np.zeros(len(FIELDS))
+        buckets = self.cover(start, end)
+        for bucket in buckets:
+            total += self._buckets.get(bucket, 0)
+        return {**dict(zip(FIELDS, total.tolist())), "buckets": len(buckets)}
+
+    def period_status(self, start, end) -> Dict:
+        """Compliance over [start, end): totals, energy-weighted renewable share against target, status."""
+        totals = self.totals(start, end)
+        energy = totals["energy_kwh"]
+        renewable_share = 100 * totals["renewable_kwh"] / energy if energy else float("nan")
+        target_share = 100 * totals["target_kwh"] / energy if energy else float("nan")
+        if not totals["readings"]:
+            status = "No Data"
+        elif totals["violations"]:
+            status = "Violation Detected"
+        elif renewable_share < target_share:
+            status = "Flag for Review"
+        else:
+            status = "Compliant"
+        return {
+            "start": str(_utc(start)),
+            "end": str(_utc(end)),
+            **totals,
+            "renewable_share": renewable_share,
+            "target_share": target_share,
+            "status": status,
+        }
+
+    def quarter_to_date(self, now=None) -> Dict:
+        now = _utc(now)
+        # The end is exclusive, so step past now to include the current hour
+        return self.period_status(now.to_period("Q").start_time, now + pd.Timedelta(hours=1))
+
+    def year_to_date(self, now=None) -> Dict:
+        now = _utc(now)
+        return self.period_status(now.to_period("Y").start_time, now + pd.Timedelta(hours=1))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
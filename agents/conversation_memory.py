@@ -0,0 +1,207 @@
+# agents/conversation_memory.py
+from typing import TYPE_CHECKING, Dict, List
+
+from agents.prompt_builder import estimate_tokens
+
+if TYPE_CHECKING:
+    from semantic_kernel.agents import ChatHistoryAgentThread
+    from semantic_kernel.contents import ChatMessageContent
+
+# Same metadata key semantic_kernel's own reducers mark summaries with
+SUMMARY_KEY = "__summary__"
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of an on-call conversation about a datacenter. Keep every open issue, "
+    "decision, affected component and number that may matter later; drop greetings and repetition. "
+    "Answer with the updated summary only, in at most {tokens} tokens."
+)
+
+
+def _message_text(message: "ChatMessageContent") -> str:
+    from semantic_kernel.contents import FunctionCallContent, FunctionResultContent
+
+    parts = [message.content or ""]
+    for item in message.items:
+        if isinstance(item, FunctionCallContent):
+            parts.append(f"{item.function_name}({item.arguments or ''})")
+        elif isinstance(item, FunctionResultContent):
+            parts.append(str(item.result))
+    return " ".join(part for part in parts if part)
+
+
+def message_tokens(message: "ChatMessageContent") -> int:
+    # A few tokens of role and framing per message, as the chat format adds them
+    return estimate_tokens(_message_text(message)) + 4
+
+
+class ConversationMemory:
+    """Token-budgeted history for one long conversation with an agent.
+
+    The thread's ChatHistory is reduced before every turn. Plugin outputs
+    longer than ``tool_output_chars`` are cut down. Once the history passes
+    ``budget_tokens``, the oldest turns are folded into a rolling summary
+    until the verbatim turns fit in ``recent_tokens``. The summary is kept
+    under ``summary_tokens`` and sits first in the history. Folding down to
+    half the budget, not just under it, means a summary call every few turns
+    rather than every turn. Prompt size stays flat however long the session
+    runs.
+
+    Summaries come from ``service`` (a chat completion service) when one is
+    set; without it, or if the call fails, older turns are kept as clipped
+    excerpts instead.
+    """
+
+    def __init__(self, budget_tokens=2000, recent_tokens=None, summary_tokens=300,
+                 tool_output_chars=600, service=None):
+        self.budget_tokens = budget_tokens
+        self.recent_tokens = recent_tokens or budget_tokens // 2
+        self.summary_tokens = summary_tokens
+        self.tool_output_chars = tool_output_chars
+        self.service = service
+
+        self.summary = ""
+        self.folded_turns = 0
+        self.summaries = 0
+        self._history = None
+        self._thread = None
+
+    @property
+    def thread(self) -> "ChatHistoryAgentThread":
+        """The agent thread over this memory's history, recreated after ``clear``."""
+        if self._thread is None:
+            from semantic_kernel.agents import ChatHistoryAgentThread
+            from semantic_kernel.contents import ChatHistory
+
+            self._history = ChatHistory()
+            self._thread = ChatHistoryAgentThread(chat_history=self._history)
+        return self._thread
+
+    def tokens(self) -> int:
+        """Estimated prompt tokens the history adds to the next turn."""
+        if self._history is None:
+            return 0
+        return sum(message_tokens(message) for message in self._history.messages)
+
+    async def reduce(self) -> bool:
+        """Bring the history back under budget before a turn; True if anything changed."""
+        if self._history is None:
+            return False
+        messages = [message for message in self._history.messages if not message.metadata.get(SUMMARY_KEY)]
+        changed = self._trim_tool_outputs(messages)
+        if self.tokens() <= self.budget_tokens:
+            return changed
+
+        turns = self._turns(messages)
+        # Keep the newest turns verbatim, always at least the last one
+        kept, used = 0, 0
+        for turn in reversed(turns):
+            cost = sum(message_tokens(message) for message in turn)
+            if kept and used + cost > self.recent_tokens:
+                break
+            kept += 1
+            used += cost
+        folded = turns[:len(turns) - kept]
+        if not folded:
+            return changed
+
+        self.summary = await self._fold(self.summary, [message for turn in folded for message in turn])
+        self.folded_turns += len(folded)
+        self._history.messages = self._summary_messages() + [message for turn in turns[-kept:] for message in turn]
+        return True
+
+    def _trim_tool_outputs(self, messages) -> bool:
+        from semantic_kernel.contents import FunctionResultContent
+
+        changed = False
+        for message in messages:
+            for item in message.items:
+                if not isinstance(item, FunctionResultContent):
+                    continue
+                text = str(item.result)
+                if len(text) > self.tool_output_chars:
+                    dropped = len(text) - self.tool_output_chars
+                    item.result = f"{text[:self.tool_output_chars]} ... [{dropped} characters dropped]"
+                    changed = True
+        return changed
+
+    @staticmethod
+    def _turns(messages) -> List[list]:
+        # A turn starts at a user message and runs through the agent's calls and answer
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+
+        turns = []
+        for message in messages:
+            if message.role == AuthorRole.USER or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    def _summary_messages(self) -> list:
+        if not self.summary:
+            return []
+        from semantic_kernel.contents import ChatMessageContent
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+
+        return [ChatMessageContent(
+            role=AuthorRole.SYSTEM,
+            content=f"Summary of the conversation so far:\n{self.summary}",
+            metadata={SUMMARY_KEY: True},
+        )]
+
+    async def _fold(self, summary: str, messages) -> str:
+        from semantic_kernel.contents.utils.author_role import AuthorRole
+
+        # Plugin calls and their outputs are dropped; only what was said is summarized
+        lines = [
+            f"{'User' if message.role == AuthorRole.USER else 'Assistant'}: {message.content}"
+            for message in messages
+            if message.role in (AuthorRole.USER, AuthorRole.ASSISTANT) and message.content
+        ]
+        if not lines:
+            return summary
+        if self.service is not None:
+            try:
+                folded = await self._summarize(summary, lines)
+                if folded:
+                    self.summaries += 1
+                    return self._clip(folded)
+            except Exception as e:
+                print(f"\n[Memory] Summarization failed, keeping excerpts: {e}")
+        excerpts = [line if len(line) <= 200 else line[:200] + "..." for line in lines]
+        return self._clip("\n".join(filter(None, [summary, *excerpts])), keep_end=True)
+
+    async def _summarize(self, summary: str, lines) -> str:
+        from semantic_kernel.contents import ChatHistory
+
+        history = ChatHistory(system_message=SUMMARY_INSTRUCTIONS.format(tokens=self.summary_tokens))
+        history.add_user_message(
+            (f"Current summary:\n{summary}\n\n" if summary else "") + "New turns:\n" + "\n".join(lines)
+        )
+        settings = self.service.get_prompt_execution_settings_class()(max_tokens=self.summary_tokens)
+        response = await self.service.get_chat_message_content(chat_history=history, settings=settings)
+        return str(response or "").strip()
+
+    def _clip(self, text: str, keep_end=False) -> str:
+        # Characters are a cheap stand-in for tokens when cutting to length
+        limit = self.summary_tokens * 4
+        if len(text) <= limit:
+            return text
+        return "..." + text[-limit:] if keep_end else text[:limit] + "..."
+
+    async def clear(self):
+        """Forget the conversation: delete the thread and the summary."""
+        if self._thread is not None and self._thread.id is not None:
+            await self._thread.delete()
+        self._thread = None
+        self._history = None
+        self.summary = ""
+
+    def report(self) -> Dict:
+        return {
+            "tokens": self.tokens(),
+            "budget_tokens": self.budget_tokens,
+            "messages": len(self._history.messages) if self._history is not None else 0,
+            "summary_tokens": estimate_tokens(self.summary),
+            "folded_turns": self.folded_turns,
+            "summaries": self.summaries,
+        }
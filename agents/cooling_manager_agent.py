@@ -1,108 +1,277 @@
-# agents/cooling_manager_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class CoolingMonitorPlugin:
-    """Plugin for cooling monitoring and management."""
-
-    def __init__(self):
-        self.data = pd.read_csv("mock_data/cooling_data.csv")
-
-    @kernel_function(description="Get the next cooling reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next cooling reading with timestamp."]:
-        return self.data.iloc[0].to_dict()
-
-    @kernel_function(description="Analyzes cooling metrics and provides recommendations.")
-    def analyze_cooling(self, temperature: float,
-                        humidity: float,
-                        rack_load: float) -> Annotated[str, "Returns cooling analysis and recommendations."]:
-        if temperature > 27:
-            return f"Temperature ({temperature} �C) above optimal. Increase cooling output."
-        elif humidity > 60:
-            return f"Humidity ({humidity}%) above optimal. Increase cooling output."
-        elif rack_load > 80:
-            return f"Rack load ({rack_load}%) above optimal. Increase cooling output."
-        
-        return f"Optimal cooling conditions. No action needed."
-    
-async def monitor_cooling():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
-    # Create plugin instance
-    cooling_plugin = CoolingMonitorPlugin()
-
-    # Create the cooling manager agent
-    cooling_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[cooling_plugin],
-        name="CoolingManager",
-        instructions="""You are an AI agent specialized in cooling monitoring and management.
-        Your role is to analyze cooling metrics and provide intelligent recommendations for cooling optimization.
-        Use the available plugins to analyze cooling data and provide actionable insights.
-        Your goal is to maintain optimal temperature while minimizing energy consumption.""",
-    )
-
-    thread = None
-    try:
-        #while True:
-            # Get the next reading from mock data
-            reading = cooling_plugin.get_next_reading()
-
-            # Format the input for the agent
-            user_input = (
-                f"Analyze cooling metrics:\n"
-                f"Temperature: {reading['temperature']} �C\n"
-                f"Humidity: {reading['humidity']} %\n"
-                f"Rack Load: {reading['rack_load']} %\n"
-                "Should the cooling be increased, decreased, or maintained?"
-            )
-
-            print(f"\n[Cooling Manager] Processing: {user_input}")
-
-            # Get agent's analysis
-            response_text = ""
-            async for response in cooling_agent.invoke_stream(
-                message = user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            # Simulate real-time delay
-            #await asyncio.sleep(0.5)
-
-            if not response_text:
-                response_text = "No response generated from cooling analysis."
-
-            return response_text
-    
-    except KeyboardInterrupt:
-        print("\n[Cooling Manager] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()
-
-if __name__ == "__main__":
-    asyncio.run(monitor_cooling())
+# agents/cooling_manager_agent.py
+import os
+import numpy as np
+import pandas as pd
+import asyncio
+
+from typing import Annotated, Dict, List, Optional, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame, is_missing
+from agents.runtime import get_runtime
+from agents.thermal_grid import RackGrid
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for cooling readings
+DATA_PATH = "mock_data/cooling_data.csv"
+READING_DTYPES = {
+    "temperature": "float64",
+    "humidity": "float64",
+    "rack_load": "float64",
+}
+
+# Where a reading's rack sits on the floor plan; readings without one are not placed on the grid
+# and get no grid context in the prompt
+ROW_FIELD = "rack_row"
+COL_FIELD = "rack_col"
+
+class CoolingMonitorPlugin:
+    """Plugin for cooling monitoring and management."""
+
+    def __init__(self, temperature_limit=27, humidity_limit=60, rack_load_limit=80,
+                 borderline_margins=None, stream: ReadingStream = None, grid: RackGrid = None):
+        self.temperature_limit = temperature_limit
+        self.humidity_limit = humidity_limit
+        self.rack_load_limit = rack_load_limit
+        # Readings this close to any limit are escalated to the LLM
+        self.borderline_margins = borderline_margins or {
+            "temperature": 1.0,
+            "humidity": 3.0,
+            "rack_load": 5.0,
+        }
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+        # Floor-plan view of every rack, for hotspot clusters and zone ranking
+        self.grid = grid or RackGrid(20, 40, temperature_limit=temperature_limit,
+                                     humidity_limit=humidity_limit, rack_load_limit=rack_load_limit)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next cooling reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next cooling reading with timestamp."]:
+        return self.stream.next_reading()
+
+    @kernel_function(description="List the cooling zones that need the most intervention.")
+    def get_cooling_zones(self, k: int = 5) -> Annotated[List[dict], "Returns the k neediest zones, most first."]:
+        return self.grid.rank_zones(k)
+
+    @kernel_function(description="List the racks at the center of hot clusters.")
+    def get_hotspots(self, limit: int = 10) -> Annotated[List[dict], "Returns hotspot racks, worst first."]:
+        return self.grid.hotspots(limit)
+
+    def observe(self, reading: dict) -> Optional[dict]:
+        """Place a reading on the rack grid; returns its rack, whether it is a hotspot and its zone.
+
+        A reading that does not say where its rack is is not placed, and None is returned.
+        """
+        row, col = reading.get(ROW_FIELD), reading.get(COL_FIELD)
+        if is_missing(row) or is_missing(col):
+            return None
+        row, col = int(row), int(col)
+        hotspot = self.grid.update_rack(row, col, reading)
+        zone_row, zone_col = row // self.grid.zone_shape[0], col // self.grid.zone_shape[1]
+        return {
+            "rack": f"R{row}-{col}",
+            "hotspot": hotspot,
+            "zone": f"Z{zone_row}-{zone_col}",
+            "zone_need": round(float(self.grid.zone_need[zone_row, zone_col]), 2),
+        }
+
+    def observe_batch(self, readings) -> pd.DataFrame:
+        """Fold many rack readings (e.g. one sweep of the hall) into the grid in one update.
+
+        As in observe, readings that do not say where their rack is are not
+        placed; they are left out of the returned frame.
+        """
+        frame = as_frame(readings, ["temperature", "humidity", "rack_load"])
+        if ROW_FIELD in frame and COL_FIELD in frame:
+            frame = frame[frame[ROW_FIELD].notna() & frame[COL_FIELD].notna()]
+        else:
+            frame = frame.iloc[:0]
+        if frame.empty:
+            return pd.DataFrame(columns=["rack", "hotspot", "zone", "zone_need"], index=frame.index)
+        rows = frame[ROW_FIELD].to_numpy(dtype=np.int64)
+        cols = frame[COL_FIELD].to_numpy(dtype=np.int64)
+        hotspot = self.grid.update(rows, cols, frame)
+        zone_rows, zone_cols = rows // self.grid.zone_shape[0], cols // self.grid.zone_shape[1]
+        return pd.DataFrame({
+            "rack": [f"R{row}-{col}" for row, col in zip(rows.tolist(), cols.tolist())],
+            "hotspot": hotspot,
+            "zone": [f"Z{row}-{col}" for row, col in zip(zone_rows.tolist(), zone_cols.tolist())],
+            "zone_need": self.grid.zone_need[zone_rows, zone_cols].round(2),
+        }, index=frame.index)
+
+    @kernel_function(description="Analyzes cooling metrics and provides recommendations.")
+    def analyze_cooling(self, temperature: float,
+                        humidity: float,
+                        rack_load: float) -> Annotated[str, "Returns cooling analysis and recommendations."]:
+        if temperature > self.temperature_limit:
+            return f"Temperature ({temperature} �C) above optimal. Increase cooling output."
+        elif humidity > self.humidity_limit:
+            return f"Humidity ({humidity}%) above optimal. Increase cooling output."
+        elif rack_load > self.rack_load_limit:
+            return f"Rack load ({rack_load}%) above optimal. Increase cooling output."
+        
+        return f"Optimal cooling conditions. No action needed."
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.analyze_cooling(reading["temperature"], reading["humidity"], reading["rack_load"])
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules: returns (severity, analysis)."""
+        over_limit = (
+            reading["temperature"] > self.temperature_limit
+            or reading["humidity"] > self.humidity_limit
+            or reading["rack_load"] > self.rack_load_limit
+        )
+        return ("warning" if over_limit else "normal"), self.analyze_reading(reading)
+
+    def is_borderline(self, reading: dict) -> bool:
+        limits = {
+            "temperature": self.temperature_limit,
+            "humidity": self.humidity_limit,
+            "rack_load": self.rack_load_limit,
+        }
+        return any(abs(reading[field] - limit) <= self.borderline_margins[field]
+                   for field, limit in limits.items())
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """Place a reading on the grid; returns its extra prompt lines and the derived fields that key the response cache."""
+        placed = self.observe(reading)
+        if placed is None:
+            # No rack position: a made-up one would mislead the agent and split the cache
+            return {}, {}
+        context = {
+            "Rack": placed["rack"],
+            "Zone": placed["zone"],
+            "Part of a hotspot cluster": placed["hotspot"],
+            "Zone cooling need": placed["zone_need"],
+        }
+        return context, {"hotspot": placed["hotspot"]}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["temperature", "humidity", "rack_load"])
+        temperature, humidity, rack_load = frame["temperature"], frame["humidity"], frame["rack_load"]
+        hot = temperature > self.temperature_limit
+        humid = humidity > self.humidity_limit
+        loaded = rack_load > self.rack_load_limit
+        decision = np.select(
+            [hot, humid, loaded],
+            [
+                "Temperature (" + temperature.astype(str) + " �C) above optimal. Increase cooling output.",
+                "Humidity (" + humidity.astype(str) + "%) above optimal. Increase cooling output.",
+                "Rack load (" + rack_load.astype(str) + "%) above optimal. Increase cooling output.",
+            ],
+            default="Optimal cooling conditions. No action needed.",
+        )
+        margins = self.borderline_margins
+        borderline = (
+            ((temperature - self.temperature_limit).abs() <= margins["temperature"])
+            | ((humidity - self.humidity_limit).abs() <= margins["humidity"])
+            | ((rack_load - self.rack_load_limit).abs() <= margins["rack_load"])
+        )
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.where(hot | humid | loaded, "warning", "normal"),
+            "borderline": borderline,
+        }, index=frame.index)
+    
+# Cooling manager agent definition, built once by the shared runtime
+AGENT_NAME = "CoolingManager"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in cooling monitoring and management.
+        Your role is to analyze cooling metrics and provide intelligent recommendations for cooling optimization.
+        Use the available plugins to analyze cooling data and provide actionable insights.
+        Your goal is to maintain optimal temperature while minimizing energy consumption."""
+
+# Per-reading prompt: fixed task text first, then the reading's values
+PROMPT = PromptTemplate(
+    task="Analyze cooling metrics.",
+    fields={"temperature": "Temperature (C)", "humidity": "Humidity (%)", "rack_load": "Rack load (%)"},
+    question="Should the cooling be increased, decreased, or maintained?",
+    decisions=("Increase Cooling", "Decrease Cooling", "Maintain Cooling"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = ("temperature", "humidity", "rack_load", "hotspot")
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("temperature", "humidity", "rack_load")
+
+async def monitor_cooling(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    cooling_plugin = runtime.get_plugin("cooling")
+
+    try:
+        #while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = cooling_plugin.get_next_reading()
+
+            # Place the rack on the floor plan so the agent sees its neighborhood, not just the one reading
+            context, derived = cooling_plugin.prompt_context(reading)
+
+            # Format the input for the agent
+            user_input = PROMPT.render(reading, context)
+
+            print(f"\n[Cooling Manager] Processing: {user_input}")
+
+            # Get agent's analysis
+            response_text = await runtime.invoke("cooling", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            # Simulate real-time delay
+            #await asyncio.sleep(0.5)
+
+            if not response_text:
+                response_text = "No response generated from cooling analysis."
+
+            return response_text
+    
+    except KeyboardInterrupt:
+        print("\n[Cooling Manager] Shutting down...")
+
+async def monitor_cooling_zones(runtime=None, k=5):
+    """Rank the hall's cooling zones and ask the agent about only the k neediest."""
+    runtime = runtime or get_runtime()
+    cooling_plugin = runtime.get_plugin("cooling")
+    unplaced = 0
+    if np.isnan(cooling_plugin.grid.values["temperature"]).all():
+        # Nothing placed yet: place the telemetry that says where its racks are
+        data = cooling_plugin.data
+        unplaced = len(data) - len(cooling_plugin.observe_batch(data))
+        if unplaced and unplaced == len(data):
+            return (f"No cooling zone can be ranked: the cooling telemetry has no rack positions "
+                    f"({ROW_FIELD}/{COL_FIELD}), so no reading could be placed on the floor plan.")
+    zones = cooling_plugin.grid.rank_zones(k)
+    if not zones:
+        return "No cooling zone needs intervention."
+
+    lines = [
+        f"- {zone['zone']} (rows {zone['rows'][0]}-{zone['rows'][1]}, columns {zone['cols'][0]}-{zone['cols'][1]}): "
+        f"need {zone['need']}, {zone['hot_racks']} hot racks, {zone['hotspots']} in hotspot clusters, "
+        f"max {zone['max_temperature']} C"
+        for zone in zones
+    ]
+    user_input = (
+        f"These are the {len(zones)} cooling zones that need the most intervention, most first.\n"
+        "Recommend a cooling action for each, using only the data below:\n" + "\n".join(lines)
+    )
+    if unplaced:
+        user_input += f"\n({unplaced} readings had no rack position and were left out of the ranking.)"
+    print(f"\n[Cooling Manager] Processing zone top {len(zones)}:\n" + "\n".join(lines))
+
+    # The cache key is the ranked list itself, so an unchanged ranking reuses its narrative
+    key = {f"{i}:{zone['zone']}": zone["need"] for i, zone in enumerate(zones)}
+    key["unplaced"] = unplaced
+    response_text = await runtime.invoke("cooling", user_input, key)
+    return response_text or "No response generated from cooling analysis."
+
+if __name__ == "__main__":
+    asyncio.run(monitor_cooling())
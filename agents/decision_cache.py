@@ -0,0 +1,139 @@
+# agents/decision_cache.py
+import hashlib
+import json
+import math
+import numbers
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from agents.readings import is_missing
+
+
+class DecisionCache:
+    """LRU + TTL cache of agent responses keyed on a quantized reading and the agent's instructions.
+
+    ``quantize`` maps a field name to a step size, e.g. ``{"temperature": 0.5}``, so
+    readings that only differ below the step share one response. A ``ttl`` of 0 or
+    None keeps entries until they are evicted. With ``path`` set, entries are also
+    written to a SQLite file and survive restarts; expired rows are deleted on
+    write and the file keeps at most ``disk_maxsize`` rows, soonest to expire
+    dropped first.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, quantize=None, path=None, disk_maxsize=100_000):
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self.ttl = ttl
+        self.quantize = quantize or {}
+        self._entries = OrderedDict()
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decisions "
+                "(key TEXT PRIMARY KEY, value TEXT, latency REAL, expires REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS decisions_expires ON decisions (expires)")
+            self._db.execute("DELETE FROM decisions WHERE expires < ?", (time.time(),))
+            self._db.commit()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # LLM time the hits did not have to spend, from each entry's original latency
+        self.saved_seconds = 0.0
+
+    def _normalize(self, field, value):
+        if is_missing(value):
+            return None
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, numbers.Real):
+            step = self.quantize.get(field)
+            if step:
+                value = round(value / step) * step
+            return round(float(value), 9)
+        return str(value).strip()
+
+    def make_key(self, instructions: str, reading: dict, fields: Iterable[str] = None) -> str:
+        """Key for a reading; with ``fields``, only those count, so volatile ones like timestamps never split entries."""
+        if fields is not None:
+            reading = {field: reading.get(field) for field in fields}
+        normalized = {field: self._normalize(field, value) for field, value in reading.items()}
+        payload = json.dumps([instructions, normalized], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, latency, expires = entry
+            if expires > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += latency
+                return value
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, latency, expires FROM decisions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[2] > now:
+                value, latency, expires = row
+                self._remember(key, value, latency, expires)
+                self.hits += 1
+                self.disk_hits += 1
+                self.saved_seconds += latency
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: str, latency: float = 0.0):
+        expires = time.time() + self.ttl if self.ttl else math.inf
+        self._remember(key, value, latency, expires)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?)",
+                (key, value, latency, expires),
+            )
+            self._db.execute("DELETE FROM decisions WHERE expires < ?", (time.time(),))
+            excess = self._db.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] - self.disk_maxsize
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM decisions WHERE key IN (SELECT key FROM decisions ORDER BY expires LIMIT ?)",
+                    (excess,),
+                )
+            self._db.commit()
+
+    def _remember(self, key, value, latency, expires):
+        self._entries[key] = (value, latency, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM decisions")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "size": len(self._entries),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
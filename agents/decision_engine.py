@@ -0,0 +1,100 @@
+# agents/decision_engine.py
+import time
+from collections import defaultdict
+
+from agents.batch_analysis import BatchAnalyzer
+from agents.runtime import AgentRuntime, get_runtime
+
+# How a reading was decided: by the rules, by the agent, or by a cached agent answer
+PATHS = ("rule", "llm", "cache")
+
+
+class TieredDecisionEngine:
+    """Answers clear-cut readings with the plugin rules and escalates borderline ones to the LLM agent.
+
+    With a BatchAnalyzer, ``evaluate_batch`` sends all of a batch's
+    borderline readings to the agent in as few calls as fit its budget.
+    """
+
+    def __init__(self, runtime: AgentRuntime = None, batch: BatchAnalyzer = None):
+        self.runtime = runtime or get_runtime()
+        self.batch = batch
+        # Per-domain counters for each path: {"energy": {"rule": 12, "llm": 1, "cache": 3}, ...}
+        self.counts = defaultdict(lambda: dict.fromkeys(PATHS, 0))
+        self.latency = dict.fromkeys(PATHS, 0.0)
+
+    async def evaluate(self, domain: str, reading: dict = None) -> dict:
+        plugin = self.runtime.get_plugin(domain)
+        if reading is None:
+            reading = plugin.get_next_reading()
+
+        start = time.perf_counter()
+        severity, analysis = plugin.assess_reading(reading)
+        if plugin.is_borderline(reading):
+            # Ambiguous reading: let the agent reason about it
+            monitor = self.runtime.get_monitor(domain)
+            decision = await monitor(self.runtime, reading)
+            path = "llm"
+        else:
+            decision = analysis
+            path = "rule"
+
+        self.counts[domain][path] += 1
+        self.latency[path] += time.perf_counter() - start
+        return {
+            "domain": domain,
+            "path": path,
+            "severity": severity,
+            "decision": decision,
+        }
+
+    async def evaluate_batch(self, domain: str, readings) -> list:
+        """evaluate over many readings of one domain: one vectorized rules pass, then the borderline ones."""
+        plugin = self.runtime.get_plugin(domain)
+        readings = list(readings)
+        start = time.perf_counter()
+        # The reading dicts themselves, so plugins can recognise them again when they reach the LLM path
+        rules = plugin.analyze_batch(readings)
+        borderline = [index for index, flag in enumerate(rules["borderline"].tolist()) if flag]
+        results = [
+            {"domain": domain, "path": "rule", "severity": severity, "decision": decision}
+            for severity, decision in zip(rules["severity"].tolist(), rules["decision"].tolist())
+        ]
+        self.counts[domain]["rule"] += len(readings) - len(borderline)
+        self.latency["rule"] += time.perf_counter() - start
+        if not borderline:
+            return results
+
+        start = time.perf_counter()
+        if self.batch is not None:
+            # Each answer says whether the agent, the cache or (after failed retries) the rules decided it
+            answers = await self.batch.analyze(domain, [readings[index] for index in borderline])
+            decided = [
+                (f"{answer['decision']}: {answer['reason']}" if answer["reason"] else answer["decision"], answer["path"])
+                for answer in answers
+            ]
+        else:
+            monitor = self.runtime.get_monitor(domain)
+            decided = [(await monitor(self.runtime, readings[index]), "llm") for index in borderline]
+        elapsed = time.perf_counter() - start
+        for index, (decision, path) in zip(borderline, decided):
+            results[index].update(path=path, decision=decision)
+            self.counts[domain][path] += 1
+            # The step's time is shared evenly; a batch call answers its readings together
+            self.latency[path] += elapsed / len(borderline)
+        return results
+
+    def report(self) -> dict:
+        """Readings per path overall and per domain, with mean latency per path in ms."""
+        totals = dict.fromkeys(PATHS, 0)
+        for counts in self.counts.values():
+            for path, count in counts.items():
+                totals[path] += count
+        return {
+            "total": totals,
+            "by_domain": {domain: dict(counts) for domain, counts in self.counts.items()},
+            "mean_latency_ms": {
+                path: (self.latency[path] / totals[path] * 1000) if totals[path] else 0.0
+                for path in totals
+            },
+        }
@@ -1,98 +1,283 @@
-# sentinelgreen_project/agents/energy_optimizer_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class EnergyMonitorPlugin:
-    """Plugin for energy monitoring and analysis."""
-    
-    def __init__(self, energy_threshold=70):
-        self.energy_threshold = energy_threshold
-        self.data = pd.read_csv('mock_data/energy_data.csv')
-
-    @kernel_function(description="Get the next energy reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next energy reading with timestamp."]:
-        # This would be replaced with real sensor data in production
-        return self.data.iloc[0].to_dict()
-
-    @kernel_function(description="Analyzes energy usage and provides recommendations.")
-    def analyze_energy(self, current_energy: float) -> Annotated[str, "Returns energy analysis and recommendations."]:
-        if current_energy > self.energy_threshold:
-            return (
-                f"High energy detected ({current_energy} units).\n"
-                f"Action: Reduce lighting, shift non-critical compute loads."
-            )
-        return f"Energy usage normal ({current_energy} units). No immediate action needed."
-
-async def monitor_energy():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
- # Create plugin instance
-    energy_plugin = EnergyMonitorPlugin()
- # Create the energy monitor agent
-    energy_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[energy_plugin],
-        name="EnergyMonitor",
-        instructions="""You are an AI agent specialized in energy monitoring and optimization.
-        Your role is to analyze energy usage data in real-time and provide intelligent recommendations for energy conservation and optimization. 
-        Use the available plugins to analyze energy data and provide actionable insights.""",
-    )
-
-    thread = None
-    try:
-       # while True:
-            # Get the next reading from mock data
-            reading = energy_plugin.get_next_reading()
-            
-            # Format the input for the agent
-            user_input = f"Analyze energy usage: {reading['energy_usage']} units at {reading['timestamp']}"
-            
-            print(f"\n[Energy Monitor] Processing: {user_input}")
-            
-            # Get agent's analysis
-            response_text = ""
-            async for response in energy_agent.invoke_stream(
-                messages=user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            if not response_text:
-                response_text = "No response generated from energy analysis."
-
-            # Simulate real-time delay
-            #await asyncio.sleep(1)
-            
-            return response_text
-        
-    except KeyboardInterrupt:
-        print("\n[Energy Monitor] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()
-
-if __name__ == "__main__":
+# sentinelgreen_project/agents/energy_optimizer_agent.py
+import os
+import numpy as np
+import pandas as pd
+import asyncio
+from collections import OrderedDict
+
+from typing import Annotated, Dict, Mapping, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame, epoch_seconds, is_missing
+from agents.rolling_stats import RollingStats
+from agents.runtime import get_runtime
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for energy readings
+DATA_PATH = "mock_data/energy_data.csv"
+READING_DTYPES = {
+    "timestamp": "object",
+    "energy_usage": "float64",
+}
+
+# Readings without a feed id (the mock data) all belong to one meter
+FEED_FIELD = "feed_id"
+DEFAULT_FEED = "main"
+
+# Readings remembered as scored, so the rules and the prompt fold each one in only once
+SCORED_MEMORY = 10_000
+
+
+class EnergyMonitorPlugin:
+    """Plugin for energy monitoring and analysis."""
+    
+    def __init__(self, energy_threshold=70, borderline_margin=5, stream: ReadingStream = None,
+                 stats: RollingStats = None, zscore_margin=0.5):
+        self.energy_threshold = energy_threshold
+        # Readings this close to the threshold are escalated to the LLM
+        self.borderline_margin = borderline_margin
+        # Per-feed rolling statistics, so usage is also judged against its own recent history
+        self.stats = stats or RollingStats()
+        # Z-scores this close to the anomaly cutoff are escalated too
+        self.zscore_margin = zscore_margin
+        # Readings already folded into the statistics -> (reading, scores). Timestamped ones are keyed
+        # by (feed, epoch seconds, usage); others by id(reading), held so its id is not reused meanwhile
+        self._scored = OrderedDict()
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next energy reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next energy reading with timestamp."]:
+        # This would be replaced with real sensor data in production
+        return self.stream.next_reading()
+
+    @kernel_function(description="Analyzes energy usage and provides recommendations.")
+    def analyze_energy(self, current_energy: float) -> Annotated[str, "Returns energy analysis and recommendations."]:
+        if current_energy > self.energy_threshold:
+            return (
+                f"High energy detected ({current_energy} units).\n"
+                f"Action: Reduce lighting, shift non-critical compute loads."
+            )
+        return f"Energy usage normal ({current_energy} units). No immediate action needed."
+
+    @kernel_function(description="Get the recent trend (rolling mean, spread, EWMA) of an energy feed.")
+    def get_energy_trend(self, feed: str = DEFAULT_FEED) -> Annotated[str, "Returns the feed's rolling statistics."]:
+        if feed not in self.stats:
+            return f"No readings seen yet for feed {feed}."
+        trend = self.stats.snapshot(feed)
+        return (
+            f"Feed {feed}: {trend['count']} readings, rolling mean {trend['mean']:.2f} "
+            f"(std {trend['std']:.2f}), EWMA {trend['ewma']:.2f}, last {trend['last_value']:.2f} units."
+        )
+
+    def _seen(self, key, reading):
+        seen = self._scored.get(key)
+        if seen is not None and (seen[0] is None or seen[0] is reading):
+            return seen[1]
+        return None
+
+    def _remember(self, key, reading, scores):
+        if key is None:
+            return
+        self._scored[key] = (reading if isinstance(key, int) else None, scores)
+        if len(self._scored) > SCORED_MEMORY:
+            self._scored.popitem(last=False)
+
+    def observe(self, reading: dict) -> dict:
+        """Fold a reading into its feed's rolling statistics; returns its z-scores, rate and anomaly flag.
+
+        A reading is folded in once however many paths look at it (rules,
+        borderline check, prompt); later calls return its scores. One without
+        a timestamp is recognised as the same dict, one with a timestamp by
+        its feed, time and usage.
+        """
+        feed = reading.get(FEED_FIELD)
+        feed = DEFAULT_FEED if is_missing(feed) else feed
+        timestamp = epoch_seconds([reading.get("timestamp")])[0]
+        key = id(reading) if np.isnan(timestamp) else (feed, timestamp, float(reading["energy_usage"]))
+        seen = self._seen(key, reading)
+        if seen is not None:
+            return dict(seen)
+        scores = self.stats.update(feed, reading["energy_usage"], None if np.isnan(timestamp) else timestamp)
+        self._remember(key, reading, scores)
+        return scores
+
+    def observe_batch(self, readings, records=None) -> pd.DataFrame:
+        """observe over many readings (e.g. one tick of every feed) without a per-reading recompute.
+
+        ``records`` are the reading dicts a frame was built from (a list of
+        dicts is its own); rows without a timestamp are only recognised again,
+        here or by observe, through them.
+        """
+        if records is None and isinstance(readings, (list, tuple)) and readings and isinstance(readings[0], Mapping):
+            records = readings
+        frame = as_frame(readings, ["energy_usage"])
+        feeds = frame[FEED_FIELD].where(frame[FEED_FIELD].notna(), DEFAULT_FEED).to_numpy(dtype=object) \
+            if FEED_FIELD in frame else np.full(len(frame), DEFAULT_FEED, dtype=object)
+        values = frame["energy_usage"].to_numpy(dtype=np.float64)
+        timestamps = epoch_seconds(frame["timestamp"]) if "timestamp" in frame else np.full(len(frame), np.nan)
+        keys = [
+            (None if records is None else id(records[i])) if np.isnan(t) else (feed, t, value)
+            for i, (feed, t, value) in enumerate(zip(feeds, timestamps, values))
+        ]
+        originals = [None] * len(frame) if records is None else records
+
+        # Only readings not scored before are folded in
+        fresh, batch_keys = [], set()
+        for i, key in enumerate(keys):
+            if key is None or (self._seen(key, originals[i]) is None and key not in batch_keys):
+                fresh.append(i)
+                batch_keys.add(key)
+        scores = self.stats.update_many(feeds[fresh], values[fresh], timestamps[fresh] if "timestamp" in frame else None)
+        result = pd.DataFrame(index=frame.index, columns=list(scores), dtype=object)
+        for position, i in enumerate(fresh):
+            row = {name: column[position].item() for name, column in scores.items()}
+            self._remember(keys[i], originals[i], row)
+            result.iloc[i] = [row[name] for name in scores]
+        for i, key in enumerate(keys):
+            if key is not None and result.iloc[i].isna().all():
+                seen = self._seen(key, originals[i])
+                result.iloc[i] = [seen[name] for name in scores]
+        return result.astype({name: column.dtype for name, column in scores.items()})
+
+    def _relative_flags(self, scores):
+        # Anomalous against the feed's own history, and borderline on the z-score or EWMA deviation
+        zscore = np.abs(np.nan_to_num(np.asarray(scores["zscore"], dtype=np.float64)))
+        ewma_zscore = np.abs(np.nan_to_num(np.asarray(scores["ewma_zscore"], dtype=np.float64)))
+        mature = np.asarray(scores["count"]) >= self.stats.min_periods
+        cutoff = self.stats.z_threshold
+        anomaly = np.asarray(scores["anomaly"], dtype=bool)
+        borderline = mature & (
+            (np.abs(zscore - cutoff) <= self.zscore_margin)
+            # The EWMA moved past the cutoff while the rolling window still looks normal: a drift
+            | ((ewma_zscore >= cutoff) & ~anomaly)
+        )
+        return anomaly, borderline
+
+    @staticmethod
+    def _unusual_text(usage, mean, zscore) -> str:
+        return (
+            f"Energy usage unusual for this feed ({usage} units against a rolling mean of {mean:.2f}, "
+            f"z-score {zscore:.2f}).\nAction: Check for a stuck load, a new workload or a metering fault."
+        )
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.assess_reading(reading)[1]
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules, fixed threshold and feed history both: returns (severity, analysis)."""
+        usage = reading["energy_usage"]
+        scores = self.observe(reading)
+        anomaly = bool(self._relative_flags(scores)[0])
+        high = usage > self.energy_threshold
+        analysis = self.analyze_energy(usage)
+        if anomaly:
+            unusual = self._unusual_text(usage, scores["mean"], scores["zscore"])
+            analysis = f"{analysis}\n{unusual}" if high else unusual
+        return ("warning" if high or anomaly else "normal"), analysis
+
+    def is_borderline(self, reading: dict) -> bool:
+        scores = self.observe(reading)
+        near_threshold = abs(reading["energy_usage"] - self.energy_threshold) <= self.borderline_margin
+        return bool(near_threshold or self._relative_flags(scores)[1])
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """Observe a reading; returns its extra prompt lines and the derived fields that key the response cache."""
+        # Judge the reading against its feed's own history as well as the fixed threshold
+        scores = self.observe(reading)
+        context = {}
+        if not np.isnan(scores["zscore"]):
+            context = {
+                "Rolling mean": scores["mean"],
+                "Z-score": scores["zscore"],
+                "Relative anomaly": scores["anomaly"],
+            }
+        return context, {"anomaly": scores["anomaly"]}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["energy_usage"])
+        # The reading dicts too, so observe recognises them when they reach the prompt
+        scores = self.observe_batch(frame, readings if frame is not readings else None)
+        anomaly, relative_borderline = self._relative_flags(scores)
+        energy = frame["energy_usage"]
+        text = energy.astype(str)
+        high = (energy > self.energy_threshold).to_numpy()
+        decision = np.where(
+            high,
+            "High energy detected (" + text + " units).\nAction: Reduce lighting, shift non-critical compute loads.",
+            "Energy usage normal (" + text + " units). No immediate action needed.",
+        ).astype(object)
+        # Relative anomalies are rare, so their longer text is built row by row
+        for i in np.flatnonzero(anomaly):
+            unusual = self._unusual_text(energy.iloc[i], scores["mean"].iloc[i], scores["zscore"].iloc[i])
+            decision[i] = f"{decision[i]}\n{unusual}" if high[i] else unusual
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.where(high | anomaly, "warning", "normal"),
+            "borderline": ((energy - self.energy_threshold).abs() <= self.borderline_margin).to_numpy()
+                          | relative_borderline,
+        }, index=frame.index)
+
+# Energy monitor agent definition, built once by the shared runtime
+AGENT_NAME = "EnergyMonitor"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in energy monitoring and optimization.
+        Your role is to analyze energy usage data in real-time and provide intelligent recommendations for energy conservation and optimization. 
+        Use the available plugins to analyze energy data and provide actionable insights."""
+
+# Per-reading prompt: fixed task text first, then the reading's values
+PROMPT = PromptTemplate(
+    task="Analyze energy usage.",
+    fields={"energy_usage": "Energy usage (units)", "timestamp": "Time"},
+    decisions=("No Action", "Reduce Load", "Investigate"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = ("energy_usage", "anomaly")
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("energy_usage",)
+
+async def monitor_energy(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    energy_plugin = runtime.get_plugin("energy")
+
+    try:
+       # while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = energy_plugin.get_next_reading()
+            
+            # Judge the reading against its feed's own history as well as the fixed threshold
+            context, derived = energy_plugin.prompt_context(reading)
+
+            # Format the input for the agent
+            user_input = PROMPT.render(reading, context)
+            
+            print(f"\n[Energy Monitor] Processing: {user_input}")
+            
+            # Get agent's analysis
+            response_text = await runtime.invoke("energy", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            if not response_text:
+                response_text = "No response generated from energy analysis."
+
+            # Simulate real-time delay
+            #await asyncio.sleep(1)
+            
+            return response_text
+        
+    except KeyboardInterrupt:
+        print("\n[Energy Monitor] Shutting down...")
+
+if __name__ == "__main__":
     asyncio.run(monitor_energy())
\ No newline at end of file
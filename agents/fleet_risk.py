@@ -0,0 +1,186 @@
+# agents/fleet_risk.py
+import heapq
+from typing import Dict, Hashable, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+from agents.readings import as_frame, is_missing, missing_mask
+
+# How much each factor contributes to a component's 0-100 risk score
+DEFAULT_WEIGHTS = {
+    "spikes": 0.35,
+    "uptime_hours": 0.15,
+    "last_maintenance": 0.25,
+    "failure_history": 0.25,
+}
+
+# failure_history values that mean "no recorded failure"
+NO_FAILURE = {"no", "false", "0", "none"}
+
+FEATURES = ["component", "uptime_hours", "spikes", "last_maintenance", "failure_history"]
+
+
+def _saturate(ratio):
+    # 0 at 0, ~0.63 at the limit, approaching 1 well past it
+    return 1.0 - np.exp(-np.clip(ratio, 0.0, None))
+
+
+class FleetRiskScorer:
+    """Risk scores for a whole fleet of components, with a heap for the top-k.
+
+    ``score`` is vectorized over any number of readings. ``update`` keeps the
+    latest score per component and pushes it on a lazy max-heap: superseded
+    entries stay in the heap until they surface, so an update costs
+    O(log n) and ``top_k`` costs O(k log n) however large the fleet is.
+    """
+
+    def __init__(self, spike_limit=10, uptime_limit=1000, maintenance_interval=30,
+                 weights: Dict[str, float] = None, capacity=1024):
+        self.spike_limit = spike_limit
+        self.uptime_limit = uptime_limit
+        self.maintenance_interval = maintenance_interval
+        self.weights = weights or DEFAULT_WEIGHTS
+
+        self._slots: Dict[Hashable, int] = {}
+        self._components: List[Hashable] = []
+        # Entries are (-score, version, slot); an entry is live while its version is current
+        self._heap = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.scores = np.zeros(capacity)
+        self.version = np.zeros(capacity, dtype=np.int64)
+        self.uptime_hours = np.zeros(capacity)
+        self.spikes = np.zeros(capacity)
+        self.last_maintenance = np.zeros(capacity)
+        self.failed = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, needed):
+        capacity = len(self.scores)
+        if needed <= capacity:
+            return
+        old = {name: getattr(self, name) for name in
+               ("scores", "version", "uptime_hours", "spikes", "last_maintenance", "failed")}
+        self._allocate(max(needed, capacity * 2))
+        for name, array in old.items():
+            getattr(self, name)[:capacity] = array
+
+    def __len__(self):
+        return len(self._slots)
+
+    @staticmethod
+    def failure_flag(failure_history) -> bool:
+        """failure_flags for one value."""
+        if is_missing(failure_history):
+            return False
+        return str(failure_history).strip().lower() not in NO_FAILURE
+
+    def failure_flags(self, failure_history: pd.Series) -> np.ndarray:
+        """True where a failure is on record: "Yes", a positive count, any other note."""
+        text = failure_history.astype(object).where(~missing_mask(failure_history), "none")
+        return ~text.astype(str).str.strip().str.lower().isin(NO_FAILURE).to_numpy()
+
+    def score(self, readings) -> pd.DataFrame:
+        """Risk factors and a 0-100 score for every reading, without touching the fleet state."""
+        frame = as_frame(readings, FEATURES)
+        factors = pd.DataFrame({
+            "spikes": _saturate(frame["spikes"].to_numpy(dtype=np.float64) / self.spike_limit),
+            "uptime_hours": _saturate(frame["uptime_hours"].to_numpy(dtype=np.float64) / self.uptime_limit),
+            "last_maintenance": _saturate(
+                frame["last_maintenance"].to_numpy(dtype=np.float64) / self.maintenance_interval
+            ),
+            "failure_history": self.failure_flags(frame["failure_history"]).astype(np.float64),
+        }, index=frame.index)
+        total = sum(self.weights.values())
+        risk = sum(factors[name] * weight for name, weight in self.weights.items()) / total * 100
+        return factors.assign(risk=risk.round(2), component=frame["component"])
+
+    def update(self, readings) -> pd.DataFrame:
+        """Score readings and make them the current state of their components."""
+        frame = as_frame(readings, FEATURES)
+        scored = self.score(frame)
+        slots = np.fromiter(
+            (self._slot(component) for component in frame["component"]), dtype=np.int64, count=len(frame)
+        )
+        self._grow(len(self._slots))
+
+        # With repeated components the last reading wins, as it would one at a time
+        slots, last = np.unique(slots[::-1], return_index=True)
+        rows = len(frame) - 1 - last
+        self.scores[slots] = scored["risk"].to_numpy()[rows]
+        self.uptime_hours[slots] = frame["uptime_hours"].to_numpy(dtype=np.float64)[rows]
+        self.spikes[slots] = frame["spikes"].to_numpy(dtype=np.float64)[rows]
+        self.last_maintenance[slots] = frame["last_maintenance"].to_numpy(dtype=np.float64)[rows]
+        self.failed[slots] = scored["failure_history"].to_numpy()[rows] > 0
+        self._push(slots)
+        return scored
+
+    def update_reading(self, reading: Mapping) -> float:
+        """update for a single reading, scored from its scalars; returns its risk."""
+        uptime_hours = float(reading["uptime_hours"])
+        spikes = float(reading["spikes"])
+        last_maintenance = float(reading["last_maintenance"])
+        failed = self.failure_flag(reading["failure_history"])
+        factors = {
+            "spikes": _saturate(spikes / self.spike_limit),
+            "uptime_hours": _saturate(uptime_hours / self.uptime_limit),
+            "last_maintenance": _saturate(last_maintenance / self.maintenance_interval),
+            "failure_history": float(failed),
+        }
+        risk = round(float(sum(factors[name] * weight for name, weight in self.weights.items())
+                           / sum(self.weights.values()) * 100), 2)
+
+        slot = self._slot(reading["component"])
+        self._grow(len(self._slots))
+        self.scores[slot] = risk
+        self.uptime_hours[slot] = uptime_hours
+        self.spikes[slot] = spikes
+        self.last_maintenance[slot] = last_maintenance
+        self.failed[slot] = failed
+        self._push(np.array([slot]))
+        return risk
+
+    def _push(self, slots: np.ndarray):
+        self.version[slots] += 1
+        entries = zip((-self.scores[slots]).tolist(), self.version[slots].tolist(), slots.tolist())
+        if len(slots) > len(self._heap) // 4 or len(self._heap) > 2 * len(self._slots):
+            # Large refresh, or too many superseded entries: rebuild from live entries in O(n)
+            self._heap = [entry for entry in self._heap if self._live(entry)]
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+    def _slot(self, component):
+        slot = self._slots.get(component)
+        if slot is None:
+            slot = self._slots[component] = len(self._components)
+            self._components.append(component)
+        return slot
+
+    def _live(self, entry) -> bool:
+        return entry[1] == self.version[entry[2]]
+
+    def top_k(self, k=10) -> List[dict]:
+        """The k riskiest components, highest score first."""
+        found = []
+        while self._heap and len(found) < k:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry):
+                found.append(entry)
+        # Put the live entries back; stale ones are gone for good
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [self.describe(slot) for _, _, slot in found]
+
+    def describe(self, slot: int) -> dict:
+        return {
+            "component": self._components[slot],
+            "risk": float(self.scores[slot]),
+            "uptime_hours": float(self.uptime_hours[slot]),
+            "spikes": float(self.spikes[slot]),
+            "last_maintenance": float(self.last_maintenance[slot]),
+            "failure_history": bool(self.failed[slot]),
+        }
@@ -0,0 +1,159 @@
+# agents/issue_router.py
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Terms that pull an issue towards each agent. Keywords count fully, synonyms a little less.
+DEFAULT_VOCABULARY = {
+    "energy": {
+        "keywords": ["power", "energy", "surge"],
+        "synonyms": ["electricity", "electrical", "voltage", "kwh", "kilowatt", "watt", "pue",
+                     "consumption", "ups", "pdu", "outage", "brownout", "load shedding"],
+    },
+    "cooling": {
+        "keywords": ["temperature", "cooling", "thermal", "humidity"],
+        "synonyms": ["hot", "heat", "overheat", "overheating", "hvac", "crac", "chiller", "airflow",
+                     "fan", "hotspot", "degree", "celsius", "rack load"],
+    },
+    "security": {
+        "keywords": ["security", "access", "intrusion"],
+        "synonyms": ["login", "badge", "keycard", "breach", "unauthorized", "intruder", "tailgating",
+                     "failed attempt", "biometric", "camera", "door", "suspicious"],
+    },
+    "maintenance": {
+        "keywords": ["maintenance", "equipment", "spike", "failure"],
+        "synonyms": ["repair", "broken", "fault", "faulty", "degraded", "uptime", "wear", "pump",
+                     "component", "inspection", "replace", "vibration", "malfunction"],
+    },
+    "compliance": {
+        "keywords": ["compliance", "audit"],
+        "synonyms": ["regulation", "regulatory", "policy", "carbon", "emission", "renewable", "esg",
+                     "sustainability", "violation", "report", "target"],
+    },
+    "resource": {
+        "keywords": ["resource", "allocation"],
+        "synonyms": ["compute", "cpu", "storage", "bandwidth", "capacity", "scale", "scaling",
+                     "utilization", "vm", "cost", "overloaded", "underutilized", "workload"],
+    },
+}
+
+KEYWORD_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.6
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Words too common in issue text and agent descriptions to say anything about the domain
+STOPWORDS = {"a", "an", "and", "the", "of", "to", "in", "on", "for", "with", "is", "are", "at",
+             "by", "or", "it", "this", "that", "our", "we", "monitor", "optimize", "manage", "issue"}
+
+
+def _stem(token: str) -> str:
+    """Fold common English suffixes so "temperatures" and "overheating" hit their base terms."""
+    for suffix in ("ing", "ed", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix) and not token.endswith("ss"):
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(token) for token in _TOKEN.findall(text.lower())]
+
+
+class IssueRouter:
+    """Scores every agent for an issue in one pass over its tokens.
+
+    The vocabulary is compiled once into a term -> [(agent, weight)] table;
+    multi-word terms are matched as token n-grams. With ``use_tfidf`` a small
+    TF-IDF model built from each agent's vocabulary and ``descriptions`` adds
+    a cosine-similarity score, which catches wording the vocabulary misses.
+
+    An agent is routed to only when its score passes ``min_score`` (a single
+    synonym scores 0.6) and is at least ``min_ratio`` of the best agent's,
+    so one weak TF-IDF overlap does not pull in an unrelated agent.
+    """
+
+    def __init__(self, vocabulary: Dict[str, Dict[str, List[str]]] = None,
+                 descriptions: Dict[str, str] = None, use_tfidf: bool = False,
+                 tfidf_weight: float = 1.0, min_score: float = 0.5, min_ratio: float = 0.3):
+        self.vocabulary = vocabulary or DEFAULT_VOCABULARY
+        self.agents = list(self.vocabulary)
+        self.use_tfidf = use_tfidf
+        self.tfidf_weight = tfidf_weight
+        self.min_score = min_score
+        self.min_ratio = min_ratio
+
+        self._terms = defaultdict(list)
+        self._max_ngram = 1
+        for agent, groups in self.vocabulary.items():
+            for group, weight in (("keywords", KEYWORD_WEIGHT), ("synonyms", SYNONYM_WEIGHT)):
+                for term in groups.get(group, []):
+                    tokens = tuple(tokenize(term))
+                    self._max_ngram = max(self._max_ngram, len(tokens))
+                    self._terms[tokens].append((agent, weight))
+
+        if use_tfidf:
+            self._build_tfidf(descriptions or {})
+
+    def _build_tfidf(self, descriptions):
+        documents = {}
+        for agent, groups in self.vocabulary.items():
+            text = " ".join(groups.get("keywords", []) + groups.get("synonyms", []))
+            documents[agent] = Counter(
+                token for token in tokenize(text + " " + descriptions.get(agent, ""))
+                if token not in STOPWORDS
+            )
+        document_frequency = Counter(token for counts in documents.values() for token in counts)
+        self._idf = {
+            token: math.log((1 + len(documents)) / (1 + frequency)) + 1.0
+            for token, frequency in document_frequency.items()
+        }
+        self._vectors = {agent: self._vectorize(counts) for agent, counts in documents.items()}
+
+    def _vectorize(self, counts: Counter) -> Dict[str, float]:
+        vector = {
+            token: (1.0 + math.log(count)) * self._idf[token]
+            for token, count in counts.items() if token in self._idf
+        }
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {token: value / norm for token, value in vector.items()} if norm else {}
+
+    def score(self, text: str) -> Dict[str, float]:
+        tokens = tokenize(text)
+        grams = Counter(
+            tuple(tokens[i:i + n])
+            for n in range(1, self._max_ngram + 1)
+            for i in range(len(tokens) - n + 1)
+        )
+        scores = dict.fromkeys(self.agents, 0.0)
+        for gram, count in grams.items():
+            entries = self._terms.get(gram)
+            if not entries:
+                continue
+            # Repeating a term helps, but with diminishing returns
+            tf = 1.0 + math.log(count)
+            for agent, weight in entries:
+                scores[agent] += weight * tf
+
+        if self.use_tfidf:
+            query = self._vectorize(Counter(token for token in tokens if token not in STOPWORDS))
+            for agent, vector in self._vectors.items():
+                similarity = sum(value * vector.get(token, 0.0) for token, value in query.items())
+                scores[agent] += self.tfidf_weight * similarity
+        return scores
+
+    def rank(self, text: str, min_score: float = None, min_ratio: float = None) -> List[Tuple[str, float]]:
+        """Agents that clear both cutoffs, best first, with their share of the total score as confidence."""
+        min_score = self.min_score if min_score is None else min_score
+        min_ratio = self.min_ratio if min_ratio is None else min_ratio
+        scores = self.score(text)
+        total = sum(scores.values())
+        if total == 0:
+            return []
+        cutoff = max(min_score, min_ratio * max(scores.values()))
+        order = {agent: i for i, agent in enumerate(self.agents)}
+        ranked = sorted(
+            (agent for agent, value in scores.items() if value > 0 and value >= cutoff),
+            key=lambda agent: (-scores[agent], order[agent]),
+        )
+        return [(agent, scores[agent] / total) for agent in ranked]
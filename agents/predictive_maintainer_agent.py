@@ -1,125 +1,261 @@
-# agents/predictive_maintainer_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class PredictiveMaintainerPlugin:
-    """Plugin for predictive maintenance analysis."""
-
-    def __init__(self):
-        self.data = pd.read_csv("mock_data/maintenance_data.csv")
-
-    @kernel_function(description="Get the next maintenance reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next maintenance reading with timestamp."]:
-        return self.data.iloc[0].to_dict()
-    
-    @kernel_function(description="Analyzes maintenance data and provides recommendations.")
-    def analyze_maintenance(self,
-                            component: str,
-                            uptime_hours: int,
-                            spikes: int,
-                            last_maintenance: int,
-                            failure_history: str) -> Annotated[str, "Returns maintenance analysis and recommendations."]:
-        if failure_history != "nan":
-            return f" Past Failure detected: {component} has failed {failure_history} times in the last {uptime_hours} hours."
-        elif spikes > 10:
-            return f"Potential failure: {component} has {spikes} temperature spikes in the last {uptime_hours} hours."
-        elif uptime_hours > 1000 and last_maintenance > 30:
-            return f"Scheduled maintenance: {component} has been in operation for {uptime_hours} hours without maintenance."
-        return f"No action needed: {component} is operating normally."
-        
-async def monitor_maintenance():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
-    # Create plugin instance
-    maintenance_plugin = PredictiveMaintainerPlugin()
-
-    # Create the predictive maintainer agent
-    maintainer_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[maintenance_plugin],
-        name="PredictiveMaintainer",
-         instructions="""You are an AI agent specialized in predictive maintenance.
-        Your role is to analyze maintenance data and provide intelligent recommendations for proactive maintenance.
-        
-        IMPORTANT: You must ONLY analyze the data provided in the input. DO NOT make up or assume any data.
-        The input will contain specific information about a single component including:
-        - Component name
-        - Uptime hours
-        - Temperature spike count
-        - Days since last maintenance
-        - Failure history
-        
-        Based on ONLY these provided metrics, recommend one of:
-        - 'No Action' if the component is operating normally
-        - 'Schedule Maintenance' if maintenance is needed soon
-        - 'Urgent Inspection' if immediate attention is required
-        
-        DO NOT analyze or mention any components that are not in the provided data.""",
-    )
-
-    thread = None
-    try:
-        #while True:
-            # Get the next reading from mock data
-            reading = maintenance_plugin.get_next_reading()
-
-            # Format the input for the agent
-            user_input = (
-                "Analyze the following data and provide a maintenance recommendation:\n"
-                "Use the data provided in the input to make a recommendation.\n"
-                f"Component: {reading['component']}\n"
-                f"Uptime (hours): {reading['uptime_hours']}\n"
-                f"Temperature Spike Count: {reading['spikes']}\n"
-                f"Last Maintenance (days ago): {reading['last_maintenance']}\n"
-                f"Failure History: {reading['failure_history']}"
-            )
-
-            print(f"\n[Predictive Maintainer] Processing: {user_input}")
-
-            # Get agent's analysis
-            response_text = ""
-            async for response in maintainer_agent.invoke_stream(
-                message=user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            # Simulate real-time delay
-            #await asyncio.sleep(0.5)
-
-            if not response_text:
-                response_text = "No response generated from predictive maintenance analysis."
-
-            return response_text
-    
-    except KeyboardInterrupt:
-        print("\n[Predictive Maintainer] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()   
-
-if __name__ == "__main__":
+# agents/predictive_maintainer_agent.py
+import os
+import numpy as np
+import pandas as pd
+import asyncio
+
+from typing import Annotated, Dict, List, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.fleet_risk import FleetRiskScorer
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame, text_or_nan, text_or_nan_column
+from agents.runtime import get_runtime
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for maintenance readings
+DATA_PATH = "mock_data/maintenance_data.csv"
+READING_DTYPES = {
+    "component": "object",
+    "uptime_hours": "int64",
+    "spikes": "int64",
+    "last_maintenance": "int64",
+    "failure_history": "category",
+}
+
+class PredictiveMaintainerPlugin:
+    """Plugin for predictive maintenance analysis."""
+
+    def __init__(self, spike_limit=10, uptime_limit=1000, maintenance_interval=30,
+                 borderline_margins=None, stream: ReadingStream = None):
+        self.spike_limit = spike_limit
+        self.uptime_limit = uptime_limit
+        self.maintenance_interval = maintenance_interval
+        # Readings this close to any limit are escalated to the LLM
+        self.borderline_margins = borderline_margins or {
+            "spikes": 2,
+            "uptime_hours": 100,
+            "last_maintenance": 5,
+        }
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+        # Latest risk score of every component seen, ranked for the fleet view
+        self.fleet = FleetRiskScorer(spike_limit, uptime_limit, maintenance_interval)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next maintenance reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next maintenance reading with timestamp."]:
+        return self.stream.next_reading()
+    
+    @kernel_function(description="Analyzes maintenance data and provides recommendations.")
+    def analyze_maintenance(self,
+                            component: str,
+                            uptime_hours: int,
+                            spikes: int,
+                            last_maintenance: int,
+                            failure_history: str) -> Annotated[str, "Returns maintenance analysis and recommendations."]:
+        if FleetRiskScorer.failure_flag(failure_history):
+            return f" Past Failure detected: {component} has failed {failure_history} times in the last {uptime_hours} hours."
+        elif spikes > self.spike_limit:
+            return f"Potential failure: {component} has {spikes} temperature spikes in the last {uptime_hours} hours."
+        elif uptime_hours > self.uptime_limit and last_maintenance > self.maintenance_interval:
+            return f"Scheduled maintenance: {component} has been in operation for {uptime_hours} hours without maintenance."
+        return f"No action needed: {component} is operating normally."
+
+    @kernel_function(description="List the components with the highest maintenance risk across the fleet.")
+    def get_top_risks(self, k: int = 5) -> Annotated[List[dict], "Returns the k riskiest components, highest risk first."]:
+        if not len(self.fleet):
+            self.refresh_fleet()
+        return self.fleet.top_k(k)
+
+    def refresh_fleet(self, readings=None) -> pd.DataFrame:
+        """Rescore components (all of the telemetry by default); returns the scored rows."""
+        return self.fleet.update(self.data if readings is None else readings)
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.analyze_maintenance(
+            reading["component"],
+            reading["uptime_hours"],
+            reading["spikes"],
+            reading["last_maintenance"],
+            text_or_nan(reading["failure_history"]),
+        )
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules, and into the fleet ranking: returns (severity, analysis)."""
+        self.fleet.update_reading(reading)
+        if self.fleet.failure_flag(reading["failure_history"]) or reading["spikes"] > self.spike_limit:
+            severity = "critical"
+        elif (reading["uptime_hours"] > self.uptime_limit
+              and reading["last_maintenance"] > self.maintenance_interval):
+            severity = "warning"
+        else:
+            severity = "normal"
+        return severity, self.analyze_reading(reading)
+
+    def is_borderline(self, reading: dict) -> bool:
+        # A recorded failure decides the outcome on its own
+        if self.fleet.failure_flag(reading["failure_history"]):
+            return False
+        margins = self.borderline_margins
+        if abs(reading["spikes"] - self.spike_limit) <= margins["spikes"]:
+            return True
+        near_uptime = abs(reading["uptime_hours"] - self.uptime_limit) <= margins["uptime_hours"]
+        near_interval = abs(reading["last_maintenance"] - self.maintenance_interval) <= margins["last_maintenance"]
+        return ((near_uptime and reading["last_maintenance"] > self.maintenance_interval)
+                or (near_interval and reading["uptime_hours"] > self.uptime_limit))
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """Score a reading into the fleet; the prompt needs nothing beyond the reading itself."""
+        self.fleet.update_reading(reading)
+        return {}, {}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["component", "uptime_hours", "spikes", "last_maintenance", "failure_history"])
+        # Every reading the rules see also becomes its component's current fleet state
+        self.fleet.update(frame)
+        component = frame["component"].astype(str)
+        uptime_hours, spikes, last_maintenance = frame["uptime_hours"], frame["spikes"], frame["last_maintenance"]
+        uptime_text = uptime_hours.astype(str)
+        failure_history = text_or_nan_column(frame["failure_history"])
+
+        # "No", "0" and the like are not failures (see FleetRiskScorer.failure_flags)
+        failed_before = pd.Series(self.fleet.failure_flags(frame["failure_history"]), index=frame.index)
+        spiking = spikes > self.spike_limit
+        overdue = (uptime_hours > self.uptime_limit) & (last_maintenance > self.maintenance_interval)
+        decision = np.select(
+            [failed_before, spiking, overdue],
+            [
+                " Past Failure detected: " + component + " has failed " + failure_history
+                + " times in the last " + uptime_text + " hours.",
+                "Potential failure: " + component + " has " + spikes.astype(str)
+                + " temperature spikes in the last " + uptime_text + " hours.",
+                "Scheduled maintenance: " + component + " has been in operation for " + uptime_text
+                + " hours without maintenance.",
+            ],
+            default="No action needed: " + component + " is operating normally.",
+        )
+
+        margins = self.borderline_margins
+        near_spikes = (spikes - self.spike_limit).abs() <= margins["spikes"]
+        near_uptime = (uptime_hours - self.uptime_limit).abs() <= margins["uptime_hours"]
+        near_interval = (last_maintenance - self.maintenance_interval).abs() <= margins["last_maintenance"]
+        borderline = ~failed_before & (
+            near_spikes
+            | (near_uptime & (last_maintenance > self.maintenance_interval))
+            | (near_interval & (uptime_hours > self.uptime_limit))
+        )
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.select([failed_before | spiking, overdue], ["critical", "warning"], default="normal"),
+            "borderline": borderline,
+        }, index=frame.index)
+        
+# Predictive maintainer agent definition, built once by the shared runtime
+AGENT_NAME = "PredictiveMaintainer"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in predictive maintenance.
+        Your role is to analyze maintenance data and provide intelligent recommendations for proactive maintenance.
+        
+        IMPORTANT: You must ONLY analyze the data provided in the input. DO NOT make up or assume any data.
+        The input will contain specific information about a single component including:
+        - Component name
+        - Uptime hours
+        - Temperature spike count
+        - Days since last maintenance
+        - Failure history
+        
+        Based on ONLY these provided metrics, recommend one of:
+        - 'No Action' if the component is operating normally
+        - 'Schedule Maintenance' if maintenance is needed soon
+        - 'Urgent Inspection' if immediate attention is required
+        
+        DO NOT analyze or mention any components that are not in the provided data."""
+
+# Per-reading prompt: fixed task text first, then the component's values
+PROMPT = PromptTemplate(
+    task="Analyze the following data and provide a maintenance recommendation.",
+    fields={
+        "component": "Component",
+        "uptime_hours": "Uptime (hours)",
+        "spikes": "Temperature spike count",
+        "last_maintenance": "Last maintenance (days ago)",
+        "failure_history": "Failure history",
+    },
+    question="Use the data provided in the input to make a recommendation.",
+    decisions=("No Action", "Schedule Maintenance", "Urgent Inspection"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = ("component", "uptime_hours", "spikes", "last_maintenance", "failure_history")
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("component", "uptime_hours", "spikes", "last_maintenance", "failure_history")
+
+async def monitor_maintenance(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    maintenance_plugin = runtime.get_plugin("maintenance")
+
+    try:
+        #while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = maintenance_plugin.get_next_reading()
+
+            # Keep the fleet ranking current with every reading that passes through
+            context, derived = maintenance_plugin.prompt_context(reading)
+
+            # Format the input for the agent
+            user_input = PROMPT.render(reading, context)
+
+            print(f"\n[Predictive Maintainer] Processing: {user_input}")
+
+            # Get agent's analysis
+            response_text = await runtime.invoke("maintenance", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            # Simulate real-time delay
+            #await asyncio.sleep(0.5)
+
+            if not response_text:
+                response_text = "No response generated from predictive maintenance analysis."
+
+            return response_text
+    
+    except KeyboardInterrupt:
+        print("\n[Predictive Maintainer] Shutting down...")
+
+async def monitor_fleet(runtime=None, k=5):
+    """Score the whole fleet and ask the agent about only the k riskiest components."""
+    runtime = runtime or get_runtime()
+    maintenance_plugin = runtime.get_plugin("maintenance")
+    maintenance_plugin.refresh_fleet()
+    top = maintenance_plugin.fleet.top_k(k)
+    if not top:
+        return "No components to assess."
+
+    lines = [
+        f"- {item['component']}: risk {item['risk']:.1f}/100, uptime {item['uptime_hours']:.0f} h, "
+        f"{item['spikes']:.0f} temperature spikes, last maintenance {item['last_maintenance']:.0f} days ago, "
+        f"{'has' if item['failure_history'] else 'no'} failure history"
+        for item in top
+    ]
+    user_input = (
+        f"These are the {len(top)} components with the highest maintenance risk, highest first.\n"
+        "Give a short recommendation for each, using only the data below:\n" + "\n".join(lines)
+    )
+    print(f"\n[Predictive Maintainer] Processing fleet top {len(top)}:\n" + "\n".join(lines))
+
+    # The cache key is the ranked list itself, so an unchanged top-k reuses its narrative
+    key = {f"{i}:{item['component']}": item["risk"] for i, item in enumerate(top)}
+    response_text = await runtime.invoke("maintenance", user_input, key)
+    return response_text or "No response generated from predictive maintenance analysis."
+
+if __name__ == "__main__":
     asyncio.run(monitor_maintenance())
\ No newline at end of file
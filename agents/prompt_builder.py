@@ -0,0 +1,138 @@
+# agents/prompt_builder.py
+import math
+import textwrap
+import threading
+from typing import Dict, Mapping, Sequence
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# None until first use, False when tiktoken or its encoding is unavailable
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    # The first use downloads the encoding, which fails offline
+                    _encoding = tiktoken.get_encoding("o200k_base") if tiktoken is not None else False
+                except Exception:
+                    _encoding = False
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Exact count when tiktoken and its encoding are available; about four characters a token otherwise."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def stable_instructions(text: str) -> str:
+    """Agent instructions with source indentation and trailing spaces removed.
+
+    The triple-quoted constants carry the indentation of the code around
+    them. Those tokens mean nothing to the model, and an editor trimming
+    whitespace would change the prefix and miss the provider's cache.
+    """
+    lines = text.splitlines()
+    head, body = lines[:1], textwrap.dedent("\n".join(lines[1:])).splitlines()
+    return "\n".join(line.rstrip() for line in head + body).strip()
+
+
+def compact_value(value) -> str:
+    """A reading value in as few characters as reads unambiguously: 80 not 80.0, n/a for missing.
+
+    Other floats take their shortest round-trip form, so 0.004 stays 0.004
+    and two different values never render the same.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "n/a"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        # float() first, since a numpy float's repr carries its type name
+        return repr(float(value))
+    return str(value)
+
+
+class PromptTemplate:
+    """A domain's per-reading prompt with the fixed text first and only values after it.
+
+    ``task`` and ``question`` never change between calls, so together with
+    the agent's instructions they form a byte-identical prefix that a
+    provider's prompt cache can reuse. The reading follows as one compact
+    ``label: value`` line per field, always in ``fields`` order.
+
+    ``decisions`` lists the answers the agent may give for one reading, for
+    structured (batch) analysis.
+    """
+
+    def __init__(self, task: str, fields: Mapping[str, str], question: str = "", decisions: Sequence[str] = ()):
+        self.task = task
+        # Reading field -> label, with the unit in the label rather than on every value
+        self.fields = dict(fields)
+        self.question = question
+        self.decisions = tuple(decisions)
+        self.prefix = "".join(f"{line}\n" for line in (task, question) if line)
+
+    def values(self, reading: Mapping, extra: Mapping[str, object] = None) -> str:
+        """Just the reading's ``label: value`` lines; ``extra`` adds derived context (labels to values) after the fields."""
+        lines = [f"{label}: {compact_value(reading.get(field))}" for field, label in self.fields.items()]
+        lines += [f"{label}: {compact_value(value)}" for label, value in (extra or {}).items()]
+        return "\n".join(lines)
+
+    def render(self, reading: Mapping, extra: Mapping[str, object] = None) -> str:
+        """The prompt for one reading: the fixed prefix, then its values."""
+        return self.prefix + self.values(reading, extra)
+
+
+class TokenLedger:
+    """Estimated tokens spent per agent, counted locally as calls are made.
+
+    Prompt tokens are the instructions plus the user input; completion
+    tokens are the streamed response. Calls answered by the response cache
+    are counted separately, since they cost nothing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.agents: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent: str, prompt_tokens: int, completion_tokens: int = 0,
+               prefix_tokens: int = 0, cached: bool = False):
+        with self._lock:
+            entry = self.agents.setdefault(agent, dict.fromkeys(
+                ("calls", "cached_calls", "prompt_tokens", "completion_tokens", "prefix_tokens", "max_prompt_tokens"), 0
+            ))
+            if cached:
+                entry["cached_calls"] += 1
+                return
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["prefix_tokens"] = prefix_tokens
+            entry["max_prompt_tokens"] = max(entry["max_prompt_tokens"], prompt_tokens)
+
+    def report(self) -> Dict[str, Dict]:
+        """Spend per agent, biggest consumer first, with its share of all tokens."""
+        with self._lock:
+            agents = {name: dict(entry) for name, entry in self.agents.items()}
+        grand_total = sum(entry["prompt_tokens"] + entry["completion_tokens"] for entry in agents.values())
+        for entry in agents.values():
+            total = entry["prompt_tokens"] + entry["completion_tokens"]
+            calls = entry["calls"]
+            entry["total_tokens"] = total
+            entry["mean_prompt_tokens"] = round(entry["prompt_tokens"] / calls, 1) if calls else 0.0
+            entry["mean_completion_tokens"] = round(entry["completion_tokens"] / calls, 1) if calls else 0.0
+            entry["share"] = round(total / grand_total, 3) if grand_total else 0.0
+        return dict(sorted(agents.items(), key=lambda item: -item[1]["total_tokens"]))
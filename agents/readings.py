@@ -0,0 +1,77 @@
+# agents/readings.py
+import math
+import numbers
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Values the CSVs and device payloads use to mean "nothing recorded"
+MISSING_MARKERS = {"", "none", "nan", "null", "n/a"}
+
+
+def is_missing(value) -> bool:
+    """True for None, NaN and the text markers pandas and the simulator use for empty fields."""
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and value.strip().lower() in MISSING_MARKERS
+
+
+def text_or_nan(value) -> str:
+    """Render a free-text field the way the rules expect it, with "nan" for missing values."""
+    return "nan" if is_missing(value) else str(value)
+
+
+def epoch_seconds(timestamps) -> np.ndarray:
+    """Reading timestamps as epoch seconds; unparseable or missing ones become NaN.
+
+    Numbers are epoch seconds already (the simulator sends ``time.time()``);
+    text and datetimes are parsed, naive ones taken as UTC.
+    """
+    values = timestamps if isinstance(timestamps, pd.Series) else pd.Series(list(timestamps), dtype=object)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    values = values.astype(object).to_numpy()
+    numeric = np.fromiter(
+        (isinstance(value, numbers.Real) and not isinstance(value, bool) for value in values),
+        dtype=bool, count=len(values),
+    )
+    seconds = np.full(len(values), np.nan)
+    seconds[numeric] = values[numeric].astype(np.float64)
+    if not numeric.all():
+        parsed = pd.to_datetime(pd.Series(values[~numeric], dtype=object), errors="coerce", utc=True)
+        seconds[~numeric] = ((parsed - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+    return seconds
+
+
+def as_frame(readings, fields) -> pd.DataFrame:
+    """Accept a DataFrame, a list of reading dicts, a structured array or a plain 2-D array as a DataFrame.
+
+    A plain array must list ``fields`` in order; a 1-D array is one column when only one field is needed.
+    """
+    if isinstance(readings, pd.DataFrame):
+        return readings
+    if isinstance(readings, (list, tuple)) and readings and isinstance(readings[0], Mapping):
+        return pd.DataFrame(list(readings))
+    values = np.asarray(readings)
+    if values.dtype.names:
+        return pd.DataFrame(values)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1) if len(fields) == 1 else values.reshape(1, -1)
+    return pd.DataFrame(values, columns=fields).infer_objects()
+
+
+def missing_mask(values: pd.Series) -> pd.Series:
+    """Vectorized is_missing over a column."""
+    markers = values.astype(str).str.strip().str.lower().isin(MISSING_MARKERS)
+    return values.isna() | markers
+
+
+def text_or_nan_column(values: pd.Series) -> pd.Series:
+    """Vectorized text_or_nan over a column."""
+    return values.astype(str).mask(missing_mask(values), "nan")
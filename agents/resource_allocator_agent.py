@@ -1,113 +1,220 @@
-# agents/resource_allocator_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class ResourceAllocatorPlugin:
-    """Plugin for resource allocation and scaling recommendations."""
-
-    def __init__(self):
-        self.data = pd.read_csv("mock_data/resource_data.csv")
-
-    @kernel_function(description="Get the next resource allocation reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next resource allocation reading with timestamp."]:
-        return self.data.iloc[0].to_dict()
-    
-    @kernel_function(description="Analyzes resource usage and provides recommendations.")
-    def analyze_resource(self,
-                         compute_load: float,
-                         storage_utilization: float,
-                         bandwidth: float,
-                         cost: float,
-                         status: str) -> Annotated[str, "Returns resource allocation analysis and recommendations."]:
-        if status == "Overloaded":
-            return "Scale Up Immediately! : Increase resources."
-        if compute_load > 80:
-            return "Suggestion: Scale Up, Increase compute resources."
-        if storage_utilization > 90:
-                return "Suggestion: Scale Up, Add more storage."
-        if status == "Underutilized":
-                return "Scale Down: Reduce compute resources."
-        return "Maintain Current Allocation."
-
-async def allocate_resources():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
-    # Create plugin instance
-    resource_plugin = ResourceAllocatorPlugin()
-
-    # Create the resource allocator agent
-    allocator_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[resource_plugin],
-        name="ResourceAllocator",
-        instructions="""You are an AI agent specialized in resource allocation and scaling recommendations.
-        Your role is to analyze resource usage and provide intelligent recommendations for optimal resource allocation.
-        Use the available plugins to analyze resource usage and provide actionable insights.
-        Based on inputs and plugins, recommend 'Scale Up', 'Scale Down', 'Reallocate', or 'Maintain Current Allocation'.""",
-    )
-
-    thread = None
-    try:
-        #while True:
-            # Get the next reading from mock data
-            reading = resource_plugin.get_next_reading()
-            
-            # Format the input for the agent
-            user_input = (
-                f"Compute Load (%): {reading['compute_load']}\n"
-                f"Storage Utilization (%): {reading['storage_utilization']}\n"
-                f"Bandwidth Usage (Mbps): {reading['bandwidth']}\n"
-                f"Cost per Unit ($): {reading['cost']}\n"
-                f"Current Allocation Status: {reading['status']}\n"
-                "What is the recommended resource allocation action?"
-            )
-
-            print(f"\n[Resource Allocator] Processing: {user_input}")
-            
-            # Get agent's analysis
-            response_text = ""
-            async for response in allocator_agent.invoke_stream(
-                message=user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            # Simulate real-time delay
-            #await asyncio.sleep(0.5)
-
-            if not response_text:
-                response_text = "No response generated from resource allocation analysis."
-
-            return response_text
-    
-    except KeyboardInterrupt:
-        print("\n[Resource Allocator] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()
-
-if __name__ == "__main__":
+# agents/resource_allocator_agent.py
+import os
+import numpy as np
+import pandas as pd
+import asyncio
+
+from typing import Annotated, Dict, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.allocation_solver import AllocationSolver, describe_plan
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame
+from agents.runtime import get_runtime
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for resource readings
+DATA_PATH = "mock_data/resource_data.csv"
+READING_DTYPES = {
+    "compute_load": "float64",
+    "storage_utilization": "float64",
+    "bandwidth": "float64",
+    "cost": "float64",
+    "status": "category",
+}
+
+class ResourceAllocatorPlugin:
+    """Plugin for resource allocation and scaling recommendations."""
+
+    def __init__(self, compute_limit=80, storage_limit=90,
+                 borderline_margins=None, stream: ReadingStream = None):
+        self.compute_limit = compute_limit
+        self.storage_limit = storage_limit
+        # Readings this close to any limit are escalated to the LLM
+        self.borderline_margins = borderline_margins or {
+            "compute_load": 5.0,
+            "storage_utilization": 3.0,
+        }
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+        # Cluster-wide rebalancing under the same caps the per-reading rules use
+        self.solver = AllocationSolver(compute_cap=compute_limit, storage_cap=storage_limit)
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next resource allocation reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next resource allocation reading with timestamp."]:
+        return self.stream.next_reading()
+    
+    @kernel_function(description="Plan moves that bring every node under its caps at the lowest cost.")
+    def plan_rebalance(self) -> Annotated[str, "Returns the rebalancing plan: cost, nodes over cap and the largest moves."]:
+        return describe_plan(self.rebalance())
+
+    def rebalance(self, nodes=None) -> Dict:
+        """Solve a rebalancing plan for ``nodes`` (every telemetry row, one per node, by default)."""
+        return self.solver.solve(self.data if nodes is None else nodes)
+
+    @kernel_function(description="Analyzes resource usage and provides recommendations.")
+    def analyze_resource(self,
+                         compute_load: float,
+                         storage_utilization: float,
+                         bandwidth: float,
+                         cost: float,
+                         status: str) -> Annotated[str, "Returns resource allocation analysis and recommendations."]:
+        if status == "Overloaded":
+            return "Scale Up Immediately! : Increase resources."
+        if compute_load > self.compute_limit:
+            return "Suggestion: Scale Up, Increase compute resources."
+        if storage_utilization > self.storage_limit:
+                return "Suggestion: Scale Up, Add more storage."
+        if status == "Underutilized":
+                return "Scale Down: Reduce compute resources."
+        return "Maintain Current Allocation."
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.analyze_resource(
+            reading["compute_load"],
+            reading["storage_utilization"],
+            reading["bandwidth"],
+            reading["cost"],
+            reading["status"],
+        )
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules: returns (severity, analysis)."""
+        if reading["status"] == "Overloaded":
+            severity = "critical"
+        elif (reading["compute_load"] > self.compute_limit
+              or reading["storage_utilization"] > self.storage_limit
+              or reading["status"] == "Underutilized"):
+            severity = "warning"
+        else:
+            severity = "normal"
+        return severity, self.analyze_reading(reading)
+
+    def is_borderline(self, reading: dict) -> bool:
+        if reading["status"] == "Overloaded":
+            return False
+        margins = self.borderline_margins
+        return (abs(reading["compute_load"] - self.compute_limit) <= margins["compute_load"]
+                or abs(reading["storage_utilization"] - self.storage_limit) <= margins["storage_utilization"])
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """The prompt needs nothing beyond the reading itself."""
+        return {}, {}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["compute_load", "storage_utilization", "bandwidth", "cost", "status"])
+        compute_load, storage = frame["compute_load"], frame["storage_utilization"]
+        overloaded = frame["status"] == "Overloaded"
+        underutilized = frame["status"] == "Underutilized"
+        compute_high = compute_load > self.compute_limit
+        storage_high = storage > self.storage_limit
+        decision = np.select(
+            [overloaded, compute_high, storage_high, underutilized],
+            [
+                "Scale Up Immediately! : Increase resources.",
+                "Suggestion: Scale Up, Increase compute resources.",
+                "Suggestion: Scale Up, Add more storage.",
+                "Scale Down: Reduce compute resources.",
+            ],
+            default="Maintain Current Allocation.",
+        )
+        margins = self.borderline_margins
+        borderline = ~overloaded & (
+            ((compute_load - self.compute_limit).abs() <= margins["compute_load"])
+            | ((storage - self.storage_limit).abs() <= margins["storage_utilization"])
+        )
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.select(
+                [overloaded, compute_high | storage_high | underutilized],
+                ["critical", "warning"],
+                default="normal",
+            ),
+            "borderline": borderline,
+        }, index=frame.index)
+
+# Resource allocator agent definition, built once by the shared runtime
+AGENT_NAME = "ResourceAllocator"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in resource allocation and scaling recommendations.
+        Your role is to analyze resource usage and provide intelligent recommendations for optimal resource allocation.
+        Use the available plugins to analyze resource usage and provide actionable insights.
+        Based on inputs and plugins, recommend 'Scale Up', 'Scale Down', 'Reallocate', or 'Maintain Current Allocation'."""
+
+# Per-reading prompt: fixed task text first, then the node's values
+PROMPT = PromptTemplate(
+    task="Analyze resource usage.",
+    fields={
+        "compute_load": "Compute load (%)",
+        "storage_utilization": "Storage utilization (%)",
+        "bandwidth": "Bandwidth usage (Mbps)",
+        "cost": "Cost per unit ($)",
+        "status": "Current allocation status",
+    },
+    question="What is the recommended resource allocation action?",
+    decisions=("Scale Up", "Scale Down", "Reallocate", "Maintain Current Allocation"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = ("compute_load", "storage_utilization", "bandwidth", "cost", "status")
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("compute_load", "storage_utilization", "bandwidth", "cost", "status")
+
+async def allocate_resources(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    resource_plugin = runtime.get_plugin("resource")
+
+    try:
+        #while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = resource_plugin.get_next_reading()
+            
+            # Format the input for the agent
+            context, derived = resource_plugin.prompt_context(reading)
+            user_input = PROMPT.render(reading, context)
+
+            print(f"\n[Resource Allocator] Processing: {user_input}")
+            
+            # Get agent's analysis
+            response_text = await runtime.invoke("resource", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            # Simulate real-time delay
+            #await asyncio.sleep(0.5)
+
+            if not response_text:
+                response_text = "No response generated from resource allocation analysis."
+
+            return response_text
+    
+    except KeyboardInterrupt:
+        print("\n[Resource Allocator] Shutting down...")
+
+async def monitor_allocation_plan(runtime=None, nodes=None):
+    """Solve a cluster-wide rebalancing plan and ask the agent to explain it."""
+    runtime = runtime or get_runtime()
+    resource_plugin = runtime.get_plugin("resource")
+    plan = resource_plugin.rebalance(nodes)
+    summary = describe_plan(plan)
+    user_input = (
+        "A solver produced this rebalancing plan for the cluster. Explain it briefly for an operator: "
+        "why these moves, what they save and anything to check before applying them.\n" + summary
+    )
+    print(f"\n[Resource Allocator] Processing plan:\n{summary}")
+
+    # Cache on the plan's outcome, not its timing, so an unchanged cluster reuses the explanation
+    key = {"plan": summary.split("\n", 1)[1] if "\n" in summary else summary}
+    response_text = await runtime.invoke("resource", user_input, key)
+    return response_text or "No response generated from resource allocation analysis."
+
+if __name__ == "__main__":
     asyncio.run(allocate_resources())
\ No newline at end of file
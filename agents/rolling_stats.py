@@ -0,0 +1,162 @@
+# agents/rolling_stats.py
+from typing import Dict, Hashable, Iterable
+
+import numpy as np
+
+
+class RollingStats:
+    """Streaming per-feed statistics with O(1) work per reading.
+
+    For every feed (meter, PDU, circuit...) it keeps an EWMA and EW variance,
+    an exact rolling mean and variance over the last ``window`` readings
+    (sliding Welford over a ring buffer), and the previous value and time for
+    the rate of change. State lives in flat NumPy arrays indexed by a slot per
+    feed, so tens of thousands of feeds can be updated a whole tick at a time
+    with ``update_many`` instead of recomputing a DataFrame per reading.
+
+    Each reading is scored against the statistics *before* it is folded in,
+    so a spike is not dampened by itself.
+    """
+
+    def __init__(self, window=60, alpha=0.1, z_threshold=3.0, min_periods=20,
+                 rate_limit=None, capacity=1024):
+        self.window = window
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        # Readings a feed needs before it can be flagged
+        self.min_periods = min_periods
+        # Optional absolute change per second (or per reading without timestamps) to flag
+        self.rate_limit = rate_limit
+
+        self._slots: Dict[Hashable, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.ewma = np.zeros(capacity)
+        self.ewvar = np.zeros(capacity)
+        self.mean = np.zeros(capacity)
+        # Sum of squared deviations over the window (Welford's M2)
+        self.m2 = np.zeros(capacity)
+        self.last_value = np.full(capacity, np.nan)
+        self.last_time = np.full(capacity, np.nan)
+        self.ring = np.zeros((capacity, self.window))
+
+    def _grow(self, needed):
+        capacity = len(self.count)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        old = {name: getattr(self, name) for name in
+               ("count", "ewma", "ewvar", "mean", "m2", "last_value", "last_time", "ring")}
+        self._allocate(new_capacity)
+        for name, array in old.items():
+            getattr(self, name)[:capacity] = array
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, feed):
+        return feed in self._slots
+
+    def slots(self, feeds: Iterable[Hashable]) -> np.ndarray:
+        """Slot index for each feed, registering new feeds as they appear."""
+        slots = self._slots
+        indices = np.fromiter((slots.setdefault(feed, len(slots)) for feed in feeds), dtype=np.int64)
+        self._grow(len(slots))
+        return indices
+
+    def update(self, feed: Hashable, value: float, timestamp: float = None) -> dict:
+        """Fold one reading into its feed and return how it scored."""
+        result = self.update_many([feed], [value], None if timestamp is None else [timestamp])
+        return {name: column[0].item() for name, column in result.items()}
+
+    def update_many(self, feeds, values, timestamps=None) -> Dict[str, np.ndarray]:
+        """Fold a batch of readings in, in order, and return their scores as arrays.
+
+        A feed may appear more than once; its readings are applied one round
+        at a time so each is scored against the state the previous one left.
+        """
+        slots = self.slots(feeds)
+        values = np.asarray(values, dtype=np.float64)
+        times = None if timestamps is None else np.asarray(timestamps, dtype=np.float64)
+
+        result = {name: np.full(len(values), np.nan) for name in ("zscore", "ewma_zscore", "rate", "mean", "std")}
+        result["anomaly"] = np.zeros(len(values), dtype=bool)
+        # Readings the feed had before this one, i.e. how much history the scores rest on
+        result["count"] = np.zeros(len(values), dtype=np.int64)
+
+        # Round r holds the r-th reading of every feed in the batch
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        starts = np.r_[True, sorted_slots[1:] != sorted_slots[:-1]]
+        group_start = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+        rounds = np.empty(len(order), dtype=np.int64)
+        rounds[order] = np.arange(len(order)) - group_start
+
+        for r in range(int(rounds.max()) + 1 if len(rounds) else 0):
+            rows = np.flatnonzero(rounds == r)
+            self._step(slots[rows], values[rows], None if times is None else times[rows], rows, result)
+        return result
+
+    def _step(self, slot, x, t, rows, result):
+        count = self.count[slot]
+        mean = self.mean[slot]
+        n = np.minimum(count, self.window)
+        std = np.sqrt(np.where(n > 1, self.m2[slot] / np.maximum(n - 1, 1), np.nan))
+        ew_std = np.sqrt(np.where(count > 1, self.ewvar[slot], np.nan))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zscore = np.where(std > 0, (x - mean) / std, 0.0)
+            ewma_zscore = np.where(ew_std > 0, (x - self.ewma[slot]) / ew_std, 0.0)
+            elapsed = 1.0 if t is None else t - self.last_time[slot]
+            rate = (x - self.last_value[slot]) / np.where(elapsed > 0, elapsed, np.nan)
+        zscore = np.where(n > 1, zscore, np.nan)
+        ewma_zscore = np.where(count > 1, ewma_zscore, np.nan)
+
+        anomaly = (count >= self.min_periods) & (np.abs(np.nan_to_num(zscore)) >= self.z_threshold)
+        if self.rate_limit is not None:
+            anomaly |= np.abs(np.nan_to_num(rate)) > self.rate_limit
+
+        result["zscore"][rows] = zscore
+        result["ewma_zscore"][rows] = ewma_zscore
+        result["rate"][rows] = rate
+        result["mean"][rows] = np.where(n > 0, mean, np.nan)
+        result["std"][rows] = std
+        result["anomaly"][rows] = anomaly
+        result["count"][rows] = count
+
+        # EWMA and EW variance (West's incremental form)
+        first = count == 0
+        delta = x - self.ewma[slot]
+        self.ewma[slot] = np.where(first, x, self.ewma[slot] + self.alpha * delta)
+        self.ewvar[slot] = np.where(first, 0.0, (1 - self.alpha) * (self.ewvar[slot] + self.alpha * delta * delta))
+
+        # Sliding Welford: add x, and drop the reading it overwrites once the window is full
+        position = count % self.window
+        full = count >= self.window
+        old = self.ring[slot, position]
+        added_mean = mean + (x - mean) / (n + 1)
+        added_m2 = self.m2[slot] + (x - mean) * (x - added_mean)
+        swapped_mean = mean + (x - old) / self.window
+        swapped_m2 = self.m2[slot] + (x - old) * (x - swapped_mean + old - mean)
+        self.mean[slot] = np.where(full, swapped_mean, added_mean)
+        self.m2[slot] = np.maximum(np.where(full, swapped_m2, added_m2), 0.0)
+        self.ring[slot, position] = x
+
+        self.count[slot] = count + 1
+        self.last_value[slot] = x
+        if t is not None:
+            self.last_time[slot] = t
+
+    def snapshot(self, feed: Hashable) -> dict:
+        """Current statistics for one feed."""
+        slot = self._slots[feed]
+        n = min(int(self.count[slot]), self.window)
+        return {
+            "count": int(self.count[slot]),
+            "ewma": float(self.ewma[slot]),
+            "mean": float(self.mean[slot]) if n else float("nan"),
+            "std": float(np.sqrt(self.m2[slot] / (n - 1))) if n > 1 else float("nan"),
+            "last_value": float(self.last_value[slot]),
+        }
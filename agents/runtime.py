@@ -0,0 +1,318 @@
+# agents/runtime.py
+import contextvars
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from agents.decision_cache import DecisionCache
+from agents.prompt_builder import TokenLedger, estimate_tokens, stable_instructions
+from agents.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    # openai and semantic_kernel take seconds to import, so they load on first use
+    from openai import AsyncOpenAI
+    from semantic_kernel.agents import ChatCompletionAgent
+    from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+
+# Where each domain's plugin class, monitor function and agent definition live
+AGENT_REGISTRY = {
+    "energy": ("agents.energy_optimizer_agent", "EnergyMonitorPlugin", "monitor_energy"),
+    "cooling": ("agents.cooling_manager_agent", "CoolingMonitorPlugin", "monitor_cooling"),
+    "security": ("agents.security_log_agent", "SecurityLogPlugin", "monitor_security"),
+    "maintenance": ("agents.predictive_maintainer_agent", "PredictiveMaintainerPlugin", "monitor_maintenance"),
+    "compliance": ("agents.compliance_auditor_agent", "ComplianceMonitorPlugin", "monitor_compliance"),
+    "resource": ("agents.resource_allocator_agent", "ResourceAllocatorPlugin", "allocate_resources"),
+}
+
+
+# Where invoke sends tokens and tool-call events for the current task (see AgentRuntime.streaming)
+_stream_handlers = contextvars.ContextVar("stream_handlers", default=(None, None))
+
+
+class AgentRuntime:
+    """Process-wide LLM client, chat service and warm agents, built once and reused.
+
+    Nothing heavy happens up front: agent modules, their data and the LLM
+    client are loaded the first time a domain is used, and each step's cost
+    is recorded in ``timings`` (see ``startup_report``).
+    """
+
+    def __init__(self,
+                 api_key: str = "", #Use your own token or api key
+                 base_url: str = "https://models.inference.ai.azure.com/",
+                 model_id: str = "gpt-4o-mini",
+                 max_connections: int = 20,
+                 keepalive_expiry: float = 60.0,
+                 cache: DecisionCache = None,
+                 reuse_window: float = 2.0):
+        load_dotenv()
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model_id = model_id
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        # Optional response cache consulted before every agent invocation
+        self.cache = cache
+        # Estimated token spend per agent, counted before each call is sent
+        self.tokens = TokenLedger()
+        # Identical concurrent agent executions share one run, across every session using this runtime
+        self.flights = SingleFlight(reuse_window)
+
+        self._http_client = None
+        self._client = None
+        self._service = None
+        self._plugins = {}
+        self._agents = {}
+        # Seconds spent on each lazy step, e.g. {"import:energy": 0.41, "plugin:energy": 0.02}
+        self.timings = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _timed(self, step: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[step] = self.timings.get(step, 0.0) + time.perf_counter() - start
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            # Threads warming up together must not each build a pool and leak all but one
+            with self._lock:
+                if self._client is None:
+                    with self._timed("client"):
+                        import httpx
+                        from openai import AsyncOpenAI
+
+                        # One pooled HTTP client so connections stay alive between dispatches
+                        self._http_client = httpx.AsyncClient(
+                            limits=httpx.Limits(
+                                max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections,
+                                keepalive_expiry=self.keepalive_expiry,
+                            ),
+                        )
+                        self._client = AsyncOpenAI(
+                            api_key=self.api_key,
+                            base_url=self.base_url,
+                            http_client=self._http_client,
+                        )
+        return self._client
+
+    @property
+    def service(self) -> "OpenAIChatCompletion":
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    client = self.client
+                    with self._timed("service"):
+                        from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+
+                        self._service = OpenAIChatCompletion(
+                            ai_model_id=self.model_id,
+                            async_client=client,
+                        )
+        return self._service
+
+    def _module(self, domain: str):
+        if domain not in AGENT_REGISTRY:
+            raise KeyError(f"Unknown agent domain: {domain}")
+        module_name = AGENT_REGISTRY[domain][0]
+        if module_name not in sys.modules:
+            with self._timed(f"import:{domain}"):
+                importlib.import_module(module_name)
+        return importlib.import_module(module_name)
+
+    def get_plugin(self, domain: str):
+        """Return the shared plugin instance for a domain, creating it on first use."""
+        if domain not in self._plugins:
+            module = self._module(domain)
+            with self._lock:
+                if domain not in self._plugins:
+                    with self._timed(f"plugin:{domain}"):
+                        self._plugins[domain] = getattr(module, AGENT_REGISTRY[domain][1])()
+        return self._plugins[domain]
+
+    def get_agent_name(self, domain: str) -> str:
+        return self._module(domain).AGENT_NAME
+
+    def get_prompt(self, domain: str):
+        """Return the domain's per-reading PromptTemplate, or None if it builds its prompts by hand."""
+        return getattr(self._module(domain), "PROMPT", None)
+
+    def get_cache_fields(self, domain: str):
+        """Return the reading fields that decide a domain's answer (its CACHE_FIELDS), or None for all of them."""
+        return getattr(self._module(domain), "CACHE_FIELDS", None)
+
+    def get_data_path(self, domain: str) -> str:
+        """Return the CSV a domain's telemetry is read from (its DATA_PATH)."""
+        return self._module(domain).DATA_PATH
+
+    def get_required_fields(self, domain: str):
+        """Return the reading fields a domain's rules need (its REQUIRED_FIELDS), or () if it names none."""
+        return getattr(self._module(domain), "REQUIRED_FIELDS", ())
+
+    def get_monitor(self, domain: str):
+        """Return the monitor_* coroutine function for a domain."""
+        return getattr(self._module(domain), AGENT_REGISTRY[domain][2])
+
+    def get_agent(self, domain: str) -> "ChatCompletionAgent":
+        """Return the warm ChatCompletionAgent for a domain, creating it on first use."""
+        if domain not in self._agents:
+            plugin = self.get_plugin(domain)
+            service = self.service
+            module = self._module(domain)
+            with self._timed(f"agent:{domain}"):
+                from semantic_kernel.agents import ChatCompletionAgent
+
+                self._agents[domain] = ChatCompletionAgent(
+                    service=service,
+                    plugins=[plugin],
+                    name=module.AGENT_NAME,
+                    instructions=stable_instructions(module.AGENT_INSTRUCTIONS),
+                )
+        return self._agents[domain]
+
+    def preload(self, domains=None) -> threading.Thread:
+        """Import agent modules and the chat stack on a background thread.
+
+        Call this right after startup so the first message finds them warm;
+        nothing is built, so it never races the lazy getters.
+        """
+        def load():
+            with self._timed("preload"):
+                import openai  # noqa: F401
+                import semantic_kernel.agents  # noqa: F401
+                import semantic_kernel.connectors.ai.open_ai  # noqa: F401
+                for domain in domains or AGENT_REGISTRY:
+                    self._module(domain)
+
+        thread = threading.Thread(target=load, name="agent-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def startup_report(self) -> Dict[str, float]:
+        """Time spent on each lazy step so far in milliseconds, slowest first."""
+        return {
+            step: round(seconds * 1000, 1)
+            for step, seconds in sorted(self.timings.items(), key=lambda item: -item[1])
+        }
+
+    @contextmanager
+    def streaming(self, on_token: Callable[[str], Awaitable[None]],
+                  on_tool: Optional[Callable[[str, str, str, str], Awaitable[None]]] = None):
+        """Send every invoke in this task's context to ``on_token`` as it streams.
+
+        ``on_tool`` gets ("call", function, arguments, call_id) when the agent
+        calls a plugin function and ("result", function, result, call_id) when
+        it returns; the call id pairs a result with its call.
+        The handlers live in a context variable, so monitor functions stream
+        without being changed and concurrent sessions never see each other's tokens.
+        """
+        token = _stream_handlers.set((on_token, on_tool))
+        try:
+            yield
+        finally:
+            _stream_handlers.reset(token)
+
+    async def invoke(self, domain: str, user_input: str, reading: dict = None, key_fields=None) -> str:
+        """Run one prompt through a domain's warm agent on a fresh thread.
+
+        When a cache is configured and the reading is given, a cached response
+        for an equivalent reading is returned without calling the model.
+        ``key_fields`` limits the comparison to those fields of the reading.
+        """
+        agent = self.get_agent(domain)
+        on_token, on_tool = _stream_handlers.get()
+        key = None
+        if self.cache is not None and reading is not None:
+            key = self.cache.make_key(agent.instructions, reading, key_fields)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.tokens.record(agent.name, 0, cached=True)
+                print(cached, end="", flush=True)
+                if on_token is not None:
+                    await on_token(cached)
+                return cached
+
+        start = time.perf_counter()
+        thread = None
+        response_text = ""
+        try:
+            async for response in agent.invoke_stream(
+                messages=user_input,
+                thread=thread,
+                on_intermediate_message=tool_reporter(on_tool) if on_tool is not None else None,
+            ):
+                if thread is None:
+                    thread = response.thread
+                response_text += str(response)
+                print(f"{response}", end="", flush=True)
+                if on_token is not None:
+                    await on_token(str(response))
+        finally:
+            if thread:
+                await thread.delete()
+        if key is not None and response_text:
+            self.cache.put(key, response_text, time.perf_counter() - start)
+        self.tokens.record(
+            agent.name,
+            estimate_tokens(agent.instructions) + estimate_tokens(user_input),
+            estimate_tokens(response_text),
+            prefix_tokens=self._prefix_tokens(domain, agent, user_input),
+        )
+        return response_text
+
+    def _prefix_tokens(self, domain: str, agent, user_input: str) -> int:
+        # Instructions plus the domain template's fixed head, when the prompt was built from it
+        prompt = self.get_prompt(domain)
+        fixed = prompt.prefix if prompt is not None and user_input.startswith(prompt.prefix) else ""
+        return estimate_tokens(agent.instructions + "\n" + fixed)
+
+    def token_report(self) -> Dict[str, Dict]:
+        """Estimated tokens spent per agent so far, biggest consumer first."""
+        return self.tokens.report()
+
+    async def aclose(self):
+        """Close pooled connections. Agents and plugins are dropped with them."""
+        if self.cache is not None:
+            self.cache.close()
+        if self._client is not None:
+            await self._client.close()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._client = None
+        self._service = None
+        self._agents = {}
+
+
+def tool_reporter(on_tool):
+    """An on_intermediate_message callback that turns function call/result items into on_tool events."""
+    from semantic_kernel.contents import FunctionCallContent, FunctionResultContent
+
+    async def report(message):
+        for item in message.items:
+            if isinstance(item, FunctionCallContent):
+                await on_tool("call", item.function_name, str(item.arguments or ""), item.id or item.call_id)
+            elif isinstance(item, FunctionResultContent):
+                await on_tool("result", item.function_name, str(item.result), item.id or item.call_id)
+    return report
+
+
+_runtime = None
+
+
+def get_runtime() -> AgentRuntime:
+    """Return the process-wide runtime, creating it on first use."""
+    global _runtime
+    if _runtime is None:
+        _runtime = AgentRuntime()
+    return _runtime
@@ -1,110 +1,247 @@
-# agents/security_sentinel_agent.py
-import os
-import pandas as pd
-import asyncio
-
-from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
-
-from semantic_kernel.agents import ChatCompletionAgent, ChatHistoryAgentThread
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import kernel_function
-
-class SecurityLogPlugin:
-    """Plugin for security monitoring and alerting."""
-
-    def __init__(self):
-        self.data = pd.read_csv("mock_data/security_log_data.csv")
-
-    @kernel_function(description="Get the next security reading from mock data.")
-    def get_next_reading(self) -> Annotated[dict, "Returns the next security reading with timestamp."]:
-        return self.data.iloc[0].to_dict()
-    
-    @kernel_function(description="Analyzes security metrics and provides recommendations.")
-    def analyze_security(self,
-                         access_time: str,
-                         user_role: str,
-                         location: str,
-                         method: str,
-                         failed_attempts: int,
-                         alerts: bool) -> Annotated[str, "Returns security analysis and recommendations."]:
-        if failed_attempts > 0:
-            return f"Security Alert: {failed_attempts} failed login attempts from {location} using {method}."
-        if alerts:
-            return "Security Alert: Potential intrusion detected."
-        return "All clear: No security issues detected."
-    
-async def monitor_security():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
-
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
-
-    # Create plugin instance
-    security_plugin = SecurityLogPlugin()
-
-    # Create the security sentinel agent
-    sentinel_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[security_plugin],
-        name="SecurityLog",
-        instructions="""You are an AI agent specialized in security monitoring and alerting.
-        Your role is to analyze security metrics and provide intelligent recommendations for optimal security.
-        Use the available plugins to analyze security metrics and provide actionable insights.
-        Based on inputs and plugins, recommend 'Allow', 'Investigate', 'Alert Admin', or 'Block Access'.""",
-    )
-
-    thread = None
-    try:
-        #while True:
-            # Get the next reading from mock data
-            reading = security_plugin.get_next_reading()
-            # Format the input for the agent
-            user_input = (
-                f"Access Time: {reading['access_time']}\n"
-                f"User Role: {reading['user_role']}\n"
-                f"Access Location: {reading['location']}\n"
-                f"Entry Method: {reading['method']}\n"
-                f"Failed Attempts: {reading['failed_attempts']}\n"
-                f"Any security alerts?: {reading['alerts']}\n"
-                "Based on the above, what action should be taken?"
-            )
-
-            print(f"\n[Security Sentinel] Processing: {user_input}")
-
-            # Get agent's analysis
-            response_text = ""
-            async for response in sentinel_agent.invoke_stream(
-                message=user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
-                response_text += str(response)
-                print(f"{response}", end="", flush=True)
-            
-            # Simulate real-time delay
-            #await asyncio.sleep(0.5)
-
-            if not response_text:
-                response_text = "No response generated from security analysis."
-
-            return response_text
-    
-    except KeyboardInterrupt:
-        print("\n[Security Sentinel] Shutting down...")
-    finally:
-        if thread:
-            await thread.delete()   
-
-if __name__ == "__main__":
+# agents/security_sentinel_agent.py
+import os
+import numpy as np
+import pandas as pd
+import asyncio
+
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Annotated, Dict, Tuple
+
+from semantic_kernel.functions import kernel_function
+
+from agents.prompt_builder import PromptTemplate
+from agents.readings import as_frame, is_missing, missing_mask
+from agents.runtime import get_runtime
+from agents.security_window import SecurityAggregator
+from utils.reading_stream import ReadingStream
+from utils.telemetry_store import get_store
+
+# Telemetry source and column types for security readings
+DATA_PATH = "mock_data/security_log_data.csv"
+READING_DTYPES = {
+    "access_time": "object",
+    "user_role": "category",
+    "location": "category",
+    "method": "category",
+    "failed_attempts": "int64",
+    "alerts": "object",
+}
+
+# Records remembered as windowed, so the rules, borderline check and prompt count each one only once
+SCORED_MEMORY = 10_000
+
+class SecurityLogPlugin:
+    """Plugin for security monitoring and alerting."""
+
+    def __init__(self, borderline_failed_attempts=2, stream: ReadingStream = None,
+                 window: SecurityAggregator = None):
+        # A couple of failed attempts may just be a mistyped PIN, so the LLM decides
+        self.borderline_failed_attempts = borderline_failed_attempts
+        # Sliding-window failure counts and hour profiles across records
+        self.window = window or SecurityAggregator()
+        # id(record) -> (record, window scores); the record is held so its id is not reused meanwhile
+        self._windowed = OrderedDict()
+        # Cursor the agent advances through, one reading per call, over the shared telemetry store
+        self.stream = stream or ReadingStream(DATA_PATH, dtypes=READING_DTYPES, loop=True, store=get_store())
+
+    @property
+    def data(self) -> pd.DataFrame:
+        # Built from the process-wide columnar copy, not a private read of the CSV
+        return get_store().frame(DATA_PATH, READING_DTYPES)
+
+    @kernel_function(description="Get the next security reading from mock data.")
+    def get_next_reading(self) -> Annotated[dict, "Returns the next security reading with timestamp."]:
+        return self.stream.next_reading()
+    
+    @kernel_function(description="Analyzes security metrics and provides recommendations.")
+    def analyze_security(self,
+                         access_time: str,
+                         user_role: str,
+                         location: str,
+                         method: str,
+                         failed_attempts: int,
+                         alerts: bool) -> Annotated[str, "Returns security analysis and recommendations."]:
+        if failed_attempts > 0:
+            return f"Security Alert: {failed_attempts} failed login attempts from {location} using {method}."
+        if alerts:
+            return "Security Alert: Potential intrusion detected."
+        return "All clear: No security issues detected."
+
+    def _remember(self, reading, window: dict):
+        self._windowed[id(reading)] = (reading, window)
+        if len(self._windowed) > SCORED_MEMORY:
+            self._windowed.popitem(last=False)
+
+    def observe(self, reading: dict) -> dict:
+        """Fold a record into the window once; the rules and the prompt then share its scores."""
+        seen = self._windowed.get(id(reading))
+        if seen is not None and seen[0] is reading:
+            return seen[1]
+        window = self.window.observe(reading)
+        self._remember(reading, window)
+        return window
+
+    @staticmethod
+    def _window_text(user_role, burst, unusual_hour) -> str:
+        notes = []
+        if burst:
+            notes.append("Failed attempts are bursting on this role, location or method within the window.")
+        if unusual_hour:
+            notes.append(f"Access at an hour the {user_role} role rarely uses.")
+        return " ".join(notes)
+
+    def analyze_reading(self, reading: dict) -> str:
+        return self.assess_reading(reading)[1]
+
+    def assess_reading(self, reading: dict) -> Tuple[str, str]:
+        """Score a reading with the rules and the window across records: returns (severity, analysis)."""
+        window = self.observe(reading)
+        failed_attempts = reading["failed_attempts"]
+        alerted = not is_missing(reading["alerts"])
+        # A few failures alone may be a mistyped PIN; many, or a burst across records, are not
+        if window["burst"] or failed_attempts > self.borderline_failed_attempts:
+            severity = "critical"
+        elif failed_attempts > 0 or alerted or window["unusual_hour"]:
+            severity = "warning"
+        else:
+            severity = "normal"
+        analysis = self.analyze_security(
+            reading["access_time"],
+            reading["user_role"],
+            reading["location"],
+            reading["method"],
+            failed_attempts,
+            alerted,
+        )
+        notes = self._window_text(reading["user_role"], window["burst"], window["unusual_hour"])
+        return severity, f"{analysis} {notes}" if notes else analysis
+
+    def is_borderline(self, reading: dict) -> bool:
+        window = self.observe(reading)
+        # A burst decides the outcome on its own
+        if window["burst"]:
+            return False
+        failed_attempts = reading["failed_attempts"]
+        if 0 < failed_attempts <= self.borderline_failed_attempts:
+            return True
+        return failed_attempts == 0 and (not is_missing(reading["alerts"]) or window["unusual_hour"])
+
+    def prompt_context(self, reading: dict) -> Tuple[Dict, Dict]:
+        """Window a record; returns its extra prompt lines and the derived fields that key the response cache."""
+        window = self.observe(reading)
+        context = {
+            "Recent failed attempts (role / location / method)": (
+                f"{window['window_failed_user_role']} / {window['window_failed_location']} / "
+                f"{window['window_failed_method']}"
+            ),
+            "Burst detected": window["burst"],
+            "Unusual hour for this role": window["unusual_hour"],
+        }
+        return context, {"burst": window["burst"], "unusual_hour": window["unusual_hour"]}
+
+    def analyze_batch(self, readings) -> pd.DataFrame:
+        """Vectorized analyze_reading/assess_reading/is_borderline over many readings."""
+        frame = as_frame(readings, ["access_time", "user_role", "location", "method", "failed_attempts", "alerts"])
+        window = self.window.observe_batch(frame)
+        if isinstance(readings, (list, tuple)) and readings and isinstance(readings[0], Mapping):
+            for reading, scores in zip(readings, window.to_dict("records")):
+                self._remember(reading, scores)
+        burst = window["burst"].to_numpy()
+        unusual_hour = window["unusual_hour"].to_numpy()
+
+        failed_attempts = frame["failed_attempts"]
+        failed = (failed_attempts > 0).to_numpy()
+        alerted = (~missing_mask(frame["alerts"])).to_numpy()
+        decision = np.select(
+            [failed, alerted],
+            [
+                "Security Alert: " + failed_attempts.astype(str) + " failed login attempts from "
+                + frame["location"].astype(str) + " using " + frame["method"].astype(str) + ".",
+                "Security Alert: Potential intrusion detected.",
+            ],
+            default="All clear: No security issues detected.",
+        ).astype(object)
+        # Window findings are rare, so their notes are added row by row
+        roles = frame["user_role"].astype(str).to_numpy()
+        for i in np.flatnonzero(burst | unusual_hour):
+            decision[i] = f"{decision[i]} {self._window_text(roles[i], burst[i], unusual_hour[i])}"
+
+        many_failed = (failed_attempts > self.borderline_failed_attempts).to_numpy()
+        borderline = ~burst & (
+            (failed & ~many_failed)
+            | ((failed_attempts == 0).to_numpy() & (alerted | unusual_hour))
+        )
+        return pd.DataFrame({
+            "decision": decision,
+            "severity": np.select(
+                [burst | many_failed, failed | alerted | unusual_hour], ["critical", "warning"], default="normal"
+            ),
+            "borderline": borderline,
+        }, index=frame.index)
+    
+# Security sentinel agent definition, built once by the shared runtime
+AGENT_NAME = "SecurityLog"
+AGENT_INSTRUCTIONS = """You are an AI agent specialized in security monitoring and alerting.
+        Your role is to analyze security metrics and provide intelligent recommendations for optimal security.
+        Use the available plugins to analyze security metrics and provide actionable insights.
+        Based on inputs and plugins, recommend 'Allow', 'Investigate', 'Alert Admin', or 'Block Access'."""
+
+# Per-reading prompt: fixed task text first, then the record's values
+PROMPT = PromptTemplate(
+    task="Review this access record.",
+    fields={
+        "access_time": "Access time",
+        "user_role": "User role",
+        "location": "Access location",
+        "method": "Entry method",
+        "failed_attempts": "Failed attempts",
+        "alerts": "Security alerts",
+    },
+    question="Based on the record below, what action should be taken?",
+    decisions=("Allow", "Investigate", "Alert Admin", "Block Access"),
+)
+
+# Reading and derived fields that decide the answer; times and ids stay out of the cache key
+CACHE_FIELDS = (
+    "user_role", "location", "method", "failed_attempts", "alerts", "burst", "unusual_hour",
+)
+
+# Reading fields the rules cannot do without; messages missing one are turned away at ingestion
+REQUIRED_FIELDS = ("access_time", "user_role", "location", "method", "failed_attempts", "alerts")
+
+async def monitor_security(runtime=None, reading=None):
+    # Reuse the shared client, chat service and warm agent
+    runtime = runtime or get_runtime()
+    security_plugin = runtime.get_plugin("security")
+
+    try:
+        #while True:
+            # Get the next reading from mock data unless one was handed in
+            if reading is None:
+                reading = security_plugin.get_next_reading()
+
+            # Put the record in context: recent failures on the same role, location and method
+            context, derived = security_plugin.prompt_context(reading)
+
+            # Format the input for the agent
+            user_input = PROMPT.render(reading, context)
+
+            print(f"\n[Security Sentinel] Processing: {user_input}")
+
+            # Get agent's analysis
+            response_text = await runtime.invoke("security", user_input, {**reading, **derived}, CACHE_FIELDS)
+            
+            # Simulate real-time delay
+            #await asyncio.sleep(0.5)
+
+            if not response_text:
+                response_text = "No response generated from security analysis."
+
+            return response_text
+    
+    except KeyboardInterrupt:
+        print("\n[Security Sentinel] Shutting down...")
+
+if __name__ == "__main__":
     asyncio.run(monitor_security())
\ No newline at end of file
@@ -0,0 +1,191 @@
+# agents/security_window.py
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from agents.readings import as_frame, epoch_seconds
+
+# Fields failed attempts are counted by; "combo" is role, location and method together
+DIMENSIONS = ("user_role", "location", "method", "combo")
+
+
+def _hash_keys(keys) -> np.ndarray:
+    return pd.util.hash_array(np.asarray(keys, dtype=object)).astype(np.uint64)
+
+
+class CountMinSketch:
+    """Fixed-size approximate counter for any number of keys.
+
+    Estimates never undercount; with ``width`` w and ``depth`` d they
+    overcount by at most 2N/w with probability 1 - 2^-d, N being the total
+    added. Row indices come from one 64-bit hash split in two
+    (Kirsch-Mitzenmacher), so a batch of keys is hashed in one call.
+    """
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def indices(self, hashes: np.ndarray) -> np.ndarray:
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = hashes >> np.uint64(32)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((low[None, :] + rows * high[None, :]) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, indices: np.ndarray, counts: np.ndarray):
+        for row in range(self.depth):
+            np.add.at(self.table[row], indices[row], counts)
+
+    def estimate(self, indices: np.ndarray) -> np.ndarray:
+        return self.table[np.arange(self.depth)[:, None], indices].min(axis=0)
+
+
+class SlidingSketch:
+    """Count-min sketch over a sliding time window, built from a ring of per-bucket sketches.
+
+    The window is ``buckets`` x ``bucket_seconds`` long. A running total is
+    kept alongside the ring, so expiring a bucket is one subtraction and a
+    query reads only the total: memory is fixed and work per event is O(depth).
+    """
+
+    def __init__(self, window_seconds=300.0, buckets=30, width=4096, depth=4):
+        self.bucket_seconds = window_seconds / buckets
+        # int32 per bucket keeps the ring at buckets x depth x width x 4 bytes (~2 MB by default)
+        self.ring = np.zeros((buckets, depth, width), dtype=np.int32)
+        self.total = CountMinSketch(width, depth)
+        self._bucket = None
+
+    def advance(self, timestamp: float):
+        """Move the window forward to ``timestamp``, expiring buckets that fell out of it."""
+        bucket = int(timestamp // self.bucket_seconds)
+        if self._bucket is None:
+            self._bucket = bucket
+            return
+        steps = bucket - self._bucket
+        if steps <= 0:
+            # Late events land in the current bucket rather than reopening an old one
+            return
+        buckets = len(self.ring)
+        for step in range(1, min(steps, buckets) + 1):
+            slot = (self._bucket + step) % buckets
+            self.total.table -= self.ring[slot]
+            self.ring[slot] = 0
+        self._bucket = bucket
+
+    def add(self, indices: np.ndarray, counts: np.ndarray):
+        current = self.ring[self._bucket % len(self.ring)]
+        for row in range(self.total.depth):
+            np.add.at(current[row], indices[row], counts)
+        self.total.add(indices, counts)
+
+    def estimate(self, indices: np.ndarray) -> np.ndarray:
+        return self.total.estimate(indices)
+
+
+class SecurityAggregator:
+    """Streaming view of access records that catches patterns single records hide.
+
+    Failed attempts are counted over a sliding window per user role, location,
+    method and their combination, and a burst is flagged once any of those
+    counts reaches ``burst_threshold`` (one number, or one per dimension). Each role's accesses are also profiled
+    by hour of day; access at an hour that role rarely uses is flagged as
+    unusual. Everything lives in fixed-size sketches, whatever the key
+    cardinality or event rate.
+    """
+
+    def __init__(self, window_seconds=300.0, buckets=30, burst_threshold=5,
+                 rare_hour_share=0.02, min_history=50, width=4096, depth=4, profile_width=16384):
+        self.burst_thresholds = (
+            dict(burst_threshold) if isinstance(burst_threshold, dict)
+            else dict.fromkeys(DIMENSIONS, burst_threshold)
+        )
+        # An hour holding less than this share of a role's accesses is unusual for it
+        self.rare_hour_share = rare_hour_share
+        # Accesses a role needs before its hour profile is trusted
+        self.min_history = min_history
+
+        self.failures = SlidingSketch(window_seconds, buckets, width, depth)
+        # Profiles accumulate forever, so they get wider sketches to keep collisions rare
+        self.hour_profile = CountMinSketch(profile_width, depth)
+        self.role_totals = CountMinSketch(profile_width, depth)
+        self.events = 0
+
+    @staticmethod
+    def _hours(access_time: pd.Series) -> np.ndarray:
+        # access_time is "H:MM" in the logs; anything unparseable has no hour
+        hours = pd.to_numeric(access_time.astype(str).str.split(":").str[0], errors="coerce")
+        return hours.to_numpy(dtype=np.float64)
+
+    def observe(self, reading: dict, timestamp: float = None) -> Dict:
+        result = self.observe_batch(pd.DataFrame([reading]), None if timestamp is None else [timestamp])
+        return {name: value.item() for name, value in result.iloc[0].items()}
+
+    def observe_batch(self, readings, timestamps=None) -> pd.DataFrame:
+        """Fold access records in, in time order, and score each against the window.
+
+        Without ``timestamps`` each record's own ``timestamp`` field is used,
+        and records with none are taken to arrive now. Records in the same
+        bucket are counted together, so each sees its whole bucket.
+        """
+        frame = as_frame(readings, ["access_time", "user_role", "location", "method", "failed_attempts"])
+        n = len(frame)
+        if timestamps is not None:
+            times = np.asarray(timestamps, dtype=np.float64)
+        elif "timestamp" in frame:
+            times = epoch_seconds(frame["timestamp"])
+            times = np.where(np.isnan(times), time.time(), times)
+        else:
+            times = np.full(n, time.time())
+
+        role = frame["user_role"].astype(str).to_numpy(dtype=object)
+        keys = {
+            "user_role": "role=" + role,
+            "location": "location=" + frame["location"].astype(str).to_numpy(dtype=object),
+            "method": "method=" + frame["method"].astype(str).to_numpy(dtype=object),
+        }
+        keys["combo"] = keys["user_role"] + "|" + keys["location"] + "|" + keys["method"]
+        indices = {name: self.failures.total.indices(_hash_keys(values)) for name, values in keys.items()}
+        failed = frame["failed_attempts"].to_numpy(dtype=np.int64)
+
+        counts = {name: np.zeros(n, dtype=np.int64) for name in DIMENSIONS}
+        buckets = np.floor(times / self.failures.bucket_seconds)
+        order = np.argsort(buckets, kind="stable")
+        bounds = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1], True])
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:stop]
+            self.failures.advance(times[rows[0]])
+            for name in DIMENSIONS:
+                self.failures.add(indices[name][:, rows], failed[rows])
+            for name in DIMENSIONS:
+                counts[name][rows] = self.failures.estimate(indices[name][:, rows])
+
+        burst = np.zeros(n, dtype=bool)
+        for name, threshold in self.burst_thresholds.items():
+            burst |= counts[name] >= threshold
+
+        # Score each access against the hour profile before adding it
+        hours = self._hours(frame["access_time"])
+        known = ~np.isnan(hours)
+        role_index = self.role_totals.indices(_hash_keys(role))
+        hour_keys = role + "@" + np.where(known, hours, -1).astype(np.int64).astype(str).astype(object)
+        hour_index = self.hour_profile.indices(_hash_keys(hour_keys))
+        seen = self.role_totals.estimate(role_index)
+        at_hour = self.hour_profile.estimate(hour_index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Overcounted collisions can push the estimate past the role's total
+            share = np.where(seen > 0, np.minimum(at_hour / seen, 1.0), 0.0)
+        unusual = known & (seen >= self.min_history) & (share < self.rare_hour_share)
+        ones = np.ones(n, dtype=np.int64)
+        self.role_totals.add(role_index, ones)
+        self.hour_profile.add(hour_index, ones)
+        self.events += n
+
+        return pd.DataFrame({
+            **{f"window_failed_{name}": counts[name] for name in DIMENSIONS},
+            "burst": burst,
+            "hour_share": share,
+            "unusual_hour": unusual,
+        }, index=frame.index)
@@ -0,0 +1,91 @@
+# agents/single_flight.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+def normalize_issue(issue: str) -> str:
+    """An issue as it is compared for coalescing: case, spacing and trailing punctuation ignored."""
+    return " ".join(str(issue).lower().split()).rstrip(".!?")
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its result.
+
+    The first caller for a key starts the call. Callers arriving while it
+    runs await the same task, and callers within ``reuse_window`` seconds of
+    it finishing get its result without a new call. Failures are passed to
+    everyone waiting and are never reused. The shared task is shielded, so
+    one caller timing out or being cancelled does not cancel it for the
+    others; when the last one gives up, it is cancelled. It runs in its
+    leader's context, so only the leader sees its tokens streamed; the
+    others get the finished result. At most ``max_results`` finished
+    results are kept, the oldest dropped first.
+    """
+
+    def __init__(self, reuse_window=2.0, max_results=256):
+        self.reuse_window = reuse_window
+        self.max_results = max_results
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Callers still awaiting each in-flight task
+        self._waiting: Dict[asyncio.Future, int] = {}
+        # key -> (result, monotonic time it stops being reused), oldest first
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        self.leaders = 0
+        self.joined = 0
+        self.reused = 0
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable]):
+        recent = self._results.get(key)
+        if recent is not None:
+            if recent[1] > time.monotonic():
+                self.reused += 1
+                return recent[0]
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.joined += 1
+
+        self._waiting[task] = self._waiting.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+                # The last caller timed out or was cancelled, so nobody is left to use the result
+                if not task.done():
+                    task.cancel()
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        # exception() also marks a failure as retrieved when nobody is left waiting for it
+        if task.cancelled() or task.exception() is not None or not self.reuse_window:
+            return
+        now = time.monotonic()
+        self._results.pop(key, None)
+        self._results[key] = (task.result(), now + self.reuse_window)
+        # Every entry lives reuse_window seconds, so the oldest also expire first
+        while len(self._results) > self.max_results or next(iter(self._results.values()))[1] <= now:
+            self._results.popitem(last=False)
+            if not self._results:
+                break
+
+    def stats(self) -> Dict:
+        """Calls started, and how many callers shared an in-flight call or reused a recent result."""
+        callers = self.leaders + self.joined + self.reused
+        return {
+            "calls": self.leaders,
+            "joined": self.joined,
+            "reused": self.reused,
+            "in_flight": len(self._inflight),
+            "coalesced_share": round((self.joined + self.reused) / callers, 3) if callers else 0.0,
+        }
@@ -0,0 +1,178 @@
+# agents/thermal_grid.py
+import math
+from typing import Dict, List, Mapping
+
+import numpy as np
+
+from agents.readings import as_frame
+
+# Intervention needed per unit over each limit (degrees C, humidity %, load %)
+NEED_WEIGHTS = {
+    "temperature": 1.0,
+    "humidity": 0.2,
+    "rack_load": 0.1,
+}
+
+METRICS = list(NEED_WEIGHTS)
+
+
+class RackGrid:
+    """Per-rack cooling state laid out on the floor plan of a hall.
+
+    Temperature, humidity and load live in (rows, cols) arrays, one cell per
+    rack. A rack is hot above the temperature limit and a hotspot when at
+    least ``min_cluster`` racks in its (2 x ``radius`` + 1)^2 neighborhood,
+    itself included, are hot. A lone warm rack is usually a sensor or a
+    door; a cluster is a cooling problem. Every rack's need is its weighted
+    excess over the limits, and the hall is split into ``zone_shape`` blocks
+    (one per CRAC unit or aisle segment) ranked by their total need.
+
+    Updates are incremental: only the neighborhoods and zones of the racks
+    that changed are touched, so the cost of a batch scales with its size
+    rather than with the hall.
+    """
+
+    def __init__(self, rows, cols, zone_shape=(4, 8), radius=1, min_cluster=3,
+                 temperature_limit=27.0, humidity_limit=60.0, rack_load_limit=80.0):
+        self.shape = (rows, cols)
+        self.zone_shape = zone_shape
+        self.radius = radius
+        self.min_cluster = min_cluster
+        self.limits = {
+            "temperature": temperature_limit,
+            "humidity": humidity_limit,
+            "rack_load": rack_load_limit,
+        }
+
+        self.values = {name: np.full(self.shape, np.nan) for name in METRICS}
+        self.hot = np.zeros(self.shape, dtype=bool)
+        self.need = np.zeros(self.shape)
+        # Neighborhood sums, the convolution of hot and need with a (2r+1)^2 box
+        self.hot_nearby = np.zeros(self.shape, dtype=np.int64)
+        self.need_nearby = np.zeros(self.shape)
+
+        self.zone_grid = (-(-rows // zone_shape[0]), -(-cols // zone_shape[1]))
+        self.zone_need = np.zeros(self.zone_grid)
+        self.zone_hot = np.zeros(self.zone_grid, dtype=np.int64)
+
+        offsets = np.arange(-radius, radius + 1)
+        self._offsets = np.stack(np.meshgrid(offsets, offsets, indexing="ij"), axis=-1).reshape(-1, 2)
+
+    @property
+    def racks(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    def position(self, index) -> tuple:
+        """(row, col) of the index-th rack in row-major order, wrapping around the hall."""
+        return divmod(int(index) % self.racks, self.shape[1])
+
+    def _spread(self, grid, rows, cols, delta):
+        # Add delta to every cell within radius of (rows, cols), clipped at the walls
+        for dr, dc in self._offsets:
+            r, c = rows + dr, cols + dc
+            inside = (r >= 0) & (r < self.shape[0]) & (c >= 0) & (c < self.shape[1])
+            np.add.at(grid, (r[inside], c[inside]), delta[inside])
+
+    def update(self, rows, cols, readings) -> np.ndarray:
+        """Set the racks at (rows, cols) to ``readings``; returns whether each is now a hotspot."""
+        frame = as_frame(readings, METRICS)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if ((rows < 0) | (rows >= self.shape[0]) | (cols < 0) | (cols >= self.shape[1])).any():
+            raise ValueError(f"Rack position outside the {self.shape[0]}x{self.shape[1]} hall")
+
+        # With a rack repeated in the batch the last reading wins, as it would one at a time
+        flat, last = np.unique((rows * self.shape[1] + cols)[::-1], return_index=True)
+        picked = len(frame) - 1 - last
+        r, c = np.divmod(flat, self.shape[1])
+
+        need = np.zeros(len(flat))
+        for name in METRICS:
+            value = frame[name].to_numpy(dtype=np.float64)[picked]
+            self.values[name][r, c] = value
+            need += NEED_WEIGHTS[name] * np.clip(np.nan_to_num(value - self.limits[name]), 0.0, None)
+        hot = self.values["temperature"][r, c] > self.limits["temperature"]
+
+        hot_delta = hot.astype(np.int64) - self.hot[r, c]
+        need_delta = need - self.need[r, c]
+        self.hot[r, c] = hot
+        self.need[r, c] = need
+        self._spread(self.hot_nearby, r, c, hot_delta)
+        self._spread(self.need_nearby, r, c, need_delta)
+        zones = (r // self.zone_shape[0], c // self.zone_shape[1])
+        np.add.at(self.zone_hot, zones, hot_delta)
+        np.add.at(self.zone_need, zones, need_delta)
+
+        return self.hot[rows, cols] & (self.hot_nearby[rows, cols] >= self.min_cluster)
+
+    def update_rack(self, row: int, col: int, reading: Mapping) -> bool:
+        """update for one rack, straight from the reading's scalars; returns whether it is now a hotspot."""
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            raise ValueError(f"Rack position outside the {self.shape[0]}x{self.shape[1]} hall")
+
+        need = 0.0
+        for name in METRICS:
+            value = float(reading[name])
+            self.values[name][row, col] = value
+            if not math.isnan(value):
+                need += NEED_WEIGHTS[name] * max(value - self.limits[name], 0.0)
+        hot = bool(self.values["temperature"][row, col] > self.limits["temperature"])
+
+        hot_delta = int(hot) - int(self.hot[row, col])
+        need_delta = need - self.need[row, col]
+        self.hot[row, col] = hot
+        self.need[row, col] = need
+        # The neighborhood is a box clipped at the walls, so a slice covers it
+        near = (slice(max(row - self.radius, 0), row + self.radius + 1),
+                slice(max(col - self.radius, 0), col + self.radius + 1))
+        self.hot_nearby[near] += hot_delta
+        self.need_nearby[near] += need_delta
+        zone = (row // self.zone_shape[0], col // self.zone_shape[1])
+        self.zone_hot[zone] += hot_delta
+        self.zone_need[zone] += need_delta
+
+        return hot and bool(self.hot_nearby[row, col] >= self.min_cluster)
+
+    def hotspot_mask(self) -> np.ndarray:
+        return self.hot & (self.hot_nearby >= self.min_cluster)
+
+    def hotspots(self, limit=10) -> List[dict]:
+        """Hotspot racks, those at the center of the most neighborhood need first."""
+        r, c = np.nonzero(self.hotspot_mask())
+        order = np.argsort(-self.need_nearby[r, c], kind="stable")[:limit]
+        return [self.describe(int(row), int(col)) for row, col in zip(r[order], c[order])]
+
+    def rank_zones(self, k=5) -> List[dict]:
+        """The k zones needing the most cooling intervention, most first; zones with no need are left out."""
+        flat = self.zone_need.ravel()
+        # Incremental sums leave float dust where need went back to zero
+        k = min(k, int((flat > 1e-9).sum()))
+        if not k:
+            return []
+        top = np.argpartition(-flat, k - 1)[:k]
+        top = top[np.argsort(-flat[top], kind="stable")]
+        hotspots = self.hotspot_mask()
+        zones = []
+        for index in top.tolist():
+            zr, zc = divmod(index, self.zone_grid[1])
+            block = (slice(zr * self.zone_shape[0], (zr + 1) * self.zone_shape[0]),
+                     slice(zc * self.zone_shape[1], (zc + 1) * self.zone_shape[1]))
+            temperature = self.values["temperature"][block]
+            zones.append({
+                "zone": f"Z{zr}-{zc}",
+                "rows": (block[0].start, min(block[0].stop, self.shape[0]) - 1),
+                "cols": (block[1].start, min(block[1].stop, self.shape[1]) - 1),
+                "need": round(float(flat[index]), 2),
+                "hot_racks": int(self.zone_hot[zr, zc]),
+                "hotspots": int(hotspots[block].sum()),
+                "max_temperature": float(np.nanmax(temperature)) if (~np.isnan(temperature)).any() else None,
+            })
+        return zones
+
+    def describe(self, row: int, col: int) -> Dict:
+        return {
+            "rack": f"R{row}-{col}",
+            **{name: float(self.values[name][row, col]) for name in METRICS},
+            "hot_neighbors": int(self.hot_nearby[row, col]),
+            "neighborhood_need": round(float(self.need_nearby[row, col]), 2),
+        }
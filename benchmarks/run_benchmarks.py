@@ -0,0 +1,222 @@
+# benchmarks/run_benchmarks.py
+#
+# End-to-end benchmarks for the agents, the orchestrator and data_streamer,
+# run against the local stub chat-completions server. Results are written as
+# JSON so runs can be compared across releases:
+#
+#   python benchmarks/run_benchmarks.py --readings 50 --first-token-ms 50 --output bench.json
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_llm_server import StubLLMServer
+
+DOMAINS = ["energy", "cooling", "security", "maintenance", "compliance", "resource"]
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def timed_calls(make_call, count, concurrency):
+    """Run ``count`` calls, ``concurrency`` at a time; return per-call latencies and wall time."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(latencies, wall, llm_calls, readings):
+    return {
+        "readings": readings,
+        "latency": percentiles(latencies),
+        "throughput_per_s": round(readings / wall, 2) if wall else 0.0,
+        "llm_calls": llm_calls,
+        "llm_calls_per_reading": round(llm_calls / readings, 4) if readings else 0.0,
+    }
+
+
+async def bench_setup(base_url):
+    """Cold cost of building the client, service and all six agents, then the warm lookup cost."""
+    from agents.runtime import AgentRuntime
+
+    start = time.perf_counter()
+    runtime = AgentRuntime(api_key="stub", base_url=base_url)
+    for domain in DOMAINS:
+        runtime.get_agent(domain)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for domain in DOMAINS:
+        runtime.get_agent(domain)
+    warm = time.perf_counter() - start
+    await runtime.aclose()
+    return {
+        "cold_all_agents_ms": round(cold * 1000, 3),
+        "warm_all_agents_ms": round(warm * 1000, 3),
+        "steps_ms": runtime.startup_report(),
+    }
+
+
+async def bench_agents(runtime, server, readings, concurrency):
+    results = {}
+    for domain in DOMAINS:
+        monitor = runtime.get_monitor(domain)
+        before = server.requests
+        latencies, wall = await timed_calls(lambda: monitor(runtime), readings, concurrency)
+        results[domain] = summarize(latencies, wall, server.requests - before, readings)
+    return results
+
+
+async def bench_orchestrator(runtime, server, readings, concurrency):
+    from orchestrator_agent import OrchestratorPlugin
+
+    results = {}
+    # Every call stands for a new reading, so only the "coalesced" mode shares identical executions
+    modes = {
+        "direct": OrchestratorPlugin(runtime, coalesce=False),
+        "tiered": OrchestratorPlugin(runtime, tiered=True, coalesce=False),
+        "coalesced": OrchestratorPlugin(runtime),
+    }
+    for mode, orchestrator in modes.items():
+        before = server.requests
+        latencies, wall = await timed_calls(
+            lambda: orchestrator.execute_agent("cooling", "cooling check"), readings, concurrency
+        )
+        results[mode] = summarize(latencies, wall, server.requests - before, readings)
+
+    issue = "rack temperature spike with power surge"
+    orchestrator = modes["direct"]
+    before = server.requests
+    latencies, wall = await timed_calls(lambda: orchestrator.fan_out(issue), max(1, readings // 5), 1)
+    results["fan_out"] = summarize(latencies, wall, server.requests - before, len(latencies))
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        orchestrator.route_issues(issue)
+    results["routing_us"] = round((time.perf_counter() - start) / 10_000 * 1e6, 3)
+    return results
+
+
+async def bench_streamer(runtime, rows):
+    import numpy as np
+    import pandas as pd
+    from utils.stream_pipeline import StreamPipeline
+
+    pipeline = StreamPipeline(runtime=runtime)
+    stages = await pipeline.run()
+
+    # Vectorized backfill over synthetic cooling telemetry
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "temperature": rng.uniform(18, 35, rows),
+        "humidity": rng.uniform(30, 70, rows),
+        "rack_load": rng.uniform(30, 100, rows),
+    })
+    plugin = runtime.get_plugin("cooling")
+    start = time.perf_counter()
+    plugin.analyze_batch(frame)
+    elapsed = time.perf_counter() - start
+    return {
+        "pipeline_stages": stages,
+        "backfill_rows": rows,
+        "backfill_rows_per_s": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run(args):
+    from agents.runtime import AgentRuntime
+
+    server = StubLLMServer(first_token_ms=args.first_token_ms, token_ms=args.token_ms)
+    base_url = await server.start()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "readings": args.readings,
+            "concurrency": args.concurrency,
+            "first_token_ms": args.first_token_ms,
+            "token_ms": args.token_ms,
+        },
+    }
+
+    # Measured before tracemalloc starts, which slows imports several times over
+    report["setup"] = await bench_setup(base_url)
+
+    tracemalloc.start()
+    runtime = AgentRuntime(api_key="stub", base_url=base_url)
+    try:
+        # Agents stream their replies to stdout; keep the benchmark output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            report["agents"] = await bench_agents(runtime, server, args.readings, args.concurrency)
+            report["orchestrator"] = await bench_orchestrator(runtime, server, args.readings, args.concurrency)
+            report["data_streamer"] = await bench_streamer(runtime, args.backfill_rows)
+    finally:
+        await runtime.aclose()
+        await server.stop()
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["memory"] = {
+        "python_peak_mb": round(peak / 2**20, 2),
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "max_rss_mb": round(max_rss / (2**20 if sys.platform == "darwin" else 2**10), 2),
+    }
+    report["llm_requests_total"] = server.requests
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SentinelGreen end-to-end benchmarks")
+    parser.add_argument("--readings", type=int, default=20, help="dispatches per agent and mode")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--token-ms", type=float, default=1.0)
+    parser.add_argument("--backfill-rows", type=int, default=1_000_000)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
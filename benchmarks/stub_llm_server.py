@@ -0,0 +1,158 @@
+# benchmarks/stub_llm_server.py
+#
+# Local OpenAI-compatible chat-completions server for benchmarks. It answers
+# every request with a canned completion after a configurable delay, streamed
+# token by token when the client asks for it. Requests with a JSON-schema
+# response_format (batch analysis) get one decision per numbered reading. Point an AgentRuntime at
+# http://127.0.0.1:<port>/ to exercise the agents without a live endpoint:
+#
+#   python benchmarks/stub_llm_server.py --port 8008 --first-token-ms 200 --token-ms 5
+
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+DEFAULT_REPLY = (
+    "Recommendation: Maintain current settings. All monitored metrics are within "
+    "their expected ranges, so no immediate action is required."
+)
+
+
+class StubLLMServer:
+    """aiohttp app that imitates /chat/completions with fixed latency."""
+
+    def __init__(self, first_token_ms=200.0, token_ms=5.0, reply=DEFAULT_REPLY):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.reply = reply
+        self.requests = 0
+        self.prompt_chars = 0
+        self._runner = None
+        self.port = None
+
+    def _reply_for(self, body) -> str:
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") != "json_schema":
+            return self.reply
+        # Batch analysis: the first allowed decision for every "Reading N:" in the prompt
+        schema = response_format["json_schema"]["schema"]
+        decision = schema["properties"]["decisions"]["items"]["properties"]["decision"]
+        choice = (decision.get("enum") or ["No Action"])[0]
+        prompt = "\n".join(str(message.get("content") or "") for message in body.get("messages", [])
+                           if message.get("role") == "user")
+        ids = [int(number) for number in re.findall(r"^Reading (\d+):", prompt, re.M)]
+        return json.dumps({"decisions": [
+            {"id": number, "decision": choice, "reason": "Metrics are within their expected ranges."}
+            for number in ids
+        ]})
+
+    def _tokens(self, reply):
+        words = reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _chunk(self, completion_id, model, delta, finish_reason=None):
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    async def handle_completion(self, request):
+        body = await request.json()
+        self.requests += 1
+        self.prompt_chars += sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        reply = self._reply_for(body)
+        tokens = self._tokens(reply)
+        usage = {
+            "prompt_tokens": self.prompt_chars // 4,
+            "completion_tokens": len(tokens),
+            "total_tokens": self.prompt_chars // 4 + len(tokens),
+        }
+        await asyncio.sleep(self.first_token_ms / 1000)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.token_ms * len(tokens) / 1000)
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(payload):
+            await response.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        for i, token in enumerate(tokens):
+            delta = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            await send(self._chunk(completion_id, model, delta))
+            if self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+        await send(self._chunk(completion_id, model, {}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send({**self._chunk(completion_id, model, {}), "choices": [], "usage": usage})
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.handle_completion)
+        app.router.add_post("/v1/chat/completions", self.handle_completion)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0) -> str:
+        """Serve in the running event loop and return the base URL."""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}/"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(args):
+    server = StubLLMServer(args.first_token_ms, args.token_ms)
+    url = await server.start(args.host, args.port)
+    print(f"Stub chat-completions server listening on {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,80 +1,109 @@
-# dashboard/chainlit_app.py
-
-import chainlit as cl
-import asyncio
-import sys
-import os
-# Add the project root to Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from orchestrator_agent import OrchestratorPlugin, run_orchestrator
-
-@cl.on_chat_start
-async def on_chat_start():
-    await cl.Message(
-        content="?? Welcome to **SentinelGreen** 🏭 AI Orchestrator for Secure & Sustainable Data Centers\n\n"
-                "I can help you with:\n"
-                "• Energy optimization and power management\n"
-                "• Cooling system monitoring and control\n"
-                "• Security monitoring and threat detection\n"
-                "• Predictive maintenance and equipment health\n"
-                "• Compliance and regulatory requirements\n"
-                "• Resource allocation and optimization\n\n"
-                "Just describe your issue or concern, and I'll route it to the appropriate specialist agent."
-    ).send()
-
-    # Initialize the orchestrator
-    cl.user_session.set("orchestrator", OrchestratorPlugin())
-
-@cl.on_message
-async def on_message(msg: cl.Message):
-    # Get the orchestrator instance
-    orchestrator = cl.user_session.get("orchestrator")
-    
-    # Show thinking message
-    thinking_msg = await cl.Message(content="?? Analyzing your request...").send()
-    
-    try:
-        # Route the issue to the appropriate agent
-        agent_name = orchestrator.route_issue(msg.content)
-        
-        if agent_name != "unknown":
-            # Update thinking message
-            thinking_msg.content = f"?? Routing to {agent_name} specialist..."
-            await thinking_msg.update()
-            
-            # Execute the appropriate agent
-            result = await orchestrator.execute_agent(agent_name, msg.content)
-            
-            # Send the response
-            await cl.Message(
-                content=f"?? **{agent_name.title()} Specialist Response:**\n{result}"
-            ).send()
-            
-            # Add a separator for clarity
-            await cl.Message(content="---").send()
-        else:
-            # If no specific agent is identified, use the orchestrator's analysis
-            thinking_msg.content = "?? Analyzing with orchestrator..."
-            await thinking_msg.update()
-            
-            # Get orchestrator's analysis
-            async for response in orchestrator.orchestrator_agent.invoke_stream(
-                message=msg.content,
-                thread=orchestrator.thread
-            ):
-                if orchestrator.thread is None:
-                    orchestrator.thread = response.thread
-                await cl.Message(content=str(response)).send()
-    
-    except Exception as e:
-        await cl.Message(
-            content=f"?? Error: {str(e)}\nPlease try again or rephrase your request."
-        ).send()
-
-@cl.on_stop
-async def on_stop():
-    # Clean up any resources
-    orchestrator = cl.user_session.get("orchestrator")
-    if orchestrator and orchestrator.thread:
-        await orchestrator.thread.delete()
\ No newline at end of file
+# dashboard/chainlit_app.py
+
+import chainlit as cl
+import asyncio
+import sys
+import os
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.runtime import get_runtime
+from orchestrator_agent import OrchestratorPlugin
+
+# Agent modules warm up in the background once per process, not per chat session
+get_runtime().preload()
+
+@cl.on_chat_start
+async def on_chat_start():
+    await cl.Message(
+        content="?? Welcome to **SentinelGreen** 🏭 AI Orchestrator for Secure & Sustainable Data Centers\n\n"
+                "I can help you with:\n"
+                "• Energy optimization and power management\n"
+                "• Cooling system monitoring and control\n"
+                "• Security monitoring and threat detection\n"
+                "• Predictive maintenance and equipment health\n"
+                "• Compliance and regulatory requirements\n"
+                "• Resource allocation and optimization\n\n"
+                "Just describe your issue or concern, and I'll route it to the appropriate specialist agent."
+    ).send()
+
+    # Initialize the orchestrator; it shares the process-wide runtime, so this is cheap. Sessions
+    # asking the same agent the same thing at once share one execution
+    orchestrator = OrchestratorPlugin(flight_scope="dashboard")
+    cl.user_session.set("orchestrator", orchestrator)
+    # Build the session's orchestrator agent off the event loop, before the first question
+    await asyncio.to_thread(orchestrator.get_agent)
+
+def tool_progress():
+    """An on_tool handler that shows each plugin call as a Chainlit step, filled in when it returns."""
+    # Steps still waiting for their result, by call id, so parallel calls to one function stay apart
+    steps = {}
+
+    async def on_tool(event, function, detail, call_id):
+        if event == "call":
+            step = cl.Step(name=function, type="tool")
+            step.input = detail
+            steps[call_id] = step
+            await step.send()
+        elif call_id in steps:
+            step = steps.pop(call_id)
+            step.output = detail
+            await step.update()
+    return on_tool
+
+@cl.on_message
+async def on_message(msg: cl.Message):
+    # Get the orchestrator instance
+    orchestrator = cl.user_session.get("orchestrator")
+    
+    # Show thinking message
+    thinking_msg = await cl.Message(content="?? Analyzing your request...").send()
+    
+    try:
+        # Route the issue to the appropriate agent
+        agent_name = orchestrator.route_issue(msg.content)
+        
+        if agent_name != "unknown":
+            # Update thinking message
+            thinking_msg.content = f"?? Routing to {agent_name} specialist..."
+            await thinking_msg.update()
+            
+            # Stream the agent's tokens into the response as the model produces them
+            response = cl.Message(content=f"?? **{agent_name.title()} Specialist Response:**\n")
+            streamed = []
+
+            async def on_token(token):
+                streamed.append(token)
+                await response.stream_token(token)
+
+            with orchestrator.runtime.streaming(on_token, tool_progress()):
+                result = await orchestrator.execute_agent(agent_name, msg.content)
+            if not streamed:
+                # Rules, errors and empty completions never reach the model stream
+                await response.stream_token(result)
+            await response.send()
+            
+            # Add a separator for clarity
+            await cl.Message(content="---").send()
+        else:
+            # If no specific agent is identified, use the orchestrator's analysis
+            thinking_msg.content = "?? Analyzing with orchestrator..."
+            await thinking_msg.update()
+            
+            # Stream the orchestrator's analysis, continuing this session's thread
+            response = cl.Message(content="")
+            async for chunk in orchestrator.analyze(msg.content, on_tool=tool_progress()):
+                await response.stream_token(str(chunk))
+            await response.send()
+    
+    except Exception as e:
+        await cl.Message(
+            content=f"?? Error: {str(e)}\nPlease try again or rephrase your request."
+        ).send()
+
+@cl.on_chat_end
+async def on_chat_end():
+    # Drop the session's conversation memory; the agents themselves stay warm for other sessions
+    orchestrator = cl.user_session.get("orchestrator")
+    if orchestrator:
+        await orchestrator.close()
@@ -2,36 +2,70 @@ import asyncio
 from typing import Dict, List
 import os
 import sys
+import time
 
 from typing import Annotated
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
 
-from semantic_kernel.agents import ChatCompletionAgent
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+_import_started = time.perf_counter()
+
 from semantic_kernel.functions import kernel_function
 
-# Import specialized agents
-from agents.energy_optimizer_agent import EnergyMonitorPlugin, monitor_energy
-from agents.cooling_manager_agent import CoolingMonitorPlugin, monitor_cooling
-from agents.security_log_agent import SecurityLogPlugin, monitor_security
-from agents.predictive_maintainer_agent import PredictiveMaintainerPlugin, monitor_maintenance
-from agents.compliance_auditor_agent import ComplianceMonitorPlugin, monitor_compliance
-from agents.resource_allocator_agent import ResourceAllocatorPlugin, allocate_resources
+from agents.conversation_memory import ConversationMemory
+from agents.decision_cache import DecisionCache
+from agents.decision_engine import TieredDecisionEngine
+from agents.issue_router import IssueRouter
+from agents.prompt_builder import estimate_tokens, stable_instructions
+from agents.runtime import AGENT_REGISTRY, AgentRuntime, get_runtime, tool_reporter
+from agents.single_flight import normalize_issue
+
+# Specialized agents are imported by the runtime the first time an issue is routed to them
+
+# Fixed cost of importing this module, almost all of it semantic_kernel
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+# The orchestrator's own agent, which triages issues before they are routed
+ORCHESTRATOR_NAME = "DatacenterOrchestrator"
+ORCHESTRATOR_INSTRUCTIONS = """You are an AI orchestrator specialized in datacenter monitoring and management.
+        Your role is to:
+        1. Analyze incoming issues and events
+        2. Determine which specialized agent should handle each issue
+        3. Coordinate between different agents when needed
+        4. Ensure comprehensive monitoring of the datacenter
+        5. Make decisions about agent prioritization and resource allocation
+        
+        When routing issues, consider:
+        - The nature of the problem
+        - The severity of the issue
+        - The current workload of each agent
+        - The interdependencies between different systems
+        - The priority of different monitoring tasks
+        
+        You can route issues to:
+        - Energy Optimizer: For power and efficiency issues
+        - Cooling Manager: For temperature and cooling system issues
+        - Security Sentinel: For security and access control issues
+        - Predictive Maintainer: For maintenance and equipment health issues
+        - Compliance Auditor: For regulatory and compliance issues
+        - Resource Allocator: For resource utilization and allocation issues.
+        
+        IMPORTANT: Make sure to route the issue to the correct agent. Do not make up an agent that is not listed. 
+        If the route_issue function returns "unknown", then decide yourself which agent should handle the issue.
+        """
 
 class OrchestratorPlugin:
     """Plugin for orchestrating different datacenter monitoring agents."""
     
-    def __init__(self):
-        # Initialize all agent plugins
-        self.agents = {
-            "energy": EnergyMonitorPlugin(),
-            "cooling": CoolingMonitorPlugin(),
-            "security": SecurityLogPlugin(),
-            "maintenance": PredictiveMaintainerPlugin(),
-            "compliance": ComplianceMonitorPlugin(),
-            "resource": ResourceAllocatorPlugin()
-        }
+    def __init__(self, runtime: AgentRuntime = None, tiered: bool = False, agent_timeout: float = 60.0,
+                 router: IssueRouter = None, memory: ConversationMemory = None, coalesce: bool = True,
+                 default_agents=(), flight_scope=None):
+        # Share the process-wide client, chat service and warm agents
+        self.runtime = runtime or get_runtime()
+
+        # In tiered mode the rules answer clear-cut readings before any LLM call
+        self.decision_engine = TieredDecisionEngine(self.runtime) if tiered else None
+
+        # Agent plugins (and their data) are created on first use by the runtime
+        self.agents = tuple(AGENT_REGISTRY)
         
         # Define agent responsibilities
         self.agent_responsibilities = {
@@ -43,107 +77,181 @@ class OrchestratorPlugin:
             "resource": "Optimize resource allocation and utilization"
         }
 
+        # Compiled vocabulary (plus a TF-IDF model of the responsibilities) that
+        # scores every agent for an issue in one pass
+        self.router = router or IssueRouter(descriptions=self.agent_responsibilities, use_tfidf=True)
+
+        # Who an issue goes to when no agent clears the router's cutoffs; nobody by default, so a vague
+        # issue ("hello", "check the system status") costs no agent calls and is left to the orchestrator
+        self.default_agents = tuple(default_agents)
+
+        # Seconds each agent gets during a fan-out before it is cancelled
+        self.agent_timeout = agent_timeout
+
+        # Share one run between identical concurrent executions (see AgentRuntime.flights). Runs are
+        # only shared between plugins in the same mode and flight_scope; by default that is this plugin
+        # alone, and orchestrators meant to share (the dashboard's sessions) pass a common scope
+        self.coalesce = coalesce
+        self.flight_scope = ("tiered" if tiered else "direct", object() if flight_scope is None else flight_scope)
+
+        # Built on first use; the memory keeps one conversation's history with it, within a token budget
+        self.orchestrator_agent = None
+        self.memory = memory or ConversationMemory()
+
+    def get_agent(self):
+        """The orchestrator's ChatCompletionAgent, built once and reused for every message."""
+        if self.orchestrator_agent is None:
+            from semantic_kernel.agents import ChatCompletionAgent
+            self.orchestrator_agent = ChatCompletionAgent(
+                service=self.runtime.service,
+                plugins=[self],
+                name=ORCHESTRATOR_NAME,
+                instructions=stable_instructions(ORCHESTRATOR_INSTRUCTIONS),
+            )
+            # Older turns are summarized with the same chat service
+            self.memory.service = self.memory.service or self.runtime.service
+        return self.orchestrator_agent
+
+    async def analyze(self, issue: str, on_tool=None):
+        """Stream the orchestrator's own analysis of an issue, continuing this conversation's thread.
+
+        The history is brought back under its token budget first, so a long
+        session sends about as much per turn as a short one. ``on_tool`` gets
+        the agent's plugin calls as they happen (see AgentRuntime.streaming).
+        """
+        agent = self.get_agent()
+        await self.memory.reduce()
+        prompt_tokens = estimate_tokens(agent.instructions) + self.memory.tokens() + estimate_tokens(issue)
+        completion_tokens = 0
+        try:
+            async for response in agent.invoke_stream(
+                messages=issue,
+                thread=self.memory.thread,
+                on_intermediate_message=tool_reporter(on_tool) if on_tool is not None else None,
+            ):
+                completion_tokens += estimate_tokens(str(response))
+                yield response
+        finally:
+            self.runtime.tokens.record(
+                agent.name, prompt_tokens, completion_tokens,
+                prefix_tokens=estimate_tokens(agent.instructions),
+            )
+
+    async def close(self):
+        await self.memory.clear()
+
     @kernel_function(description="Get the list of available agents and their responsibilities.")
     def get_available_agents(self) -> Dict[str, str]:
         return self.agent_responsibilities
 
     @kernel_function(description="Route an issue to the appropriate agent based on the problem description.")
     def route_issue(self, problem_description: str) -> str:
-        if "power" in problem_description.lower() or "energy" in problem_description.lower():
-            return "energy"
-        elif "temperature" in problem_description.lower() or "cooling" in problem_description.lower():
-            return "cooling"
-        elif "security" in problem_description.lower() or "access" in problem_description.lower():
-            return "security"
-        elif "maintenance" in problem_description.lower() or "equipment" in problem_description.lower():
-            return "maintenance"
-        elif "compliance" in problem_description.lower() or "audit" in problem_description.lower():
-            return "compliance"
-        elif "resource" in problem_description.lower() or "allocation" in problem_description.lower():
-            return "resource"
-        else:
-            return "unknown"
+        # No confident match is left to the orchestrator's own judgement, not the default sweep
+        matches = self.router.rank(problem_description)
+        return matches[0][0] if matches else "unknown"
+
+    @kernel_function(description="Route an issue to every agent whose domain it touches, best match first.")
+    def route_issues(self, problem_description: str) -> List[str]:
+        # Empty when nothing matches (unless default_agents is set), as route_issue answers "unknown"
+        return [name for name, _ in self.router.rank(problem_description)] or list(self.default_agents)
+
+    @kernel_function(description="Score how well each agent matches an issue, with confidences.")
+    def rank_issue(self, problem_description: str) -> List[Dict]:
+        return [
+            {"agent": name, "confidence": round(confidence, 3)}
+            for name, confidence in self.router.rank(problem_description)
+        ]
+
+    @kernel_function(description="Get how many readings the rules answered and how many went to the LLM.")
+    def get_decision_stats(self) -> Dict:
+        if self.decision_engine is None:
+            return {"tiered": False}
+        return {"tiered": True, **self.decision_engine.report()}
+
+    @kernel_function(description="Get how large the conversation history is and how much of it is summarized.")
+    def get_memory_stats(self) -> Dict:
+        return self.memory.report()
+
+    @kernel_function(description="Get the estimated tokens each agent has spent, biggest consumer first.")
+    def get_token_stats(self) -> Dict:
+        return self.runtime.token_report()
+
+    @kernel_function(description="Get how many agent calls the response cache answered.")
+    def get_cache_stats(self) -> Dict:
+        if self.runtime.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.runtime.cache.stats()}
+
+    @kernel_function(description="Get how many agent executions were shared between identical concurrent requests.")
+    def get_coalescing_stats(self) -> Dict:
+        return {"enabled": self.coalesce, **self.runtime.flights.stats()}
 
     @kernel_function(description="Execute the appropriate agent based on the issue.")
     async def execute_agent(self, agent_name: str, issue: str) -> str:
         if agent_name in self.agents:
-            print(f"\n[Orchestrator] Executing {agent_name} agent...")
-            
             try:
-                # Execute the appropriate monitoring function based on agent name
-                if agent_name == "energy":
-                    result = await monitor_energy()
-                    return result
-                elif agent_name == "cooling":
-                    result = await monitor_cooling()
-                    return result
-                elif agent_name == "security":
-                    result = await monitor_security()
-                    return result
-                elif agent_name == "maintenance":
-                    result = await monitor_maintenance()
-                    return result
-                elif agent_name == "compliance":
-                    result = await monitor_compliance()
-                    return result
-                elif agent_name == "resource":
-                    result = await allocate_resources()
-                    return result
+                if self.coalesce:
+                    # Sessions asking the same agent the same thing at once await one run
+                    key = (*self.flight_scope, agent_name, normalize_issue(issue))
+                    return await self.runtime.flights.run(key, lambda: self._run_agent(agent_name))
+                return await self._run_agent(agent_name)
             except Exception as e:
                 return f"Error executing {agent_name} agent: {str(e)}"
         return "No appropriate agent found for this issue."
 
-async def run_orchestrator():
-    # Initialize the environment and client
-    load_dotenv()
-    client = AsyncOpenAI(
-        api_key="", #Use your own token or api key
-        base_url="https://models.inference.ai.azure.com/",
-    )
+    async def _run_agent(self, agent_name: str) -> str:
+        print(f"\n[Orchestrator] Executing {agent_name} agent...")
+        if self.decision_engine is not None:
+            result = await self.decision_engine.evaluate(agent_name)
+            print(f"\n[Orchestrator] Decided by {result['path']} path ({result['severity']})")
+            return result["decision"]
+
+        # Execute the agent's monitoring function, importing its module on first use
+        monitor = self.runtime.get_monitor(agent_name)
+        return await monitor(self.runtime)
+
+    async def _execute_with_timeout(self, agent_name: str, issue: str, timeout: float) -> str:
+        try:
+            return await asyncio.wait_for(self.execute_agent(agent_name, issue), timeout)
+        except asyncio.TimeoutError:
+            return f"Error executing {agent_name} agent: timed out after {timeout} seconds"
 
-    # Create the chat completion service
-    chat_completion_service = OpenAIChatCompletion(
-        ai_model_id="gpt-4o-mini",
-        async_client=client,
-    )
+    @kernel_function(description="Execute several agents concurrently and merge their responses.")
+    async def execute_agents(self, agent_names: List[str], issue: str) -> str:
+        agent_names = list(dict.fromkeys(agent_names))
+        if not agent_names:
+            return "No appropriate agent found for this issue."
+        print(f"\n[Orchestrator] Fanning out to {', '.join(agent_names)}...")
+
+        # Wall-clock time is the slowest agent; cancelling this call cancels every agent
+        results = await asyncio.gather(*(
+            self._execute_with_timeout(name, issue, self.agent_timeout)
+            for name in agent_names
+        ))
+        return "\n\n".join(
+            f"[{name.title()} Agent]\n{result}" for name, result in zip(agent_names, results)
+        )
+
+    @kernel_function(description="Route an issue to every matching agent and run them concurrently.")
+    async def fan_out(self, issue: str) -> str:
+        return await self.execute_agents(self.route_issues(issue), issue)
+
+async def run_orchestrator(tiered: bool = False, cache: bool = False, startup_report: bool = False):
+    # Initialize the shared client and chat service
+    runtime = get_runtime()
+    runtime.timings.setdefault("import:orchestrator", IMPORT_SECONDS)
+    if cache and runtime.cache is None:
+        runtime.cache = DecisionCache()
+
+    # Warm the agent modules while the first issue is being typed
+    runtime.preload()
 
     # Create orchestrator plugin instance
-    orchestrator_plugin = OrchestratorPlugin()
-
-    # Create the orchestrator agent
-    orchestrator_agent = ChatCompletionAgent(
-        service=chat_completion_service,
-        plugins=[orchestrator_plugin],
-        name="DatacenterOrchestrator",
-        instructions="""You are an AI orchestrator specialized in datacenter monitoring and management.
-        Your role is to:
-        1. Analyze incoming issues and events
-        2. Determine which specialized agent should handle each issue
-        3. Coordinate between different agents when needed
-        4. Ensure comprehensive monitoring of the datacenter
-        5. Make decisions about agent prioritization and resource allocation
-        
-        When routing issues, consider:
-        - The nature of the problem
-        - The severity of the issue
-        - The current workload of each agent
-        - The interdependencies between different systems
-        - The priority of different monitoring tasks
-        
-        You can route issues to:
-        - Energy Optimizer: For power and efficiency issues
-        - Cooling Manager: For temperature and cooling system issues
-        - Security Sentinel: For security and access control issues
-        - Predictive Maintainer: For maintenance and equipment health issues
-        - Compliance Auditor: For regulatory and compliance issues
-        - Resource Allocator: For resource utilization and allocation issues.
-        
-        IMPORTANT: Make sure to route the issue to the correct agent. Do not make up an agent that is not listed. 
-        If the route_issue function returns "unknown", then decide yourself which agent should handle the issue.
-        """,
-    )
+    orchestrator_plugin = OrchestratorPlugin(runtime, tiered=tiered)
+
+    # Build the orchestrator's own agent now so the first issue does not pay for it
+    orchestrator_plugin.get_agent()
 
-    thread = None
     try:
         while True:
             # Get input from monitoring systems or user
@@ -154,17 +262,16 @@ async def run_orchestrator():
             print(f"\n[Orchestrator] Analyzing: {user_input}")
 
             # First, get the orchestrator's analysis
-            async for response in orchestrator_agent.invoke_stream(
-                message=user_input,
-                thread=thread
-            ):
-                if thread is None:
-                    thread = response.thread
+            async for response in orchestrator_plugin.analyze(user_input):
                 print(f"{response}", end="", flush=True)
             
-            # Then, route and execute the appropriate agent
-            agent_name = orchestrator_plugin.route_issue(user_input)
-            if agent_name != "unknown":
+            # Then, route and execute the appropriate agents
+            agent_names = orchestrator_plugin.route_issues(user_input)
+            if len(agent_names) > 1:
+                result = await orchestrator_plugin.execute_agents(agent_names, user_input)
+                print(f"\n[Orchestrator] Merged agent responses:\n{result}")
+            elif agent_names:
+                agent_name = agent_names[0]
                 print(f"\n[Orchestrator] Routing to {agent_name} agent...")
                 result = await orchestrator_plugin.execute_agent(agent_name, user_input)
                 print(f"\n[Orchestrator] Agent response: {result}")
@@ -174,8 +281,21 @@ async def run_orchestrator():
     except KeyboardInterrupt:
         print("\n[Orchestrator] Shutting down...")
     finally:
-        if thread:
-            await thread.delete()
+        if tiered:
+            print(f"\n[Orchestrator] Decision paths: {orchestrator_plugin.get_decision_stats()}")
+        if cache:
+            print(f"\n[Orchestrator] Response cache: {orchestrator_plugin.get_cache_stats()}")
+        print(f"\n[Orchestrator] Conversation memory: {orchestrator_plugin.get_memory_stats()}")
+        print(f"\n[Orchestrator] Token spend: {orchestrator_plugin.get_token_stats()}")
+        print(f"\n[Orchestrator] Coalesced executions: {orchestrator_plugin.get_coalescing_stats()}")
+        if startup_report:
+            print(f"\n[Orchestrator] Startup timings (ms): {runtime.startup_report()}")
+        await orchestrator_plugin.close()
+        await runtime.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(run_orchestrator())
\ No newline at end of file
+    asyncio.run(run_orchestrator(
+        tiered="--tiered" in sys.argv,
+        cache="--cache" in sys.argv,
+        startup_report="--startup-report" in sys.argv,
+    ))
\ No newline at end of file
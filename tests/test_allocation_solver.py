@@ -0,0 +1,27 @@
+# tests/test_allocation_solver.py
+import pandas as pd
+import pytest
+
+from agents.allocation_solver import RESOURCES, AllocationSolver, describe_plan
+
+
+@pytest.mark.parametrize("nodes", [pd.DataFrame(columns=RESOURCES + ["cost"]), pd.DataFrame()])
+@pytest.mark.parametrize("exact", [None, True, False])
+def test_empty_fleet_gets_an_empty_plan(nodes, exact):
+    plan = AllocationSolver().solve(nodes, exact=exact)
+    assert plan["method"] == "empty"
+    assert plan["nodes"] == 0
+    assert plan["moves"] == [] and plan["drained"] == []
+    assert plan["cost_before"] == plan["cost_after"] == 0.0
+    assert plan["over_cap_before"] == plan["over_cap_after"] == 0
+    describe_plan(plan)
+
+
+def test_overloaded_node_sheds_to_a_cheaper_one():
+    nodes = pd.DataFrame({
+        "compute_load": [95.0, 20.0], "storage_utilization": [50.0, 10.0],
+        "bandwidth": [100.0, 10.0], "cost": [1.0, 0.5],
+    })
+    plan = AllocationSolver(consolidate=False).solve(nodes, exact=False)
+    assert plan["over_cap_before"] == 1
+    assert plan["over_cap_after"] == 0
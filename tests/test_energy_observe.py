@@ -0,0 +1,20 @@
+# tests/test_energy_observe.py
+from agents.energy_optimizer_agent import EnergyMonitorPlugin
+
+
+def test_readings_without_timestamps_are_folded_in_once():
+    plugin = EnergyMonitorPlugin()
+    readings = [{"energy_usage": usage} for usage in (50.0, 52.0, 51.0, 90.0)]
+    plugin.analyze_batch(readings)
+    for reading in readings:
+        plugin.assess_reading(reading)
+        plugin.is_borderline(reading)
+        plugin.prompt_context(reading)
+    assert plugin.stats.snapshot("main")["count"] == len(readings)
+
+
+def test_equal_readings_without_timestamps_are_still_separate_readings():
+    plugin = EnergyMonitorPlugin()
+    plugin.observe({"energy_usage": 50.0})
+    plugin.observe({"energy_usage": 50.0})
+    assert plugin.stats.snapshot("main")["count"] == 2
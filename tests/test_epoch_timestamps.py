@@ -0,0 +1,40 @@
+# tests/test_epoch_timestamps.py
+import time
+
+import numpy as np
+import pandas as pd
+
+from agents.compliance_auditor_agent import ComplianceMonitorPlugin
+from agents.energy_optimizer_agent import EnergyMonitorPlugin
+from agents.readings import epoch_seconds
+
+
+def test_epoch_seconds_keeps_numbers_and_parses_text():
+    now = time.time()
+    seconds = epoch_seconds([now, "1970-01-01 00:01:00", None, "not a time"])
+    assert seconds[0] == now
+    assert seconds[1] == 60.0
+    assert np.isnan(seconds[2:]).all()
+    assert epoch_seconds(pd.Series([now]))[0] == now
+
+
+def test_compliance_rolls_float_timestamps_into_their_year():
+    plugin = ComplianceMonitorPlugin()
+    reading = {
+        "energy_kwh": 1000.0, "carbon_emission": 2.0, "renewable_percent": 60.0,
+        "policy_target": 50.0, "anomaly": None, "timestamp": time.time(),
+    }
+    plugin.analyze_batch([reading])
+    plugin.assess_reading(dict(reading))
+    assert plugin.rollups.year_to_date()["readings"] == 2
+    assert plugin.rollups.quarter_to_date()["readings"] == 2
+
+
+def test_energy_scores_float_timestamps_as_seconds():
+    plugin = EnergyMonitorPlugin()
+    start = time.time()
+    readings = pd.DataFrame({"energy_usage": [50.0, 56.0], "timestamp": [start, start + 60.0]})
+    scores = plugin.observe_batch(readings)
+    # 6 units over 60 seconds
+    assert scores["rate"].iloc[1] == 0.1
+    assert plugin.stats.last_time[plugin.stats.slots(["main"])[0]] == start + 60.0
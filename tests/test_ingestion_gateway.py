@@ -0,0 +1,24 @@
+# tests/test_ingestion_gateway.py
+import asyncio
+import json
+
+from utils.ingestion_gateway import IngestionGateway
+
+
+def test_over_long_line_is_rejected_and_the_connection_carries_on():
+    async def run():
+        gateway = await IngestionGateway(domains=["energy"], log_decisions=False).start(port=0)
+        port = gateway._servers[0].sockets[0].getsockname()[1]
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        line = json.dumps({"type": "energy", "energy_usage": 50.0}).encode() + b"\n"
+        too_long = json.dumps({"type": "energy", "energy_usage": 50.0, "note": "x" * 200_000}).encode() + b"\n"
+        writer.write(line + too_long + line)
+        await writer.drain()
+        writer.close()
+        await asyncio.sleep(0.3)
+        await gateway.stop()
+        return gateway.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics["rejected"] == 1
+    assert metrics["types"]["energy"]["processed"] == 2
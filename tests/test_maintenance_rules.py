@@ -0,0 +1,17 @@
+# tests/test_maintenance_rules.py
+import pytest
+
+from agents.predictive_maintainer_agent import PredictiveMaintainerPlugin
+
+
+@pytest.mark.parametrize("failure_history, failed", [
+    ("No", False), ("0", False), (None, False), ("nan", False), ("Yes", True), (2, True),
+])
+def test_failure_history_agrees_across_paths(failure_history, failed):
+    plugin = PredictiveMaintainerPlugin()
+    reading = {"component": "fan", "uptime_hours": 10, "spikes": 1, "last_maintenance": 1,
+               "failure_history": failure_history}
+    expected = "critical" if failed else "normal"
+    assert plugin.analyze_batch([reading])["severity"].iloc[0] == expected
+    assert plugin.assess_reading(reading)[0] == expected
+    assert plugin.analyze_reading(reading).startswith(" Past Failure") is failed
@@ -1,83 +1,104 @@
-# utils/data_streamer.py
-
-import random
-import pandas as pd
-import time
-from agents.energy_optimizer_agent import EnergyOptimizerAgent
-from agents.cooling_manager_agent import CoolingManagerAgent
-from agents.security_sentinel_agent import SecuritySentinelAgent
-from agents.predictive_maintainer_agent import PredictiveMaintainerAgent
-from agents.compliance_auditor_agent import ComplianceAuditorAgent
-from agents.resource_allocator_agent import ResourceAllocatorAgent
-from utils.logger import log_decision
-
-# Simulated CSV paths (adjust as needed)
-AGENT_CONFIG = {
-    "energy": {
-        "agent": EnergyOptimizerAgent(),
-        "csv": "mock_data/energy_data.csv"
-    },
-    "cooling": {
-        "agent": CoolingManagerAgent(),
-        "csv": "mock_data/cooling_data.csv"
-    },
-    "security": {
-        "agent": SecuritySentinelAgent(),
-        "csv": "mock_data/security_log_data.csv"
-    },
-    "maintenance": {
-        "agent": PredictiveMaintainerAgent(),
-        "csv": "mock_data/maintenance_data.csv"
-    },
-    "compliance": {
-        "agent": ComplianceAuditorAgent(),
-        "csv": "mock_data/compliance_data.csv"
-    },
-    "resource": {
-        "agent": ResourceAllocatorAgent(),
-        "csv": "mock_data/resource_data.csv"
-    }
-}
-
-def stream_agent(agent_type):
-    config = AGENT_CONFIG.get(agent_type)
-    if not config:
-        print(f"? Unknown agent type: {agent_type}")
-        return
-
-    agent = config["agent"]
-    df = pd.read_csv(config["csv"])
-
-    print(f"\n?? Streaming data to {agent.name}...\n")
-    for _, row in df.iterrows():
-        data = row.to_dict()
-        decision = agent.act(data)
-        print(f"?? {agent_type.upper()} Input: {data}")
-        print(f"?? Decision: {decision}\n")
-        log_decision(agent.name, data, decision)
-        time.sleep(2)
-
-if __name__ == "__main__":
-    print("Choose an agent to stream:")
-    print("1. Energy Optimizer")
-    print("2. Cooling Manager")
-    print("3. Security Sentinel")
-    print("4. Predictive Maintainer")
-    print("5. Compliance Auditor")
-    print("6. Resource Allocator")
-
-    choice_map = {
-        "1": "energy",
-        "2": "cooling",
-        "3": "security",
-        "4": "maintenance",
-        "5": "compliance",
-        "6": "resource"
-    }
-
-    choice = input("Enter your choice (1-6): ")
-    agent_key = choice_map.get(choice)
-    if agent_key:
-        stream_agent(agent_key)
-    else:
+# utils/data_streamer.py
+
+import asyncio
+import pandas as pd
+import time
+import sys
+import os
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.decision_engine import TieredDecisionEngine
+from agents.runtime import AGENT_REGISTRY, get_runtime
+from utils.logger import log_decision
+from utils.reading_stream import ReadingStream
+from utils.stream_pipeline import StreamPipeline
+
+def _decide_chunk(plugin, agent_type, chunk, engine=None, loop=None) -> pd.DataFrame:
+    # Rules only, or rules first with the borderline readings escalated by the engine
+    if engine is None:
+        return plugin.analyze_batch(chunk)
+    results = loop.run_until_complete(engine.evaluate_batch(agent_type, chunk.to_dict("records")))
+    return pd.DataFrame(results, index=chunk.index)[["decision", "severity", "path"]]
+
+def stream_agent(agent_type, delay=2, engine=None):
+    """Replay one domain's telemetry at stream pace; ``engine`` (a TieredDecisionEngine) escalates borderline readings."""
+    if agent_type not in AGENT_REGISTRY:
+        print(f"? Unknown agent type: {agent_type}")
+        return
+
+    # The agent's name and telemetry path come from its module, via the shared runtime
+    runtime = get_runtime()
+    plugin = runtime.get_plugin(agent_type)
+    agent_name = runtime.get_agent_name(agent_type)
+    stream = ReadingStream(runtime.get_data_path(agent_type), dtypes=plugin.stream.dtypes, store=plugin.stream.store)
+    # One loop for the whole stream, so the engine's pooled client stays usable between chunks
+    loop = asyncio.new_event_loop() if engine is not None else None
+
+    print(f"\n?? Streaming data to {agent_name}...\n")
+    try:
+        for chunk in stream.chunks():
+            # Decide a chunk in one vectorized pass, then replay at stream pace
+            decisions = _decide_chunk(plugin, agent_type, chunk, engine, loop)["decision"]
+            for data, decision in zip(chunk.to_dict("records"), decisions):
+                print(f"?? {agent_type.upper()} Input: {data}")
+                print(f"?? Decision: {decision}\n")
+                log_decision(agent_name, data, decision)
+                time.sleep(delay)
+    finally:
+        if loop is not None:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+def backfill(agent_type, csv_path=None, chunksize=1_000_000, offset=0, engine=None):
+    """Decide a whole telemetry export chunk by chunk, without throttling.
+
+    Rules only by default; with ``engine`` the borderline readings go to the
+    agent as well and the result has a ``path`` column instead of ``borderline``.
+    """
+    runtime = get_runtime()
+    plugin = runtime.get_plugin(agent_type)
+    stream = ReadingStream(csv_path or runtime.get_data_path(agent_type), dtypes=plugin.stream.dtypes,
+                           chunksize=chunksize, offset=offset)
+    loop = asyncio.new_event_loop() if engine is not None else None
+    try:
+        results = [_decide_chunk(plugin, agent_type, chunk, engine, loop) for chunk in stream.chunks()]
+    finally:
+        if loop is not None:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+    columns = ["decision", "severity", "path" if engine is not None else "borderline"]
+    return pd.concat(results) if results else pd.DataFrame(columns=columns)
+
+if __name__ == "__main__":
+    print("Choose an agent to stream:")
+    print("1. Energy Optimizer")
+    print("2. Cooling Manager")
+    print("3. Security Sentinel")
+    print("4. Predictive Maintainer")
+    print("5. Compliance Auditor")
+    print("6. Resource Allocator")
+    print("7. All agents at once (async pipeline)")
+
+    choice_map = {
+        "1": "energy",
+        "2": "cooling",
+        "3": "security",
+        "4": "maintenance",
+        "5": "compliance",
+        "6": "resource"
+    }
+
+    # --tiered sends borderline readings to the LLM agents instead of deciding everything by rules
+    engine = TieredDecisionEngine() if "--tiered" in sys.argv else None
+
+    choice = input("Enter your choice (1-7): ")
+    agent_key = choice_map.get(choice)
+    if agent_key:
+        stream_agent(agent_key, engine=engine)
+    elif choice == "7":
+        rate = input("Readings per second per agent (blank for no throttling): ").strip()
+        pipeline = StreamPipeline(rate=float(rate) if rate else None, engine=engine)
+        print(f"?? Stage throughput: {asyncio.run(pipeline.run())}")
+    else:
         print("? Invalid choice.")
\ No newline at end of file
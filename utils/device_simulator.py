@@ -1,96 +1,332 @@
-# mock_data/device_simulator.py
-
-import time
-import random
-import json
-from azure.iot.device import IoTHubDeviceClient, Message
-
-# Load device connection string from environment (set in .env)
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-CONNECTION_STRING = os.getenv("IOTHUB_DEVICE_CONNECTION_STRING")
-DEVICE_NAME = os.getenv("DEVICE_NAME", "sentinelgreen-energy-sensor")
-
-client = IoTHubDeviceClient.create_from_connection_string(CONNECTION_STRING)
-
-def simulate_energy_data():
-    return {
-        "type": "energy",
-        "timestamp": time.time(),
-        "usage_kw": random.randint(50, 100),
-        "voltage": random.randint(210, 250),
-        "load_percent": random.randint(60, 100)
-    }
-
-def simulate_cooling_data():
-    return {
-        "type": "cooling",
-        "temperature": random.randint(22, 35),
-        "humidity": random.randint(30, 60),
-        "rack_load": random.randint(50, 95)
-    }
-
-def simulate_security_data():
-    return {
-        "type": "security",
-        "access_time": f"{random.randint(0,23):02}:{random.randint(0,59):02}",
-        "user_role": random.choice(["Technician", "Guest", "Admin", "Unknown"]),
-        "location": random.choice(["Server Room", "Lobby", "Control Room"]),
-        "method": random.choice(["Keycard", "QR", "Biometrics", "Unknown"]),
-        "failed_attempts": random.randint(0, 5),
-        "alerts": random.choice(["None", "Suspicious badge ID", "Repeated failures"])
-    }
-
-def simulate_maintenance_data():
-    return {
-        "type": "maintenance",
-        "component": random.choice(["CPU Rack 12", "Cooling Pump A", "Power Unit 7"]),
-        "uptime_hours": random.randint(2000, 20000),
-        "spikes": random.randint(0, 5),
-        "last_maintenance": random.randint(10, 180),
-        "failure_history": random.choice(["Yes", "No"])
-    }
-
-def simulate_compliance_data():
-    return {
-        "type": "compliance",
-        "energy_kwh": random.randint(90000, 200000),
-        "carbon_emission": random.randint(25, 80),
-        "renewable_percent": random.randint(30, 75),
-        "policy_target": random.choice([50, 60]),
-        "anomaly": random.choice(["None", "Overuse spike", "Emissions breach"])
-    }
-
-def simulate_resource_data():
-    return {
-        "type": "resource",
-        "compute_load": random.randint(40, 95),
-        "storage_utilization": random.randint(30, 90),
-        "bandwidth": random.randint(100, 800),
-        "cost": round(random.uniform(0.05, 0.25), 2),
-        "status": random.choice(["Stable", "Overloaded", "Underutilized", "Balanced"])
-    }
-
-def send_message(payload):
-    message = Message(json.dumps(payload))
-    message.content_encoding = "utf-8"
-    message.content_type = "application/json"
-    print(f"?? Sending {payload['type']} data: {payload}")
-    client.send_message(message)
-
-if __name__ == "__main__":
-    print(f"?? Starting IoT simulation for all agents using device: {DEVICE_NAME}")
-
-    try:
-        while True:
-            send_message(simulate_energy_data())
-            send_message(simulate_cooling_data())
-            send_message(simulate_security_data())
-            send_message(simulate_maintenance_data())
-            send_message(simulate_compliance_data())
-            send_message(simulate_resource_data())
-            time.sleep(10)  # Simulate data every 10 seconds
-    except KeyboardInterrupt:
+# mock_data/device_simulator.py
+
+import asyncio
+import time
+import random
+import json
+import sys
+from collections import Counter
+
+# Load device connection string from environment (set in .env)
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+CONNECTION_STRING = os.getenv("IOTHUB_DEVICE_CONNECTION_STRING")
+DEVICE_NAME = os.getenv("DEVICE_NAME", "sentinelgreen-energy-sensor")
+
+_client = None
+
+def get_client():
+    """The IoT Hub client, connected on first use so offline runs never need Azure."""
+    global _client
+    if _client is None:
+        from azure.iot.device import IoTHubDeviceClient
+        _client = IoTHubDeviceClient.create_from_connection_string(CONNECTION_STRING)
+    return _client
+
+def simulate_energy_data():
+    return {
+        "type": "energy",
+        "timestamp": time.time(),
+        "usage_kw": random.randint(50, 100),
+        "voltage": random.randint(210, 250),
+        "load_percent": random.randint(60, 100)
+    }
+
+def simulate_cooling_data():
+    return {
+        "type": "cooling",
+        "temperature": random.randint(22, 35),
+        "humidity": random.randint(30, 60),
+        "rack_load": random.randint(50, 95)
+    }
+
+def simulate_security_data():
+    return {
+        "type": "security",
+        "access_time": f"{random.randint(0,23):02}:{random.randint(0,59):02}",
+        "user_role": random.choice(["Technician", "Guest", "Admin", "Unknown"]),
+        "location": random.choice(["Server Room", "Lobby", "Control Room"]),
+        "method": random.choice(["Keycard", "QR", "Biometrics", "Unknown"]),
+        "failed_attempts": random.randint(0, 5),
+        "alerts": random.choice(["None", "Suspicious badge ID", "Repeated failures"])
+    }
+
+def simulate_maintenance_data():
+    return {
+        "type": "maintenance",
+        "component": random.choice(["CPU Rack 12", "Cooling Pump A", "Power Unit 7"]),
+        "uptime_hours": random.randint(2000, 20000),
+        "spikes": random.randint(0, 5),
+        "last_maintenance": random.randint(10, 180),
+        "failure_history": random.choice(["Yes", "No"])
+    }
+
+def simulate_compliance_data():
+    return {
+        "type": "compliance",
+        "energy_kwh": random.randint(90000, 200000),
+        "carbon_emission": random.randint(25, 80),
+        "renewable_percent": random.randint(30, 75),
+        "policy_target": random.choice([50, 60]),
+        "anomaly": random.choice(["None", "Overuse spike", "Emissions breach"])
+    }
+
+def simulate_resource_data():
+    return {
+        "type": "resource",
+        "compute_load": random.randint(40, 95),
+        "storage_utilization": random.randint(30, 90),
+        "bandwidth": random.randint(100, 800),
+        "cost": round(random.uniform(0.05, 0.25), 2),
+        "status": random.choice(["Stable", "Overloaded", "Underutilized", "Balanced"])
+    }
+
+def _message(payload):
+    from azure.iot.device import Message
+    message = Message(json.dumps(payload))
+    message.content_encoding = "utf-8"
+    message.content_type = "application/json"
+    return message
+
+def send_message(payload):
+    print(f"?? Sending {payload['type']} data: {payload}")
+    get_client().send_message(_message(payload))
+
+SIMULATORS = {
+    "energy": simulate_energy_data,
+    "cooling": simulate_cooling_data,
+    "security": simulate_security_data,
+    "maintenance": simulate_maintenance_data,
+    "compliance": simulate_compliance_data,
+    "resource": simulate_resource_data,
+}
+
+
+class QueueSink:
+    """In-process stand-in for IoT Hub: batches land on an asyncio queue for a consumer to drain.
+
+    With ``maxsize`` set, a consumer that falls behind slows the generator
+    down instead of letting batches pile up in memory.
+    """
+
+    def __init__(self, maxsize=0):
+        self.queue = asyncio.Queue(maxsize)
+
+    async def send(self, batch):
+        await self.queue.put(batch)
+
+    async def close(self):
+        pass
+
+
+class FileSink:
+    """Appends messages to a file as JSON lines, a batch per write, off the event loop."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    async def send(self, batch):
+        lines = "".join(json.dumps(payload) + "\n" for payload in batch)
+        await asyncio.to_thread(self._file.write, lines)
+
+    async def close(self):
+        await asyncio.to_thread(self._file.close)
+
+
+class SocketSink:
+    """Streams messages as JSON lines over TCP to an ingestion endpoint."""
+
+    def __init__(self, host="127.0.0.1", port=9000):
+        self.host = host
+        self.port = port
+        self._writer = None
+
+    async def send(self, batch):
+        if self._writer is None:
+            _, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write("".join(json.dumps(payload) + "\n" for payload in batch).encode("utf-8"))
+        # Waits only when the socket buffer is full, which is the backpressure we want
+        await self._writer.drain()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+class IoTHubSink:
+    """Sends each batch to IoT Hub through the shared device client, off the event loop."""
+
+    async def send(self, batch):
+        client = get_client()
+        await asyncio.to_thread(lambda: [client.send_message(_message(payload)) for payload in batch])
+
+    async def close(self):
+        pass
+
+
+class LoadGenerator:
+    """Simulates a fleet of virtual devices sending telemetry at a configurable rate.
+
+    Each of ``devices`` devices sends ``rate`` messages per second on
+    average, with a domain drawn from ``mix`` (weights per SIMULATORS key,
+    all equal by default). Arrivals per tick follow ``distribution``:
+    "constant" paces them evenly, "poisson" draws independent arrivals, and
+    "burst" sends ``burst_factor`` times the rate for one tick in
+    ``burst_factor`` and nothing in between. Messages are batched
+    ``batch_size`` at a time and up to ``concurrency`` batches are in flight
+    at once, so a slow sink slows the generator rather than the clock.
+    """
+
+    def __init__(self, devices=1000, rate=1.0, sink=None, mix=None, distribution="poisson",
+                 batch_size=500, concurrency=4, tick=0.1, burst_factor=10, seed=None):
+        if distribution not in ("constant", "poisson", "burst"):
+            raise ValueError(f"Unknown distribution: {distribution}")
+        self.devices = devices
+        self.rate = rate
+        self.sink = sink or QueueSink()
+        mix = mix or dict.fromkeys(SIMULATORS, 1.0)
+        self.domains = list(mix)
+        self.weights = [mix[domain] for domain in self.domains]
+        self.distribution = distribution
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.tick = tick
+        self.burst_factor = burst_factor
+        self.random = random.Random(seed)
+
+        self.sent = 0
+        self.batches = 0
+        self.by_type = Counter()
+
+    @property
+    def target_rate(self) -> float:
+        """Messages per second the whole fleet aims for."""
+        return self.devices * self.rate
+
+    def _arrivals(self, tick_index, carry):
+        expected = self.target_rate * self.tick
+        if self.distribution == "poisson":
+            # Sum of exponential gaps within the tick; fine for thousands per tick
+            count, elapsed = 0, self.random.expovariate(expected) if expected > 0 else 1.0
+            while elapsed < 1.0:
+                count += 1
+                elapsed += self.random.expovariate(expected)
+            return count, carry
+        if self.distribution == "burst":
+            expected = expected * self.burst_factor if tick_index % self.burst_factor == 0 else 0.0
+        # Carry the fraction over so low rates still send on average
+        carry += expected
+        count = int(carry)
+        return count, carry - count
+
+    def payloads(self, count):
+        """``count`` simulated messages, each from a random device and domain."""
+        domains = self.random.choices(self.domains, self.weights, k=count)
+        now = time.time()
+        batch = []
+        for domain in domains:
+            payload = SIMULATORS[domain]()
+            payload["device_id"] = f"{DEVICE_NAME}-{self.random.randrange(self.devices)}"
+            payload.setdefault("timestamp", now)
+            batch.append(payload)
+        return batch
+
+    async def _send(self, batch, slots):
+        try:
+            await self.sink.send(batch)
+            self.sent += len(batch)
+            self.batches += 1
+            self.by_type.update(payload["type"] for payload in batch)
+        finally:
+            slots.release()
+
+    async def run(self, duration=10.0) -> dict:
+        """Generate for ``duration`` seconds, then wait for the sink; returns the achieved rate."""
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        pending, carry, tick_index = [], 0.0, 0
+        start = time.perf_counter()
+        next_tick = start
+
+        while True:
+            if time.perf_counter() - start >= duration:
+                break
+            count, carry = self._arrivals(tick_index, carry)
+            pending.extend(self.payloads(count))
+            while len(pending) >= self.batch_size:
+                await self._dispatch(pending[:self.batch_size], slots, in_flight)
+                del pending[:self.batch_size]
+            tick_index += 1
+            next_tick += self.tick
+            # Sleep out the rest of the tick; a generator that falls behind just stops sleeping
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+        if pending:
+            await self._dispatch(pending, slots, in_flight)
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - start
+        await self.sink.close()
+        return self.report(elapsed)
+
+    async def _dispatch(self, batch, slots, in_flight):
+        await slots.acquire()
+        task = asyncio.create_task(self._send(batch, slots))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    def report(self, elapsed) -> dict:
+        return {
+            "devices": self.devices,
+            "distribution": self.distribution,
+            "sent": self.sent,
+            "batches": self.batches,
+            "elapsed_s": round(elapsed, 3),
+            "target_per_s": round(self.target_rate, 1),
+            "messages_per_s": round(self.sent / elapsed, 1) if elapsed > 0 else 0.0,
+            "by_type": dict(self.by_type),
+        }
+
+def load_test(argv):
+    """``--load [devices] [rate] [seconds] [file]``: generate offline, to a file or an in-process queue."""
+    devices, rate, duration = (int(argv[0]) if argv else 1000), (float(argv[1]) if len(argv) > 1 else 1.0), \
+        (float(argv[2]) if len(argv) > 2 else 10.0)
+    sink = FileSink(argv[3]) if len(argv) > 3 else QueueSink()
+
+    async def drain(queue):
+        while True:
+            await queue.get()
+
+    async def main():
+        generator = LoadGenerator(devices, rate, sink=sink)
+        consumer = asyncio.create_task(drain(sink.queue)) if isinstance(sink, QueueSink) else None
+        report = await generator.run(duration)
+        if consumer:
+            consumer.cancel()
+        return report
+
+    print(f"?? Load test: {devices} devices at {rate} msg/s each for {duration:g} s")
+    print(f"?? Achieved: {asyncio.run(main())}")
+
+if __name__ == "__main__":
+    if "--load" in sys.argv:
+        load_test(sys.argv[sys.argv.index("--load") + 1:])
+        sys.exit()
+
+    print(f"?? Starting IoT simulation for all agents using device: {DEVICE_NAME}")
+
+    try:
+        while True:
+            send_message(simulate_energy_data())
+            send_message(simulate_cooling_data())
+            send_message(simulate_security_data())
+            send_message(simulate_maintenance_data())
+            send_message(simulate_compliance_data())
+            send_message(simulate_resource_data())
+            time.sleep(10)  # Simulate data every 10 seconds
+    except KeyboardInterrupt:
         print("? Stopping simulation.")
\ No newline at end of file
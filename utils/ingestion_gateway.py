@@ -0,0 +1,308 @@
+# utils/ingestion_gateway.py
+
+import asyncio
+import json
+import sys
+import time
+import os
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from agents.runtime import AGENT_REGISTRY, get_runtime
+from utils.logger import log_decision, logger
+
+try:
+    # orjson decodes several times faster; the standard library is the fallback
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+# Device payload fields that go by another name in the plugins' telemetry
+FIELD_ALIASES = {
+    "energy": {"usage_kw": "energy_usage", "device_id": "feed_id"},
+}
+
+# Marks the end of a type's stream on its queue
+_DONE = object()
+
+
+class TypeStats:
+    """Messages received and analyzed, and how long they waited, for one message type."""
+
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.batches = 0
+        # Messages in batches whose analysis or logging raised
+        self.failed = 0
+        self.failed_batches = 0
+        self.busy = 0.0
+        self.max_queue_depth = 0
+        self.lag_total = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def record(self, size, lags, busy):
+        self.processed += size
+        self.batches += 1
+        self.busy += busy
+        self.lag_total += sum(lags)
+        self.last_lag = lags[-1]
+        self.max_lag = max(self.max_lag, max(lags))
+
+    def report(self, queue_depth) -> dict:
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "failed_batches": self.failed_batches,
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "mean_batch": round(self.processed / self.batches, 1) if self.batches else 0.0,
+            "lag_ms": round(self.last_lag * 1000, 2),
+            "mean_lag_ms": round(self.lag_total / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "busy_s": round(self.busy, 4),
+        }
+
+
+class IngestionGateway:
+    """Live entry point for device messages, dispatched to the plugins by their ``type``.
+
+    Messages arrive as JSON lines over TCP (the format SocketSink in
+    device_simulator writes) or as a JSON array or JSON lines POSTed to
+    ``/ingest`` over HTTP. Each type has its own bounded queue and batcher:
+    a batch closes at ``max_batch`` messages or ``max_wait`` seconds after
+    its first one, whichever comes first, and goes through the plugin's
+    vectorized ``analyze_batch``. Lag is the time from a message arriving
+    to its batch being decided.
+
+    Messages without a field the plugin's rules need (its REQUIRED_FIELDS)
+    are rejected on arrival, as are TCP lines longer than the stream
+    reader's limit; the connection carries on from the next line. A batch that still fails is logged and counted
+    and its batcher moves on to the next one.
+    """
+
+    def __init__(self, runtime=None, domains=None, max_batch=500, max_wait=0.05,
+                 queue_size=10000, log_decisions=True, on_batch=None):
+        self.runtime = runtime or get_runtime()
+        self.domains = list(domains or AGENT_REGISTRY)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+        self.log_decisions = log_decisions
+        # Called with (domain, frame, decisions) after every batch
+        self.on_batch = on_batch
+
+        self.queues = {}
+        self.stats = {domain: TypeStats() for domain in self.domains}
+        self.rejected = 0
+        self.decode_errors = 0
+        # domain -> for each required field, the payload names it may arrive under
+        self._required = {}
+        self._batchers = []
+        self._servers = []
+        self._http = None
+
+    async def start(self, host="127.0.0.1", port=9000, http_port=None):
+        """Start the batchers and listen for JSON lines on ``port`` and, with ``http_port``, HTTP."""
+        # Build the plugins before the first message so its lag is not an import
+        await asyncio.to_thread(lambda: [self.runtime.get_plugin(domain) for domain in self.domains])
+        for domain in self.domains:
+            aliases = FIELD_ALIASES.get(domain, {})
+            self._required[domain] = [
+                {field, *(alias for alias, target in aliases.items() if target == field)}
+                for field in self.runtime.get_required_fields(domain)
+            ]
+        self.queues = {domain: asyncio.Queue(self.queue_size) for domain in self.domains}
+        self._batchers = [asyncio.create_task(self._batch(domain)) for domain in self.domains]
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self._handle_stream, host, port))
+        if http_port is not None:
+            await self._start_http(host, http_port)
+        return self
+
+    async def stop(self):
+        """Stop listening, then drain what is already queued before returning."""
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._http is not None:
+            await self._http.cleanup()
+            self._http = None
+        for queue in self.queues.values():
+            await queue.put(_DONE)
+        # Batchers survive failed batches, so anything raised here is unexpected; report it rather than re-raise
+        for domain, result in zip(self.domains, await asyncio.gather(*self._batchers, return_exceptions=True)):
+            if isinstance(result, BaseException):
+                logger.error("Batcher for %s stopped with an error", domain, exc_info=result)
+        self._batchers = []
+
+    async def ingest(self, payload: dict):
+        """Queue one decoded message; waits while its type's queue is full."""
+        domain = payload.get("type") if isinstance(payload, dict) else None
+        queue = self.queues.get(domain)
+        if queue is None or any(names.isdisjoint(payload) for names in self._required.get(domain, ())):
+            self.rejected += 1
+            return
+        await queue.put((time.perf_counter(), payload))
+        stats = self.stats[domain]
+        stats.received += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize())
+
+    async def ingest_line(self, line: bytes):
+        if not line.strip():
+            return
+        try:
+            payload = _loads(line)
+        except ValueError:
+            self.decode_errors += 1
+            return
+        await self.ingest(payload)
+
+    async def _handle_stream(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    # The connection closed; its last line may lack the newline
+                    await self.ingest_line(e.partial)
+                    break
+                except asyncio.LimitOverrunError:
+                    self.rejected += 1
+                    await self._skip_line(reader)
+                    continue
+                await self.ingest_line(line)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _skip_line(reader):
+        # Discard the rest of an over-long line, a limit's worth at a time, through its newline
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+            except asyncio.IncompleteReadError:
+                return
+
+    async def _start_http(self, host, port):
+        # aiohttp comes with semantic-kernel; only the HTTP endpoint needs it
+        from aiohttp import web
+
+        async def ingest(request):
+            body = await request.read()
+            if body.lstrip().startswith(b"["):
+                try:
+                    payloads = _loads(body)
+                except ValueError:
+                    self.decode_errors += 1
+                    return web.json_response({"error": "invalid JSON"}, status=400)
+                for payload in payloads:
+                    await self.ingest(payload)
+            else:
+                for line in body.splitlines():
+                    await self.ingest_line(line)
+            return web.json_response({"accepted": True}, status=202)
+
+        async def metrics(request):
+            return web.json_response(self.metrics())
+
+        app = web.Application()
+        app.router.add_post("/ingest", ingest)
+        app.router.add_get("/metrics", metrics)
+        self._http = web.AppRunner(app)
+        await self._http.setup()
+        await web.TCPSite(self._http, host, port).start()
+
+    async def _batch(self, domain):
+        queue = self.queues[domain]
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            batch = []
+            item = await queue.get()
+            deadline = loop.time() + self.max_wait
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                if queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = queue.get_nowait()
+            if batch:
+                try:
+                    await self._dispatch(domain, batch)
+                except Exception:
+                    logger.exception("Could not analyze a batch of %d %s messages", len(batch), domain)
+                    stats = self.stats[domain]
+                    stats.failed += len(batch)
+                    stats.failed_batches += 1
+
+    async def _dispatch(self, domain, batch):
+        plugin = self.runtime.get_plugin(domain)
+        frame = pd.DataFrame([payload for _, payload in batch])
+        frame = frame.rename(columns=FIELD_ALIASES.get(domain, {}))
+        start = time.perf_counter()
+        # On the event loop, like the plugins' other paths, so a batch never updates their state
+        # (rolling statistics, windows, fleet) while a reading is being scored; it is vectorized and brief
+        decisions = plugin.analyze_batch(frame)["decision"]
+        finished = time.perf_counter()
+        self.stats[domain].record(len(batch), [finished - received for received, _ in batch], finished - start)
+
+        if self.log_decisions:
+            agent_name = self.runtime.get_agent_name(domain)
+            for (_, payload), decision in zip(batch, decisions):
+                # log_decision only enqueues; the sink's thread does the file I/O
+                log_decision(agent_name, payload, decision)
+        if self.on_batch is not None:
+            self.on_batch(domain, frame, decisions)
+
+    def metrics(self) -> dict:
+        """Per-type counts, queue depth and lag, plus messages that could not be routed."""
+        return {
+            "types": {
+                domain: stats.report(self.queues[domain].qsize() if domain in self.queues else 0)
+                for domain, stats in self.stats.items()
+            },
+            "rejected": self.rejected,
+            "decode_errors": self.decode_errors,
+        }
+
+
+async def serve(port=9000, http_port=None, report_every=5.0):
+    gateway = await IngestionGateway().start(port=port, http_port=http_port)
+    print(f"?? Ingestion gateway listening on tcp://127.0.0.1:{port}"
+          + (f" and http://127.0.0.1:{http_port}/ingest" if http_port else ""))
+    try:
+        while True:
+            await asyncio.sleep(report_every)
+            print(f"?? {json.dumps(gateway.metrics())}")
+    finally:
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9000
+    http_port = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    try:
+        asyncio.run(serve(port, http_port))
+    except KeyboardInterrupt:
+        print("? Stopping gateway.")
@@ -1,26 +1,196 @@
-# utils/logger.py
-
-import logging
-import os
-from datetime import datetime
-
-# Create logs directory if it doesn't exist
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Log file name with timestamp
-log_filename = os.path.join(LOG_DIR, f"sentinelgreen_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-# Configure logger
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s  %(name)s  %(levelname)s  %(message)s",
-    filemode='w'
-)
-
-# Global logger instance
-logger = logging.getLogger("SentinelGreenLogger")
-
-def log_decision(agent_name: str, input_data: dict, decision: str):
-    logger.info(f"[{agent_name}] Input: {input_data} ? Decision: {decision}")
\ No newline at end of file
+# utils/logger.py
+
+import atexit
+import gzip
+import json
+import logging
+import math
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# Decision logs go here; the directory is created when the first record is written
+LOG_DIR = "logs"
+
+# Global logger instance
+logger = logging.getLogger("SentinelGreenLogger")
+
+# Tells the writer thread to flush and stop
+_STOP = object()
+
+
+def _json_default(value):
+    # numpy scalars and anything else json does not know about
+    if hasattr(value, "item"):
+        try:
+            return value.item()
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+def _clean(value):
+    # NaN is not valid JSON, so missing values are written as null
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    return value
+
+
+class DecisionLogSink:
+    """Writes decision records as JSONL from a background thread.
+
+    ``log`` only puts the record on a queue. The writer thread drains it in
+    batches and rotates the file by size (``max_bytes``) or age
+    (``max_age`` seconds), optionally gzipping the rotated file.
+    """
+
+    def __init__(self, log_dir=LOG_DIR, max_bytes=50 * 1024 * 1024, max_age=3600,
+                 batch_size=500, flush_interval=0.5, compress=False, max_queue=100_000):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compress = compress
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._bytes = 0
+
+        # Records dropped because the queue was full; the hot path never waits on disk
+        self.dropped = 0
+        # Records that could not be serialized or written; the writer logs them and carries on
+        self.failed = 0
+        self.written = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="decision-log-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def log(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Block until every record queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Gather whatever else arrives within the flush interval, up to one batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is _STOP
+            records = batch[:-1] if stop else batch
+            try:
+                if records:
+                    self._write(records)
+            except Exception:
+                # An I/O error loses this batch, not the writer; the next batch reopens the file
+                logger.exception("Could not write %d decision records", len(records))
+                self.failed += len(records)
+                self._close_file(quiet=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._close_file(quiet=True)
+                return
+
+    def _serialize(self, record):
+        try:
+            return json.dumps(_clean(record), default=_json_default) + "\n"
+        except Exception:
+            logger.exception("Could not serialize a decision record")
+            self.failed += 1
+            return ""
+
+    def _write(self, records):
+        lines = "".join(self._serialize(record) for record in records).encode("utf-8")
+        if not lines:
+            return
+        if self._file is not None and (
+            self._bytes + len(lines) > self.max_bytes
+            or time.time() - self._opened_at > self.max_age
+        ):
+            self._rotate()
+        if self._file is None:
+            self._open()
+        self._file.write(lines)
+        self._file.flush()
+        self._bytes += len(lines)
+        self.written += lines.count(b"\n")
+
+    def _open(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._path = os.path.join(self.log_dir, f"sentinelgreen_decisions_{stamp}.jsonl")
+        self._file = open(self._path, "ab")
+        self._opened_at = time.time()
+        self._bytes = 0
+
+    def _rotate(self):
+        path = self._path
+        self._close_file()
+        if self.compress and path:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+
+    def _close_file(self, quiet=False):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                if not quiet:
+                    raise
+            finally:
+                self._file = None
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> DecisionLogSink:
+    """Return the process-wide sink, starting its writer thread on first use."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = DecisionLogSink().start()
+                atexit.register(_sink.close)
+    return _sink
+
+
+def log_decision(agent_name: str, input_data: dict, decision: str):
+    get_sink().log({
+        "ts": time.time(),
+        "agent": agent_name,
+        "input": input_data,
+        "decision": decision,
+    })
@@ -0,0 +1,80 @@
+# utils/reading_stream.py
+
+import json
+import pandas as pd
+
+
+class ReadingStream:
+    """Cursor over a telemetry CSV that reads it lazily in chunks.
+
+    ``offset`` counts data rows already handed out, so a stream can be
+    checkpointed and resumed without rereading what came before. With a
+    ``store`` (see utils.telemetry_store) chunks are sliced from its shared
+    columnar copy of the file instead of being parsed from the CSV.
+    """
+
+    def __init__(self, path, dtypes=None, chunksize=10_000, offset=0, loop=False, store=None):
+        self.path = path
+        self.dtypes = dtypes
+        self.chunksize = chunksize
+        self.offset = offset
+        # Start over from the first row when the file runs out (mock data)
+        self.loop = loop
+        self.store = store
+        self._records = None
+
+    def chunks(self):
+        """Yield DataFrames of up to ``chunksize`` rows from the cursor onwards."""
+        if self.store is not None:
+            table = self.store.table(self.path, self.dtypes)
+            while self.offset < len(table):
+                chunk = table.frame(self.offset, self.offset + self.chunksize)
+                self.offset += len(chunk)
+                yield chunk
+            return
+
+        skip = self.offset
+        reader = pd.read_csv(
+            self.path,
+            dtype=self.dtypes,
+            chunksize=self.chunksize,
+            # A callable keeps resuming from a deep offset in constant memory
+            skiprows=lambda line: 0 < line <= skip,
+        )
+        with reader:
+            for chunk in reader:
+                chunk.index = pd.RangeIndex(self.offset, self.offset + len(chunk))
+                self.offset += len(chunk)
+                yield chunk
+
+    def __iter__(self):
+        """Yield one reading dict at a time from the cursor onwards."""
+        while True:
+            for chunk in self.chunks():
+                start = self.offset - len(chunk)
+                for i, record in enumerate(chunk.to_dict("records")):
+                    # Only count a row as consumed once it has been handed out
+                    self.offset = start + i + 1
+                    yield record
+            if not self.loop or self.offset == 0:
+                return
+            self.offset = 0
+
+    def next_reading(self) -> dict:
+        if self._records is None:
+            self._records = iter(self)
+        return next(self._records)
+
+    def rewind(self, offset=0):
+        self.offset = offset
+        self._records = None
+
+    def checkpoint(self, checkpoint_path):
+        with open(checkpoint_path, "w") as f:
+            json.dump({"path": self.path, "offset": self.offset}, f)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_path, **kwargs):
+        with open(checkpoint_path) as f:
+            state = json.load(f)
+        return cls(state["path"], offset=state["offset"], **kwargs)
@@ -0,0 +1,209 @@
+# utils/stream_pipeline.py
+
+import asyncio
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from agents.runtime import AGENT_REGISTRY, get_runtime
+from utils.logger import log_decision
+from utils.reading_stream import ReadingStream
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+
+class StageStats:
+    """Items handled and time spent by one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.max_queue_depth = 0
+        self.started = None
+        self.finished = None
+
+    def report(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "items": self.items,
+            "elapsed_s": round(elapsed, 4),
+            "items_per_s": round(self.items / elapsed, 1) if elapsed > 0 else 0.0,
+            "busy_s": round(self.busy, 4),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class StreamPipeline:
+    """Streams every domain's telemetry concurrently through reader, decision and logging stages.
+
+    Stages are joined by bounded queues, so a slow decision or logging stage
+    pauses the readers instead of letting readings pile up in memory.
+
+    With ``decision_batch_size`` above 1, a decision worker that falls behind
+    takes up to that many waiting readings at once: each domain's share goes
+    through the rules in one vectorized pass and, with a TieredDecisionEngine,
+    its borderline readings to the agent together (see evaluate_batch).
+    """
+
+    def __init__(self, domains=None, runtime=None, engine=None, rate=None,
+                 queue_size=1000, decision_workers=4, log_batch_size=100, limit=None,
+                 decision_batch_size=1):
+        self.runtime = runtime or get_runtime()
+        self.domains = list(domains or AGENT_REGISTRY)
+        # TieredDecisionEngine to escalate borderline readings; rules only when None
+        self.engine = engine
+        # Readings per second per domain; None streams as fast as the stages allow
+        self.rate = rate
+        self.queue_size = queue_size
+        self.decision_workers = decision_workers
+        self.log_batch_size = log_batch_size
+        self.decision_batch_size = decision_batch_size
+        # Stop each domain after this many readings (None reads the whole file)
+        self.limit = limit
+
+        self.stats = {
+            "reader": StageStats("reader"),
+            "decision": StageStats("decision"),
+            "logging": StageStats("logging"),
+        }
+
+    async def _read(self, domain, out_queue):
+        plugin = self.runtime.get_plugin(domain)
+        stream = ReadingStream(plugin.stream.path, dtypes=plugin.stream.dtypes, store=plugin.stream.store)
+        chunks = stream.chunks()
+        stats = self.stats["reader"]
+        interval = 1.0 / self.rate if self.rate else 0.0
+        sent = 0
+
+        while self.limit is None or sent < self.limit:
+            # File reads happen off the event loop
+            start = time.perf_counter()
+            chunk = await asyncio.to_thread(next, chunks, None)
+            stats.busy += time.perf_counter() - start
+            if chunk is None:
+                break
+            for reading in chunk.to_dict("records"):
+                if self.limit is not None and sent >= self.limit:
+                    break
+                await out_queue.put((domain, reading))
+                stats.items += 1
+                stats.max_queue_depth = max(stats.max_queue_depth, out_queue.qsize())
+                sent += 1
+                if interval:
+                    await asyncio.sleep(interval)
+
+    async def _decide(self, in_queue, out_queue):
+        if self.decision_batch_size > 1:
+            return await self._decide_batches(in_queue, out_queue)
+        stats = self.stats["decision"]
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            domain, reading = item
+            start = time.perf_counter()
+            if self.engine is not None:
+                decision = (await self.engine.evaluate(domain, reading))["decision"]
+            else:
+                decision = self.runtime.get_plugin(domain).analyze_reading(reading)
+            stats.busy += time.perf_counter() - start
+            stats.items += 1
+            await out_queue.put((domain, reading, decision))
+            stats.max_queue_depth = max(stats.max_queue_depth, out_queue.qsize())
+
+    async def _decide_batches(self, in_queue, out_queue):
+        stats = self.stats["decision"]
+        done = False
+        while not done:
+            batch = []
+            item = await in_queue.get()
+            # Take whatever is already waiting, so the batch grows only when this stage is behind
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.decision_batch_size or in_queue.empty():
+                    break
+                item = in_queue.get_nowait()
+            if not batch:
+                continue
+
+            by_domain = defaultdict(list)
+            for domain, reading in batch:
+                by_domain[domain].append(reading)
+            start = time.perf_counter()
+            decided = []
+            for domain, readings in by_domain.items():
+                if self.engine is not None:
+                    decisions = [result["decision"] for result in await self.engine.evaluate_batch(domain, readings)]
+                else:
+                    decisions = self.runtime.get_plugin(domain).analyze_batch(pd.DataFrame(readings))["decision"].tolist()
+                decided += [(domain, reading, decision) for reading, decision in zip(readings, decisions)]
+            stats.busy += time.perf_counter() - start
+            stats.items += len(batch)
+            for item in decided:
+                await out_queue.put(item)
+            stats.max_queue_depth = max(stats.max_queue_depth, out_queue.qsize())
+
+    def _write_batch(self, batch):
+        for domain, reading, decision in batch:
+            log_decision(self.runtime.get_agent_name(domain), reading, decision)
+
+    async def _log(self, in_queue):
+        stats = self.stats["logging"]
+        done = False
+        while not done:
+            batch = []
+            item = await in_queue.get()
+            # Drain whatever is already waiting into one write
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.log_batch_size or in_queue.empty():
+                    break
+                item = in_queue.get_nowait()
+            if batch:
+                start = time.perf_counter()
+                # log_decision only enqueues; the sink's thread does the file I/O
+                self._write_batch(batch)
+                stats.busy += time.perf_counter() - start
+                stats.items += len(batch)
+
+    async def run(self) -> dict:
+        """Stream every domain to completion and return per-stage throughput."""
+        decision_queue = asyncio.Queue(maxsize=self.queue_size)
+        log_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        now = time.perf_counter()
+        for stats in self.stats.values():
+            stats.started = now
+
+        readers = [asyncio.create_task(self._read(domain, decision_queue)) for domain in self.domains]
+        deciders = [asyncio.create_task(self._decide(decision_queue, log_queue))
+                    for _ in range(self.decision_workers)]
+        logger = asyncio.create_task(self._log(log_queue))
+
+        try:
+            await asyncio.gather(*readers)
+            self.stats["reader"].finished = time.perf_counter()
+            for _ in deciders:
+                await decision_queue.put(_DONE)
+            await asyncio.gather(*deciders)
+            self.stats["decision"].finished = time.perf_counter()
+            await log_queue.put(_DONE)
+            await logger
+            self.stats["logging"].finished = time.perf_counter()
+        finally:
+            for task in readers + deciders + [logger]:
+                task.cancel()
+
+        return self.report()
+
+    def report(self) -> dict:
+        return {name: stats.report() for name, stats in self.stats.items()}
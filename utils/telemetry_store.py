@@ -0,0 +1,254 @@
+# utils/telemetry_store.py
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Columnar copies live next to their CSV: mock_data/.columnar/<csv name>/
+CACHE_DIRNAME = ".columnar"
+
+# Rows converted per read_csv chunk, so conversion runs in bounded memory
+CONVERT_CHUNKSIZE = 1_000_000
+
+# Strings are stored as int32 codes into a per-column list of values; -1 is missing
+_MISSING_CODE = -1
+
+
+def _is_text(dtype) -> bool:
+    return dtype in ("object", "category", "string", "str", str, object)
+
+
+class ColumnarTable:
+    """One CSV held as typed NumPy columns, memory-mapped from ``.npy`` files.
+
+    Numeric columns are zero-copy views of the mapped files and text columns
+    are dictionary-encoded, so several processes mapping the same table share
+    its pages through the OS cache instead of each holding a parsed copy.
+    """
+
+    def __init__(self, path, columns, values, dtypes):
+        self.path = path
+        # name -> ndarray (np.memmap when mapped); codes for text columns
+        self.columns = columns
+        # name -> list of distinct strings, for text columns only
+        self.values = values
+        self.dtypes = dtypes
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def column(self, name, start=0, stop=None) -> np.ndarray:
+        """Raw column slice without copying (codes for text columns)."""
+        return self.columns[name][start:stop]
+
+    def _series(self, name, start, stop, index):
+        data = self.columns[name][start:stop]
+        if name not in self.values:
+            return pd.Series(data, index=index, name=name, copy=False)
+        categorical = pd.Categorical.from_codes(data, categories=self.values[name])
+        if self.dtypes[name] == "category":
+            return pd.Series(categorical, index=index, name=name)
+        return pd.Series(np.asarray(categorical, dtype=object), index=index, name=name, dtype=object)
+
+    def frame(self, start=0, stop=None, columns=None) -> pd.DataFrame:
+        """Rows ``start:stop`` as a DataFrame with the CSV's dtypes, indexed by row number."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        index = pd.RangeIndex(start, stop)
+        names = columns or list(self.columns)
+        return pd.DataFrame({name: self._series(name, start, stop, index) for name in names}, index=index)
+
+
+class TelemetryStore:
+    """Process-wide, read-only columnar copies of the telemetry CSVs.
+
+    The first request for a CSV converts it (chunk by chunk) into one
+    ``.npy`` file per column plus a manifest; later requests, in this or any
+    other process, map those files. A copy is rebuilt when its CSV changes.
+
+    Each build goes into its own version directory and the manifest naming
+    it is replaced in one atomic rename, so a reader (or a crash) at any
+    moment sees either the old copy or the new one, never no copy. The
+    version a build replaces is kept until the build after it, for readers
+    in other processes that still have it mapped. Copies read with
+    different ``dtypes`` are kept apart.
+    """
+
+    def __init__(self, cache_dir=None, mmap=True, chunksize=CONVERT_CHUNKSIZE):
+        # Defaults to a .columnar directory next to each CSV
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self.chunksize = chunksize
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, path, dtypes=None) -> ColumnarTable:
+        key = (os.path.abspath(path), self._dtypes_tag(dtypes))
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    table = self._tables[key] = self._load(path, dtypes or {})
+        return table
+
+    def frame(self, path, dtypes=None, start=0, stop=None) -> pd.DataFrame:
+        return self.table(path, dtypes).frame(start, stop)
+
+    @staticmethod
+    def _dtypes_tag(dtypes) -> str:
+        if not dtypes:
+            return ""
+        return hashlib.sha1(json.dumps(dtypes, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:10]
+
+    def _target(self, path, dtypes=None):
+        root = self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME)
+        tag = self._dtypes_tag(dtypes)
+        return os.path.join(root, os.path.basename(path) + (f"-{tag}" if tag else ""))
+
+    def _load(self, path, dtypes):
+        target = self._target(path, dtypes)
+        source = os.stat(path)
+        signature = {"size": source.st_size, "mtime": source.st_mtime_ns, "dtypes": dtypes}
+        while True:
+            manifest = self._read_manifest(target)
+            if manifest is None or manifest["source"] != signature:
+                self._convert(path, dtypes, target, signature)
+                manifest = self._read_manifest(target)
+
+            mode = "r" if self.mmap else None
+            version = os.path.join(target, manifest["version"])
+            try:
+                columns = {
+                    name: np.load(os.path.join(version, f"{i}.npy"), mmap_mode=mode)
+                    for i, name in enumerate(manifest["columns"])
+                }
+            except FileNotFoundError:
+                # Two builds by other processes went by since the manifest was read: read the current one,
+                # or rebuild if the manifest names files that are gone for good
+                if self._read_manifest(target) == manifest:
+                    self._convert(path, dtypes, target, signature)
+                continue
+            return ColumnarTable(path, columns, manifest["values"], manifest["dtypes"])
+
+    @staticmethod
+    def _read_manifest(target):
+        try:
+            with open(os.path.join(target, "manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _convert(self, path, dtypes, target, signature):
+        # First pass only counts rows, so every column can be preallocated on disk
+        rows = sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=self.chunksize))
+        names = list(pd.read_csv(path, nrows=0).columns)
+        os.makedirs(target, exist_ok=True)
+        # Build a new version directory; the manifest is switched over to it only once it is complete
+        scratch = tempfile.mkdtemp(prefix="v-", dir=target)
+        try:
+            # mkdtemp is private to this user; workers running as others map it too
+            os.chmod(scratch, 0o755)
+            arrays, encoders, column_dtypes = {}, {}, {}
+            offset = 0
+            reader = pd.read_csv(path, dtype=dtypes, chunksize=self.chunksize)
+            with reader:
+                for chunk in reader:
+                    for i, name in enumerate(names):
+                        series = chunk[name]
+                        if name not in arrays:
+                            # pandas 3 reads text as its own "str" dtype rather than object
+                            text = _is_text(dtypes.get(name)) or pd.api.types.is_string_dtype(series.dtype)
+                            column_dtypes[name] = str(dtypes.get(name) or ("object" if text else "float64"))
+                            if text:
+                                encoders[name] = {}
+                            arrays[name] = np.lib.format.open_memmap(
+                                os.path.join(scratch, f"{i}.npy"), mode="w+",
+                                dtype=np.int32 if text else np.dtype(column_dtypes[name]), shape=(rows,),
+                            )
+                        if name not in encoders:
+                            try:
+                                values = series.to_numpy(dtype=arrays[name].dtype)
+                            except (TypeError, ValueError):
+                                # Numbers in earlier chunks, text in this one: keep the whole column as text
+                                arrays[name] = self._as_text(
+                                    arrays.pop(name), offset, os.path.join(scratch, f"{i}.npy"),
+                                    encoders.setdefault(name, {}),
+                                )
+                                column_dtypes[name] = "object"
+                        if name in encoders:
+                            values = self._encode(series, encoders[name])
+                        arrays[name][offset:offset + len(chunk)] = values
+                    offset += len(chunk)
+            for array in arrays.values():
+                array.flush()
+            if not arrays:
+                # Header-only CSV: keep the columns, with no rows
+                for i, name in enumerate(names):
+                    column_dtypes[name] = str(dtypes.get(name, "object"))
+                    np.save(os.path.join(scratch, f"{i}.npy"), np.empty(0, dtype=np.float64))
+            arrays.clear()
+
+            previous = self._read_manifest(target)
+            staged = os.path.join(scratch, "manifest.json")
+            with open(staged, "w") as f:
+                json.dump({
+                    "source": signature,
+                    "version": os.path.basename(scratch),
+                    # Kept until the next build, for readers still mapping it
+                    "previous": previous["version"] if previous is not None else None,
+                    "columns": names,
+                    "dtypes": column_dtypes,
+                    "values": {name: list(encoder) for name, encoder in encoders.items()},
+                }, f)
+            # The one atomic step: readers go from the old manifest straight to the new one
+            os.replace(staged, os.path.join(target, "manifest.json"))
+        except BaseException:
+            shutil.rmtree(scratch, ignore_errors=True)
+            raise
+
+        # Drop the version two builds back; the one just replaced stays for readers that mapped it
+        if previous is not None and previous.get("previous"):
+            shutil.rmtree(os.path.join(target, previous["previous"]), ignore_errors=True)
+
+    def _as_text(self, array, filled, file_path, encoder) -> np.ndarray:
+        """Rewrite a numeric column's first ``filled`` rows as text codes; returns the new column."""
+        done = pd.Series(np.array(array[:filled]))
+        rows = len(array)
+        # Release the mapping before the file under it is replaced
+        del array
+        codes = np.lib.format.open_memmap(file_path, mode="w+", dtype=np.int32, shape=(rows,))
+        # Whole numbers read back without the ".0" the float column gave them
+        text = done.map(lambda value: str(int(value)) if value.is_integer() else repr(value), na_action="ignore")
+        codes[:filled] = self._encode(text, encoder)
+        return codes
+
+    @staticmethod
+    def _encode(series, encoder) -> np.ndarray:
+        # Factorize the chunk, then map its distinct values onto the column-wide codes
+        codes, uniques = pd.factorize(series.astype(object))
+        mapping = np.array(
+            [encoder.setdefault(str(value), len(encoder)) for value in uniques] + [_MISSING_CODE],
+            dtype=np.int32,
+        )
+        # factorize marks missing values -1, which picks the trailing _MISSING_CODE
+        return mapping[codes]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> TelemetryStore:
+    """Return the process-wide store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TelemetryStore()
+    return _store